@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк алгоритмов хеширования архива
+
+Сравнивает на этой машине способы, которыми можно объявить хеш архива
+(см. hashing.py): sha256, blake2b и blake3 (если установлен) целиком и
+деревом с листьями разного размера при разном числе потоков. Данные
+генерируются воспроизводимо, файл читается с диска так же, как его читает
+verify_hash. Результаты сохраняются в JSON.
+
+Пример:
+    python bench_hash.py --size 1G --workers 1 2 4 8 --output hash.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from bench_pipeline import parse_size, size_label, payload_block, git_commit
+from hashing import HashSpec, available_algorithms, hash_file, DEFAULT_LEAF_SIZE
+
+
+def generate_file(path: Path, size: int):
+    """Файл заданного размера из воспроизводимого блока данных"""
+    block = payload_block()
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            part = block[:size - written]
+            f.write(part)
+            written += len(part)
+
+
+def bench_spec(path: Path, spec: HashSpec, workers: int, runs: int) -> Dict[str, Any]:
+    """Медиана и лучший результат нескольких прогонов hash_file"""
+    size = path.stat().st_size
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        hash_file(path, spec, workers=workers)
+        durations.append(time.perf_counter() - start)
+    median = statistics.median(durations)
+    return {
+        'scheme': spec.scheme,
+        'workers': workers if spec.leaf_size else 1,
+        'median_s': round(median, 4),
+        'min_s': round(min(durations), 4),
+        'mb_per_s': round(size / 1024 ** 2 / median, 1) if median else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк алгоритмов хеширования архива")
+    parser.add_argument("--size", default='256M', help="размер файла: 64M, 1G... (по умолчанию: 256M)")
+    parser.add_argument("--algorithms", nargs='+', choices=available_algorithms(), default=available_algorithms())
+    parser.add_argument("--leaf-sizes", nargs='+', default=[size_label(DEFAULT_LEAF_SIZE)],
+                        help="размеры листьев дерева (по умолчанию: 4M); 0 - только хеш целиком")
+    parser.add_argument("--workers", nargs='+', type=int, default=[1, 2, 4, os.cpu_count() or 1],
+                        help="число потоков для дерева (по умолчанию: 1 2 4 и число ядер)")
+    parser.add_argument("--runs", type=int, default=3, help="повторов каждого случая (по умолчанию: 3)")
+    parser.add_argument("--file", default=None, help="хешировать существующий файл вместо сгенерированного")
+    parser.add_argument("--output", default=None, help="файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    work_dir = None
+    if args.file:
+        path = Path(args.file)
+    else:
+        work_dir = Path(tempfile.mkdtemp(prefix="bench_hash_"))
+        path = work_dir / "payload.bin"
+        generate_file(path, parse_size(args.size))
+
+    leaf_sizes = sorted({parse_size(leaf) for leaf in args.leaf_sizes if parse_size(leaf) > 0})
+    workers = sorted(set(args.workers))
+    results = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'size': path.stat().st_size,
+        'runs': args.runs,
+        'cases': [],
+    }
+    try:
+        # Первый проход прогревает кэш страниц, чтобы сравнивать хеширование, а не диск
+        hash_file(path, HashSpec())
+        for algorithm in args.algorithms:
+            cases = [(HashSpec(algorithm), 1)]
+            cases += [(HashSpec(algorithm, leaf_size), count) for leaf_size in leaf_sizes for count in workers]
+            for spec, count in cases:
+                result = bench_spec(path, spec, count, args.runs)
+                results['cases'].append(result)
+                print(f"  {result['scheme']:<24} потоков {result['workers']:>3}  "
+                      f"{result['median_s']:>8.3f} с  {result['mb_per_s']:>8} МБ/с")
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Результаты сохранены: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
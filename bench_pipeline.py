@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк конвейера обновления: загрузка, проверка хеша, распаковка
+
+Генерирует воспроизводимые синтетические архивы (размер от 1 МБ до 2 ГБ,
+несколько больших файлов или десятки тысяч мелких, без сжатия или deflate),
+поднимает в этом же процессе тестовый сервер simple_server.py с папкой
+архивов и отдельно замеряет UpdateChecker.download_file, verify_hash,
+extract_archive и весь download_update. Результаты сохраняются в JSON,
+чтобы сравнивать запуски на разных коммитах (--compare).
+
+Пример:
+    python bench_pipeline.py --sizes 1M 64M 1G --output bench.json
+    python bench_pipeline.py --sizes 1M 64M 1G --compare bench.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from publish import ZIP_EPOCH, ARCHIVE_NAME, file_sha256
+from simple_server import SimpleUpdateServer
+from updater_core import AppDataManager, UpdateChecker
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+TOKEN = "test-token-123"
+BLOCK_SIZE = 1024 * 1024
+SEED = 20250719
+
+LAYOUTS = ('large', 'tiny')
+COMPRESSIONS = {'stored': zipfile.ZIP_STORED, 'deflated': zipfile.ZIP_DEFLATED}
+STAGES = ('download_file', 'verify_hash', 'extract_archive', 'download_update')
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """Размер вида 512K, 64M, 2G или число байт"""
+    text = text.strip().upper()
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def size_label(size: int) -> str:
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return str(size)
+
+
+def payload_block() -> bytes:
+    """
+    Детерминированный блок данных, который сжимается примерно вдвое
+    (16 символов алфавита), чтобы deflate выполнял реальную работу.
+    """
+    rng = random.Random(SEED)
+    return bytes(rng.choices(b"abcdefghijklmnop", k=BLOCK_SIZE))
+
+
+def generate_archive(path: Path, size: int, layout: str, compression: str,
+                     large_files: int, tiny_files: int) -> Dict[str, Any]:
+    """Записать синтетический архив с size байт данных (если его ещё нет)"""
+    count = large_files if layout == 'large' else tiny_files
+    count = max(1, min(count, size))
+    base_size, remainder = divmod(size, count)
+
+    if not path.exists():
+        block = payload_block()
+        tmp_path = path.with_name(path.name + ".tmp")
+        with zipfile.ZipFile(tmp_path, 'w', COMPRESSIONS[compression], compresslevel=6) as zip_file:
+            for i in range(count):
+                file_size = base_size + (1 if i < remainder else 0)
+                info = zipfile.ZipInfo(f"bench/{i // 1000:03d}/file{i:06d}.bin", date_time=ZIP_EPOCH)
+                info.compress_type = COMPRESSIONS[compression]
+                info.file_size = file_size  # нужен для выбора ZIP64 заранее
+                # Сдвиг блока, чтобы файлы отличались
+                offset = (i * 7919) % BLOCK_SIZE
+                data = block[offset:] + block[:offset]
+                with zip_file.open(info, 'w') as dst:
+                    written = 0
+                    while written < file_size:
+                        part = data[:min(BLOCK_SIZE, file_size - written)]
+                        dst.write(part)
+                        written += len(part)
+        tmp_path.replace(path)
+
+    return {'files': count, 'uncompressed_bytes': size, 'archive_bytes': path.stat().st_size}
+
+
+def prepare_case(root: Path, size: int, layout: str, compression: str,
+                 large_files: int, tiny_files: int) -> Dict[str, Any]:
+    """Подготовить папку релиза одного случая: архив, хеш и версия"""
+    name = f"{size_label(size)}-{layout}-{compression}"
+    case_dir = root / "releases" / name
+    case_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"📦 {name}: подготовка архива...")
+    info = generate_archive(case_dir / ARCHIVE_NAME, size, layout, compression, large_files, tiny_files)
+    sha256 = file_sha256(case_dir / ARCHIVE_NAME)
+    (case_dir / f"{ARCHIVE_NAME}.sha256").write_text(sha256, encoding='utf-8')
+    (case_dir / "version.txt").write_text("bench", encoding='utf-8')
+    return {'name': name, 'size': size, 'layout': layout, 'compression': compression,
+            'sha256': sha256, **info}
+
+
+class BenchServer:
+    """simple_server.py в фоновом потоке этого процесса"""
+
+    def __init__(self, release_root: Path):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), SimpleUpdateServer)
+        self.httpd.release_root = release_root.resolve()
+        self.httpd.daemon_threads = True
+        self.httpd.quiet = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="bench-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self) -> 'BenchServer':
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def case_settings(base_url: str, case: Dict[str, Any], download_path: Path) -> Dict[str, Any]:
+    settings = AppDataManager().load_settings()
+    url = f"{base_url}/releases/{case['name']}"
+    settings.update({
+        'token': TOKEN,
+        'version_url': f"{url}/version.txt",
+        'download_url': f"{url}/{ARCHIVE_NAME}",
+        'hash_url': f"{url}/{ARCHIVE_NAME}.sha256",
+        'download_path': str(download_path),
+        'chunk_index_url': '',
+        'manifest_url': '',
+        'signature_url': '',
+        'execute_reg_files': False,
+        'trace_enabled': False,
+        'profile': False,
+    })
+    return settings
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    if func(*args, **kwargs) is False:
+        raise RuntimeError(f"{func.__name__} завершился неудачно")
+    return time.perf_counter() - start
+
+
+def run_case(base_url: str, case: Dict[str, Any], work_dir: Path, runs: int) -> Dict[str, Any]:
+    """Замерить этапы конвейера для одного архива"""
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    run_dir = work_dir / "run"
+
+    for _ in range(runs):
+        shutil.rmtree(run_dir, ignore_errors=True)
+        run_dir.mkdir(parents=True)
+        settings = case_settings(base_url, case, run_dir)
+        checker = UpdateChecker(settings)
+        archive_path = run_dir / ARCHIVE_NAME
+
+        samples['download_file'].append(timed(checker.download_file, settings['download_url'], archive_path))
+        samples['verify_hash'].append(timed(checker.verify_hash, archive_path, settings['hash_url'],
+                                            expected_hash=case['sha256']))
+        samples['extract_archive'].append(timed(checker.extract_archive, archive_path, run_dir / "extract"))
+
+        shutil.rmtree(run_dir)
+        run_dir.mkdir()
+        samples['download_update'].append(timed(checker.download_update, str(run_dir), "bench"))
+        checker.session.close()
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+    result = {key: case[key] for key in ('name', 'size', 'layout', 'compression', 'files',
+                                         'archive_bytes', 'uncompressed_bytes')}
+    result['stages'] = {}
+    for stage, values in samples.items():
+        median = statistics.median(values)
+        # Загрузка и хеш обрабатывают архив, распаковка и весь конвейер - ещё и файлы
+        processed = case['uncompressed_bytes'] if stage in ('extract_archive', 'download_update') \
+            else case['archive_bytes']
+        result['stages'][stage] = {
+            'runs': len(values),
+            'median_s': round(median, 4),
+            'min_s': round(min(values), 4),
+            'max_s': round(max(values), 4),
+            'mb_per_s': round(processed / median / 1024 ** 2, 2) if median > 0 else None,
+        }
+    return result
+
+
+def compare(results: Dict[str, Any], baseline_path: Path):
+    """Вывести изменение медиан относительно сохранённого запуска"""
+    baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    print("")
+    print(f"📊 Сравнение с {baseline_path} ({baseline.get('commit') or 'коммит неизвестен'}):")
+    for case in results['cases']:
+        old_case = previous.get(case['name'])
+        if old_case is None:
+            print(f"   {case['name']}: нет в базовом запуске")
+            continue
+        for stage, stats in case['stages'].items():
+            old = old_case['stages'].get(stage)
+            if not old or not old['median_s']:
+                continue
+            change = (stats['median_s'] - old['median_s']) / old['median_s'] * 100
+            marker = "🔺" if change > 5 else ("🔻" if change < -5 else "  ")
+            print(f"   {marker} {case['name']:<24} {stage:<16} {old['median_s']:>9.4f} с → "
+                  f"{stats['median_s']:>9.4f} с ({change:+.1f}%)")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки, проверки и распаковки обновления")
+    parser.add_argument("--sizes", nargs='+', default=['1M', '64M'],
+                        help="объём данных в архиве: 1M, 256M, 2G... (по умолчанию: 1M 64M)")
+    parser.add_argument("--layouts", nargs='+', choices=LAYOUTS, default=list(LAYOUTS),
+                        help="large - несколько больших файлов, tiny - много мелких")
+    parser.add_argument("--compression", nargs='+', choices=list(COMPRESSIONS), default=list(COMPRESSIONS))
+    parser.add_argument("--large-files", type=int, default=4, help="файлов в архиве large (по умолчанию: 4)")
+    parser.add_argument("--tiny-files", type=int, default=50000, help="файлов в архиве tiny (по умолчанию: 50000)")
+    parser.add_argument("--runs", type=int, default=3, help="повторов каждого случая (по умолчанию: 3)")
+    parser.add_argument("--work-dir", default=None,
+                        help="папка для архивов (сохраняются между запусками); по умолчанию временная")
+    parser.add_argument("--output", default=None, help="файл для результатов в JSON")
+    parser.add_argument("--compare", default=None, help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="bench_pipeline_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    # Бенчмарк не должен менять установленную версию приложения
+    app_data = AppDataManager()
+    saved_version = app_data.version_file.read_bytes() if app_data.version_file.exists() else None
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'runs': args.runs,
+        'cases': [],
+    }
+    try:
+        cases = [prepare_case(work_dir, parse_size(size), layout, compression, args.large_files, args.tiny_files)
+                 for size in args.sizes for layout in args.layouts for compression in args.compression]
+        with BenchServer(work_dir) as server:
+            for case in cases:
+                result = run_case(server.base_url, case, work_dir, args.runs)
+                results['cases'].append(result)
+                stages = ", ".join(f"{stage} {stats['median_s']:.3f} с" for stage, stats in result['stages'].items())
+                print(f"✅ {case['name']}: {stages}")
+    finally:
+        if saved_version is None:
+            app_data.version_file.unlink(missing_ok=True)
+        else:
+            app_data.version_file.write_bytes(saved_version)
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Результаты сохранены: {args.output}")
+    if args.compare:
+        compare(results, Path(args.compare))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк запуска Python Updater
+
+Для каждой версии интерфейса запускает отдельный интерпретатор с -X importtime
+и измеряет время до первого отрисованного окна (приложение сообщает о нём
+строкой STARTUP_READY в режиме замера и сразу закрывается).
+Дополнительно замеряется импорт ядра updater_core без окна.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from updater_core import STARTUP_PROBE_ENV
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+FRONT_ENDS = {
+    'core': {'args': ['-c', 'import updater_core'], 'requires': None, 'window': False},
+    'tkinter': {'args': ['main.py'], 'requires': 'tkinter', 'window': True},
+    'customtkinter': {'args': ['main_ctk.py', '--ctk'], 'requires': 'customtkinter', 'window': True},
+    'dearpygui': {'args': ['main_dpg.py', '--dpg'], 'requires': 'dearpygui', 'window': True},
+}
+
+
+def parse_importtime(stderr: str) -> Dict[str, Any]:
+    """Разобрать вывод -X importtime: общее время и самые долгие импорты верхнего уровня"""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line.split('|', 2)
+        # Вложенность обозначается двумя пробелами на уровень
+        if len(name) - len(name.lstrip()) > 1:
+            continue
+        top_level.append((name.strip(), int(cumulative_us)))
+    return {
+        'total_ms': round(sum(cumulative for _, cumulative in top_level) / 1000, 2),
+        'top': [{'module': module, 'cumulative_ms': round(cumulative / 1000, 2)}
+                for module, cumulative in sorted(top_level, key=lambda item: -item[1])[:10]],
+    }
+
+
+def run_once(name: str, timeout: float) -> Dict[str, Any]:
+    """Один запуск версии интерфейса"""
+    front_end = FRONT_ENDS[name]
+    env = dict(os.environ, **{STARTUP_PROBE_ENV: '1'})
+    command = [sys.executable, '-X', 'importtime', *front_end['args']]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True)
+    ready_ms = None
+    if front_end['window']:
+        for line in process.stdout:
+            if line.startswith('STARTUP_READY'):
+                ready_ms = (time.perf_counter() - start) * 1000
+                break
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+    exit_ms = (time.perf_counter() - start) * 1000
+
+    if not front_end['window']:
+        ready_ms = exit_ms if process.returncode == 0 else None
+
+    return {
+        'ready_ms': round(ready_ms, 2) if ready_ms is not None else None,
+        'exit_ms': round(exit_ms, 2),
+        'returncode': process.returncode,
+        'imports': parse_importtime(stderr),
+    }
+
+
+def bench(names: List[str], runs: int, timeout: float) -> Dict[str, Any]:
+    """Замерить время запуска выбранных версий интерфейса"""
+    results = {}
+    for name in names:
+        requires = FRONT_ENDS[name]['requires']
+        if requires and find_spec(requires) is None:
+            results[name] = {'skipped': f"{requires} не установлен"}
+            print(f"⏭️  {name}: пропущено ({requires} не установлен)")
+            continue
+
+        samples = [run_once(name, timeout) for _ in range(runs)]
+        ready = [sample['ready_ms'] for sample in samples if sample['ready_ms'] is not None]
+        if not ready:
+            results[name] = {'error': 'окно не открылось', 'returncode': samples[-1]['returncode']}
+            print(f"❌ {name}: окно не открылось (код {samples[-1]['returncode']})")
+            continue
+
+        results[name] = {
+            'runs': len(ready),
+            'ready_ms_median': round(statistics.median(ready), 2),
+            'ready_ms_min': min(ready),
+            'import_ms_median': round(statistics.median(s['imports']['total_ms'] for s in samples), 2),
+            'top_imports': samples[-1]['imports']['top'],
+        }
+        stage = "до первого окна" if FRONT_ENDS[name]['window'] else "до завершения"
+        print(f"✅ {name}: {stage} {results[name]['ready_ms_median']} мс (медиана), "
+              f"импорты {results[name]['import_ms_median']} мс")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа бенчмарка"""
+    parser = argparse.ArgumentParser(description="Бенчмарк времени запуска Python Updater")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков (по умолчанию: 5)")
+    parser.add_argument("--timeout", type=float, default=60, help="таймаут одного запуска, с")
+    parser.add_argument("--front-ends", nargs='+', choices=list(FRONT_ENDS), default=list(FRONT_ENDS))
+    parser.add_argument("--output", default=None, help="файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'front_ends': bench(args.front_ends, args.runs, args.timeout),
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Результаты сохранены: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище чанков для дедупликации между версиями
+
+Файлы делятся на чанки по содержимому (rolling hash, алгоритм Gear),
+поэтому изменение внутри большого файла затрагивает только соседние чанки.
+Публикатор выкладывает чанки и индекс, клиент загружает только те чанки,
+которых нет в уже установленных файлах, и собирает из них новые файлы.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Iterator
+from urllib.parse import urljoin
+
+
+# Параметры разбиения (средний размер чанка ~80 КБ)
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+CHUNK_MASK = 0xFFFF << 32  # 16 бит -> в среднем 64 КБ после минимального размера
+READ_BLOCK_SIZE = 4 * 1024 * 1024
+CHUNK_INDEX_NAME = "chunk_index.json"
+CHUNKS_DIR_NAME = "chunks"
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_BATCH_SIZE = 64
+# Меньше этого объёма файлы разбиваются в текущем процессе: запуск пула дороже
+PARALLEL_CHUNKING_MIN_BYTES = 16 * 1024 * 1024
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+# Детерминированная таблица Gear: одинаковая у публикатора и клиента
+GEAR = [int.from_bytes(hashlib.sha256(b"gear" + bytes([i])).digest()[:8], 'little') for i in range(256)]
+
+
+def chunk_params() -> Dict[str, int]:
+    """Параметры разбиения, записываемые в индекс"""
+    return {'min': MIN_CHUNK_SIZE, 'max': MAX_CHUNK_SIZE, 'mask': CHUNK_MASK}
+
+
+def _cut_point(data: bytearray, start: int, end: int) -> int:
+    """Найти длину чанка, начинающегося с start"""
+    length = end - start
+    if length <= MIN_CHUNK_SIZE:
+        return length
+    stop = start + min(length, MAX_CHUNK_SIZE)
+    gear = GEAR
+    h = 0
+    # Первые MIN_CHUNK_SIZE байт пропускаются: граница там всё равно невозможна
+    for i in range(start + MIN_CHUNK_SIZE, stop):
+        h = ((h << 1) + gear[data[i]]) & _MASK64
+        if not h & CHUNK_MASK:
+            return i - start + 1
+    return stop - start
+
+
+def iter_chunks(filepath: Path) -> Iterator[tuple[int, bytes]]:
+    """Разбить файл на чанки, возвращая (смещение, данные)"""
+    buffer = bytearray()
+    pos = 0
+    offset = 0
+    eof = False
+    with open(filepath, 'rb') as f:
+        while True:
+            if not eof and len(buffer) - pos < MAX_CHUNK_SIZE:
+                del buffer[:pos]
+                pos = 0
+                block = f.read(READ_BLOCK_SIZE)
+                if block:
+                    buffer.extend(block)
+                    continue
+                eof = True
+            if pos >= len(buffer):
+                break
+            length = _cut_point(buffer, pos, len(buffer))
+            yield offset, bytes(buffer[pos:pos + length])
+            pos += length
+            offset += length
+
+
+def chunk_file(filepath: str) -> List[list]:
+    """Чанки файла [хеш, смещение, размер] (выполняется в процессе пула)"""
+    return [[hashlib.sha256(data).hexdigest(), offset, len(data)] for offset, data in iter_chunks(Path(filepath))]
+
+
+def chunk_offsets(chunks: List[list]) -> List[list]:
+    """Чанки индекса [хеш, размер] -> [хеш, смещение, размер]"""
+    result = []
+    offset = 0
+    for chunk_hash, size in chunks:
+        result.append([chunk_hash, offset, size])
+        offset += size
+    return result
+
+
+def chunk_path(root: Path, chunk_hash: str) -> Path:
+    """Путь к файлу чанка в хранилище (чанки лежат сжатыми zlib)"""
+    return root / chunk_hash[:2] / chunk_hash
+
+
+def publish_chunks(build_dir: str, names: List[str], chunks_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Разбить файлы сборки на чанки и выложить новые чанки (выполняется в процессе пула)
+    Возвращает описание файлов для индекса.
+    """
+    files = {}
+    root = Path(chunks_dir)
+    for name in names:
+        file_hash = hashlib.sha256()
+        chunks = []
+        size = 0
+        for _, data in iter_chunks(Path(build_dir) / name):
+            digest = hashlib.sha256(data).hexdigest()
+            target = chunk_path(root, digest)
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(zlib.compress(data, 6))
+                os.replace(tmp, target)
+            file_hash.update(data)
+            chunks.append([digest, len(data)])
+            size += len(data)
+        files[name] = {'size': size, 'sha256': file_hash.hexdigest(), 'chunks': chunks}
+    return files
+
+
+class ChunkStore:
+    """
+    Локальное хранилище чанков клиента
+    Чанки установленных файлов не копируются: хранилище помнит, в каком файле
+    и по какому смещению лежит каждый чанк. Загруженные чанки лежат в папке
+    хранилища до сборки файлов.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.seeds_file = self.store_dir / "seeds.json"
+        self.seeds = self._load_seeds()
+
+    def _load_seeds(self) -> Dict[str, Any]:
+        if self.seeds_file.exists():
+            try:
+                return json.loads(self.seeds_file.read_text(encoding='utf-8'))
+            except Exception as e:
+                logging.warning(f"Индекс хранилища чанков повреждён и будет перестроен: {e}")
+        return {}
+
+    def _save_seeds(self):
+        tmp = self.seeds_file.with_name(self.seeds_file.name + ".tmp")
+        tmp.write_text(json.dumps(self.seeds), encoding='utf-8')
+        os.replace(tmp, self.seeds_file)
+
+    def index_tree(self, tree: Path, known: Optional[Dict[str, Dict[str, Any]]] = None,
+                   workers: Optional[int] = None):
+        """
+        Проиндексировать чанки установленных файлов (повторно - только изменённые)
+        known: путь -> {size, mtime_ns, chunks [хеш, размер]} для файлов, содержимое
+        которых уже известно (индекс установки совпал с индексом чанков): их чанки
+        берутся оттуда без чтения файла. Остальные файлы разбиваются параллельно
+        в процессах пула.
+        """
+        tree = Path(tree)
+        known = known or {}
+        seeds = {}
+        stale = []
+        for path in tree.rglob("*"):
+            if not path.is_file() or path.name.endswith(".part"):
+                continue
+            stat = path.stat()
+            key = str(path)
+            cached = self.seeds.get(key)
+            if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+                seeds[key] = cached
+                continue
+            info = known.get(path.relative_to(tree).as_posix())
+            if info and info['size'] == stat.st_size and info['mtime_ns'] == stat.st_mtime_ns:
+                seeds[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'chunks': chunk_offsets(info['chunks'])}
+                continue
+            stale.append((key, stat))
+
+        # Крупные файлы первыми: пул не ждёт в конце один большой файл
+        stale.sort(key=lambda item: item[1].st_size, reverse=True)
+        paths = [key for key, _ in stale]
+        if len(stale) > 1 and sum(stat.st_size for _, stat in stale) >= PARALLEL_CHUNKING_MIN_BYTES:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = dict(zip(paths, pool.map(chunk_file, paths)))
+        else:
+            results = {key: chunk_file(key) for key in paths}
+        for key, stat in stale:
+            seeds[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunks': results[key]}
+        self.seeds = seeds
+        self._save_seeds()
+
+    def _record_written(self, tree: Path, files: Dict[str, Dict[str, Any]]):
+        """Запомнить чанки только что собранных файлов по индексу, не разбивая их заново"""
+        for name, info in files.items():
+            path = tree / name
+            stat = path.stat()
+            self.seeds[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                     'chunks': chunk_offsets(info['chunks'])}
+        self._save_seeds()
+
+    def local_chunks(self) -> Dict[str, tuple[str, int, int]]:
+        """Карта хеш чанка -> (файл, смещение, размер) по установленным файлам"""
+        result = {}
+        for path, info in self.seeds.items():
+            for chunk_hash, offset, size in info['chunks']:
+                result.setdefault(chunk_hash, (path, offset, size))
+        return result
+
+    def read_local(self, location: tuple[str, int, int], chunk_hash: str) -> Optional[bytes]:
+        """Прочитать чанк из установленного файла, проверив хеш"""
+        path, offset, size = location
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(size)
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            return None
+        return data
+
+    def read_stored(self, chunk_hash: str) -> bytes:
+        """Прочитать загруженный чанк из хранилища"""
+        return zlib.decompress(chunk_path(self.store_dir, chunk_hash).read_bytes())
+
+    def fetch_chunk(self, session, base_url: str, chunk_hash: str, timeout: float = 30) -> int:
+        """Загрузить чанк, проверить хеш и положить в хранилище"""
+        url = urljoin(base_url, f"{chunk_hash[:2]}/{chunk_hash}")
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        payload = response.content
+        if hashlib.sha256(zlib.decompress(payload)).hexdigest() != chunk_hash:
+            raise ValueError(f"Несовпадение хеша чанка {chunk_hash}")
+        target = chunk_path(self.store_dir, chunk_hash)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, target)
+        return len(payload)
+
+    def apply_index(self, session, index_url: str, remote_index: Dict[str, Any], tree: Path,
+                    progress_callback: Optional[Callable] = None,
+                    installed: Optional[Dict[str, Dict[str, Any]]] = None,
+                    workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Обновить установленные файлы по индексу чанков
+        Загружаются только отсутствующие локально чанки (пакетами, параллельно),
+        затем изменённые файлы собираются во временные и атомарно заменяются.
+        installed - записи индекса установки (путь -> size, mtime_ns, sha256):
+        файлы, совпадающие с индексом чанков по SHA256, не разбиваются на чанки.
+        """
+        tree = Path(tree)
+        root = tree.resolve()
+        targets = {}
+        for name in remote_index['files']:
+            target = (tree / name).resolve()
+            if root not in target.parents:
+                raise ValueError(f"Недопустимый путь в индексе чанков: {name}")
+            targets[name] = target
+        known = {}
+        for name, info in remote_index['files'].items():
+            entry = (installed or {}).get(name)
+            if entry and entry['sha256'] == info['sha256'] and entry['size'] == info['size']:
+                known[name] = {'size': entry['size'], 'mtime_ns': entry['mtime_ns'], 'chunks': info['chunks']}
+        self.index_tree(tree, known, workers)
+        local = self.local_chunks()
+
+        changed = {}
+        for name, info in remote_index['files'].items():
+            seed = self.seeds.get(str(tree / name))
+            if seed and seed['size'] == info['size'] and \
+                    [c[0] for c in seed['chunks']] == [c[0] for c in info['chunks']]:
+                continue
+            changed[name] = info
+
+        needed = {chunk_hash for info in changed.values() for chunk_hash, _ in info['chunks']}
+        missing = sorted(chunk_hash for chunk_hash in needed
+                         if chunk_hash not in local and not chunk_path(self.store_dir, chunk_hash).exists())
+
+        base_url = urljoin(index_url, CHUNKS_DIR_NAME + "/")
+        downloaded_bytes = 0
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            for i in range(0, len(missing), DOWNLOAD_BATCH_SIZE):
+                batch = missing[i:i + DOWNLOAD_BATCH_SIZE]
+                downloaded_bytes += sum(pool.map(lambda h: self.fetch_chunk(session, base_url, h), batch))
+                if progress_callback:
+                    progress_callback(int((i + len(batch)) / len(missing) * 90))
+
+        # Сначала собираем все файлы: старые версии ещё служат источником чанков
+        parts = []
+        try:
+            for name, info in changed.items():
+                target = targets[name]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                partial = target.with_name(target.name + ".part")
+                parts.append((partial, target))
+                file_hash = hashlib.sha256()
+                with open(partial, 'wb') as f:
+                    for chunk_hash, _ in info['chunks']:
+                        data = self.read_local(local[chunk_hash], chunk_hash) if chunk_hash in local else None
+                        if data is None:
+                            # Установленный файл изменился после индексации - догружаем чанк
+                            if not chunk_path(self.store_dir, chunk_hash).exists():
+                                downloaded_bytes += self.fetch_chunk(session, base_url, chunk_hash)
+                                missing.append(chunk_hash)
+                            data = self.read_stored(chunk_hash)
+                        file_hash.update(data)
+                        f.write(data)
+                if file_hash.hexdigest() != info['sha256']:
+                    raise ValueError(f"Несовпадение хеша собранного файла {name}")
+            for partial, target in parts:
+                os.replace(partial, target)
+        except BaseException:
+            for partial, _ in parts:
+                partial.unlink(missing_ok=True)
+            raise
+
+        # Загруженные чанки теперь лежат в установленных файлах
+        for chunk_hash in missing:
+            chunk_path(self.store_dir, chunk_hash).unlink(missing_ok=True)
+        self._record_written(tree, changed)
+
+        missing_set = set(missing)
+        reused = sum(size for info in changed.values()
+                     for chunk_hash, size in info['chunks'] if chunk_hash not in missing_set)
+        return {
+            'files': len(changed),
+            'changed': sorted(changed),
+            'chunks_downloaded': len(missing),
+            'bytes_downloaded': downloaded_bytes,
+            'bytes_reused': reused,
+        }
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Быстрая проверка доступности сети
+
+Перед запросом версии проверяется, что имя сервера разрешается и его TCP-порт
+отвечает за короткое время, поэтому без сети проверка завершается за доли
+секунды, а не по таймауту запроса. Сеть считается недоступной только при
+явной ошибке: резолвер ответил ошибкой, нет маршрута до сервера. Медленный
+резолвер (VPN, корпоративный DNS, первый запрос после сна) или таймаут
+соединения результата не дают - решает сам запрос. Состояние "нет сети"
+кэшируется: повторные проверки идут с экспоненциально растущим интервалом,
+а при смене сетевого окружения (появился или сменился локальный адрес) - сразу.
+"""
+
+import errno
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+DNS_TIMEOUT = 3.0
+CONNECT_TIMEOUT = 1.5
+ONLINE_CACHE_SECONDS = 30.0
+RETRY_MIN_INTERVAL = 5.0
+RETRY_MAX_INTERVAL = 300.0
+WATCH_INTERVAL = 2.0
+
+# Адреса из документационных диапазонов: нужны только для выбора маршрута,
+# UDP-сокет без отправки данных пакетов в сеть не посылает
+_ROUTE_PROBES = ((socket.AF_INET, ('192.0.2.1', 9)), (socket.AF_INET6, ('2001:db8::1', 9)))
+
+# Ошибки соединения, однозначно означающие отсутствие маршрута (в Windows - коды WSA)
+_UNREACHABLE_ERRORS = {code for code in (
+    errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ENETDOWN, errno.EADDRNOTAVAIL,
+    getattr(errno, 'WSAENETUNREACH', None), getattr(errno, 'WSAEHOSTUNREACH', None),
+    getattr(errno, 'WSAENETDOWN', None), getattr(errno, 'WSAEADDRNOTAVAIL', None),
+) if code is not None}
+
+
+class OfflineError(ConnectionError):
+    """Сеть недоступна (по результату быстрой проверки)"""
+
+
+def probe_target(url: str) -> Tuple[str, int]:
+    """Хост и порт, с которыми фактически будет установлено соединение (с учётом прокси)"""
+    from urllib.request import getproxies, proxy_bypass_environment
+
+    parts = urlsplit(url)
+    host = parts.hostname or ''
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+
+    proxies = getproxies()
+    proxy = proxies.get(parts.scheme)
+    if proxy and not proxy_bypass_environment(host, proxies):
+        proxy_parts = urlsplit(proxy if '://' in proxy else f"http://{proxy}")
+        host = proxy_parts.hostname or host
+        port = proxy_parts.port or (443 if proxy_parts.scheme == 'https' else 80)
+    return host, port
+
+
+def resolve(host: str, port: int, timeout: float = DNS_TIMEOUT) -> List[tuple]:
+    """
+    Разрешить имя с ограничением по времени
+    getaddrinfo не поддерживает таймаут, поэтому он выполняется в отдельном потоке;
+    зависший резолвер продолжает работу в фоне и ни на что не влияет. Ошибка
+    резолвера - OfflineError, истёкший срок - TimeoutError (сеть может быть).
+    """
+    result = {}
+    done = threading.Event()
+
+    def resolve_thread():
+        try:
+            result['addresses'] = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            result['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=resolve_thread, daemon=True).start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"Имя {host} не разрешилось за {timeout:.0f} с")
+    if 'error' in result:
+        raise OfflineError(f"Не удалось разрешить имя {host}: {result['error']}")
+    return result['addresses']
+
+
+def can_connect(addresses: List[tuple], timeout: float = CONNECT_TIMEOUT) -> Optional[bool]:
+    """
+    Проверить TCP-соединение хотя бы с одним из адресов за общий срок timeout
+    False - ни до одного адреса нет маршрута, None - результат неизвестен
+    (истёк срок или другая ошибка).
+    """
+    deadline = time.monotonic() + timeout
+    conclusive = True
+    for family, sock_type, proto, _, sockaddr in addresses:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            conclusive = False
+            break
+        try:
+            with socket.socket(family, sock_type, proto) as sock:
+                sock.settimeout(remaining)
+                sock.connect(sockaddr)
+            return True
+        except ConnectionRefusedError:
+            # Хост ответил отказом: сеть есть, сервер просто не слушает порт
+            return True
+        except OSError as e:
+            if e.errno not in _UNREACHABLE_ERRORS:
+                conclusive = False
+    return False if conclusive else None
+
+
+def network_fingerprint() -> Tuple[Optional[str], ...]:
+    """
+    Отпечаток сетевого окружения: локальные адреса маршрутов по умолчанию
+    Меняется при подключении к сети, смене сети или пропадании маршрута.
+    """
+    fingerprint = []
+    for family, address in _ROUTE_PROBES:
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as sock:
+                sock.connect(address)
+                fingerprint.append(sock.getsockname()[0])
+        except OSError:
+            fingerprint.append(None)
+    return tuple(fingerprint)
+
+
+class ConnectivityMonitor:
+    """Кэшируемое состояние сети с экспоненциальной повторной проверкой"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.online: Optional[bool] = None
+        self.checked_at = 0.0
+        self.next_probe_at = 0.0
+        self.retry_interval = RETRY_MIN_INTERVAL
+        self.fingerprint: Optional[tuple] = None
+        self.waiters: List[Future] = []
+        self.watcher: Optional[threading.Thread] = None
+
+    def probe(self, url: str) -> Optional[bool]:
+        """
+        Проверить доступность сервера: разрешение имени и TCP-соединение
+        None - проверка ничего не показала (медленный резолвер или соединение).
+        """
+        host, port = probe_target(url)
+        if not host:
+            return True
+        try:
+            addresses = resolve(host, port)
+        except TimeoutError as e:
+            logging.info(f"{e}: состояние сети неизвестно, выполняется запрос")
+            return None
+        except OfflineError as e:
+            logging.info(f"{e}: сеть считается недоступной")
+            return False
+        online = can_connect(addresses)
+        if online is None:
+            logging.info(f"Нет быстрого ответа от {host}:{port}: состояние сети неизвестно, выполняется запрос")
+        elif not online:
+            logging.info(f"Нет маршрута до {host}:{port}: сеть считается недоступной")
+        return online
+
+    def is_online(self, url: str) -> bool:
+        """
+        Есть ли сеть
+        Недавний результат берётся из кэша, если сетевое окружение не изменилось.
+        Неопределённый результат проверки не кэшируется и не откладывает запрос.
+        """
+        with self.lock:
+            fingerprint = network_fingerprint()
+            now = time.monotonic()
+            if fingerprint == self.fingerprint:
+                if self.online and now - self.checked_at < ONLINE_CACHE_SECONDS:
+                    return True
+                if self.online is False and now < self.next_probe_at:
+                    return False
+            elif self.fingerprint is not None:
+                logging.info("Сетевое окружение изменилось, повторная проверка сети")
+
+            online = self.probe(url)
+            if online is None:
+                return True
+            self._record(online, fingerprint)
+            return online
+
+    def check(self, url: str):
+        """Выбросить OfflineError, если сети нет"""
+        if not self.is_online(url):
+            host, port = probe_target(url)
+            raise OfflineError(f"Нет сети: {host}:{port} недоступен")
+
+    def report_online(self):
+        """Отметить успешный сетевой запрос"""
+        with self.lock:
+            self._record(True, network_fingerprint())
+
+    def _record(self, online: bool, fingerprint: tuple):
+        now = time.monotonic()
+        if online:
+            if self.online is False:
+                logging.info("Сеть снова доступна")
+            self.retry_interval = RETRY_MIN_INTERVAL
+        else:
+            # Первая неудача - минимальный интервал, дальше он удваивается
+            if self.online is False and fingerprint == self.fingerprint:
+                self.retry_interval = min(self.retry_interval * 2, RETRY_MAX_INTERVAL)
+            else:
+                self.retry_interval = RETRY_MIN_INTERVAL
+            self.next_probe_at = now + self.retry_interval
+            logging.warning(f"Нет сети, следующая проверка через {self.retry_interval:.0f} с")
+        self.online = online
+        self.checked_at = now
+        self.fingerprint = fingerprint
+
+    def when_online(self, url: str) -> Future:
+        """
+        Future, который завершится, когда сеть снова станет доступна
+        Фоновый поток раз в WATCH_INTERVAL сверяет отпечаток сети и по истечении
+        интервала повторной проверки (или при смене сети) проверяет сервер.
+        """
+        future = Future()
+        with self.lock:
+            self.waiters.append(future)
+            if self.watcher is None:
+                self.watcher = threading.Thread(target=self._watch, args=(url,), daemon=True)
+                self.watcher.start()
+        return future
+
+    def _watch(self, url: str):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            with self.lock:
+                if not any(not waiter.done() for waiter in self.waiters):
+                    self.waiters.clear()
+                    self.watcher = None
+                    return
+            if self.is_online(url):
+                with self.lock:
+                    waiters, self.waiters = self.waiters, []
+                    self.watcher = None
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(True)
+                return
+
+
+# Общее состояние сети для всех проверок в процессе
+network_monitor = ConnectivityMonitor()
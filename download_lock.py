@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Согласование загрузки обновления между процессами
+
+Несколько процессов обновления на одной машине (например, Tk и CTk
+интерфейсы или служба рядом с окном) не должны загружать в один
+download_path/myfile.zip одновременно. Загрузку выполняет процесс, взявший
+блокировку download.lock в папке данных приложения; блокировку снимает ядро
+при завершении процесса, поэтому зависших блокировок не бывает.
+
+Владелец пишет ход загрузки в download_status.json и обновляет его не реже
+раза в HEARTBEAT_INTERVAL секунд, в том числе пока проверяет хеш и
+распаковывает архив при неизменном прогрессе. Остальные процессы ждут
+блокировку, показывая прогресс владельца, а затем, если владелец уже
+установил ту же версию в ту же папку, используют его результат без загрузки.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+
+LOCK_FILE_NAME = "download.lock"
+STATUS_FILE_NAME = "download_status.json"
+POLL_INTERVAL = 0.25
+STATUS_WRITE_INTERVAL = 0.2
+HEARTBEAT_INTERVAL = 5.0
+
+
+class DownloadCoordinator:
+    """Блокировка загрузки и файл её состояния в папке данных приложения"""
+
+    def __init__(self, directory: Path, stale_after: float = 600.0):
+        self.directory = Path(directory)
+        self.lock_path = self.directory / LOCK_FILE_NAME
+        self.status_path = self.directory / STATUS_FILE_NAME
+        self.stale_after = stale_after
+        self.lock_file = None
+        self.status: Optional[Dict[str, Any]] = None
+        self.last_write = 0.0
+        self.write_lock = threading.Lock()
+        self.heartbeat_stop: Optional[threading.Event] = None
+
+    def _try_lock(self) -> bool:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, 'a+b')
+        try:
+            if sys.platform == "win32":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def try_acquire(self) -> bool:
+        """Взять блокировку, только если она свободна"""
+        return self._try_lock()
+
+    def acquire(self, on_wait: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+        """
+        Взять блокировку загрузки, дождавшись другого процесса
+        Пока ждём, on_wait получает состояние владельца. Возвращает True,
+        если пришлось ждать. Если владелец дольше stale_after секунд не
+        обновляет состояние (процесс завис или остановлен), ожидание
+        прерывается ошибкой TimeoutError.
+        """
+        if self._try_lock():
+            return False
+        logging.info("Обновление уже загружается (другой процесс или фоновая подготовка), ожидание завершения")
+        wait_started = time.time()
+        while not self._try_lock():
+            status = self.read_status()
+            if status is not None:
+                if on_wait:
+                    on_wait(status)
+                # Состояние могло остаться от прошлой загрузки, а новый владелец ещё не записал своё
+                if time.time() - max(status.get('updated_at', 0), wait_started) > self.stale_after:
+                    raise TimeoutError(f"Процесс {status.get('pid')} не сообщает о ходе загрузки "
+                                       f"больше {self.stale_after:.0f} с")
+            time.sleep(POLL_INTERVAL)
+        return True
+
+    def read_status(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self.status_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def finished(self, version: str, download_path: str) -> bool:
+        """Владелец, которого дождались, установил эту версию в эту папку"""
+        status = self.read_status()
+        return status is not None and status.get('state') == 'done' and status.get('version') == version \
+            and status.get('download_path') == str(Path(download_path).resolve())
+
+    def _write_status(self, force: bool = False):
+        # Пишут поток загрузки и поток пульса
+        with self.write_lock:
+            if self.status is None:
+                return
+            now = time.time()
+            if not force and now - self.last_write < STATUS_WRITE_INTERVAL:
+                return
+            self.status['updated_at'] = now
+            tmp_path = self.status_path.with_name(f"{STATUS_FILE_NAME}.{os.getpid()}.tmp")
+            try:
+                tmp_path.write_text(json.dumps(self.status), encoding='utf-8')
+                os.replace(tmp_path, self.status_path)
+                self.last_write = now
+            except OSError as e:
+                # Файл состояния только для ожидающих процессов: загрузку не прерываем
+                logging.debug(f"Не удалось записать состояние загрузки: {e}")
+
+    def _heartbeat(self, stop: threading.Event):
+        """Обновлять время состояния, пока загрузка не завершена (проверка и распаковка идут при 100%)"""
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            self._write_status(force=True)
+
+    def start(self, version: str, download_path: str):
+        """Начать загрузку (вызывает владелец блокировки)"""
+        self.status = {'pid': os.getpid(), 'version': version, 'state': 'download', 'progress': 0,
+                       'download_path': str(Path(download_path).resolve()), 'started_at': time.time()}
+        self._write_status(force=True)
+        self.heartbeat_stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(self.heartbeat_stop,), name="download-heartbeat",
+                         daemon=True).start()
+
+    def progress(self, value: int):
+        if self.status is not None and value != self.status['progress']:
+            self.status['progress'] = value
+            self._write_status(force=value >= 100)
+
+    def release(self, state: Optional[str] = None):
+        """Записать итог (done или failed) и снять блокировку"""
+        if self.heartbeat_stop is not None:
+            self.heartbeat_stop.set()
+            self.heartbeat_stop = None
+        if self.status is not None and state is not None:
+            self.status['state'] = state
+            self._write_status(force=True)
+        with self.write_lock:
+            self.status = None
+        if self.lock_file is not None:
+            if sys.platform == "win32":
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            # Закрытие файла снимает flock
+            self.lock_file.close()
+            self.lock_file = None
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Симулятор парка клиентов для нагрузочной проверки сервера обновлений
+
+Каждый виртуальный клиент проходит путь приложения: запрос версии, затем
+параллельно хеш и архив (архив хешируется потоком, на диск не пишется)
+и сверка SHA256. Клиенты приходят все сразу (burst), потоком Пуассона
+(poisson) или волнами (staged). Режим asyncio держит тысячи лёгких
+клиентов в одном процессе; режим process запускает настоящие
+UpdateChecker (download_file и verify_hash) в пуле процессов.
+
+Отчёт: процентили задержек (версия, первый байт архива, загрузка, весь
+путь), пропускная способность, доля и причины отказов и загрузка CPU
+процесса сервера (по /proc, только Linux).
+
+Пример:
+    python fleet_sim.py --clients 2000 --arrival poisson --rate 200 --archive-size 16M
+    python fleet_sim.py --url http://server:8001 --server-pid 1234 --clients 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+
+from hashing import parse_hash, StreamHasher
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+DEFAULT_TOKEN = "test-token-123"
+READ_SIZE = 65536
+CPU_SAMPLE_INTERVAL = 0.5
+ARRIVALS = ('burst', 'poisson', 'staged')
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """p50, p90, p99 и максимум (ближайший ранг), мс"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+    return {'p50': round(rank(50) * 1000, 1), 'p90': round(rank(90) * 1000, 1),
+            'p99': round(rank(99) * 1000, 1), 'max': round(ordered[-1] * 1000, 1)}
+
+
+def arrival_times(count: int, pattern: str, rate: float, stages: List[float],
+                  stage_interval: float, seed: int) -> List[float]:
+    """Моменты прихода клиентов от начала симуляции, с"""
+    if pattern == 'burst':
+        return [0.0] * count
+    if pattern == 'poisson':
+        rng = random.Random(seed)
+        times, now = [], 0.0
+        for _ in range(count):
+            times.append(now)
+            now += rng.expovariate(rate)
+        return times
+
+    # staged: доли клиентов приходят волнами через stage_interval
+    total = sum(stages)
+    times = []
+    for i, share in enumerate(stages):
+        wave = round(count * share / total) if i < len(stages) - 1 else count - len(times)
+        times += [i * stage_interval] * wave
+    return times[:count]
+
+
+class CpuSampler:
+    """Загрузка CPU процесса по /proc/<pid>/stat (все потоки процесса)"""
+
+    def __init__(self, pid: int, interval: float = CPU_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.ticks = os.sysconf('SC_CLK_TCK')
+        self.samples: List[float] = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="cpu-sampler", daemon=True)
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(')', 1)[1].split()
+        except OSError:
+            return None
+        # utime и stime - 14 и 15 поля, после имени процесса - 12 и 13
+        return (int(fields[11]) + int(fields[12])) / self.ticks
+
+    def _run(self):
+        previous, previous_time = self.cpu_seconds(), time.monotonic()
+        while not self.stop_event.wait(self.interval):
+            current, now = self.cpu_seconds(), time.monotonic()
+            if current is None or previous is None:
+                return
+            self.samples.append((current - previous) / (now - previous_time) * 100)
+            previous, previous_time = current, now
+
+    def __enter__(self) -> 'CpuSampler':
+        self.start_cpu, self.start_time = self.cpu_seconds(), time.monotonic()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.end_cpu, self.end_time = self.cpu_seconds(), time.monotonic()
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        if self.start_cpu is None or self.end_cpu is None:
+            return None
+        cpu = self.end_cpu - self.start_cpu
+        return {
+            'pid': self.pid,
+            'cpu_seconds': round(cpu, 2),
+            'avg_percent': round(cpu / (self.end_time - self.start_time) * 100, 1),
+            'peak_percent': round(max(self.samples), 1) if self.samples else None,
+        }
+
+
+class Target:
+    """Адреса сервера для клиентов"""
+
+    def __init__(self, base_url: str, token: str):
+        self.base_url = base_url.rstrip('/')
+        parts = urlsplit(self.base_url)
+        if parts.scheme != 'http':
+            raise ValueError("Симулятор поддерживает только http://")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path
+        self.token = token
+
+    def path(self, name: str) -> str:
+        return f"{self.prefix}/{name}"
+
+
+async def http_get(target: Target, path: str, client_id: str, on_first_byte=None, sink=None) -> bytes:
+    """Минимальный HTTP/1.1 GET с Connection: close; тело отдаётся в sink или возвращается"""
+    reader, writer = await asyncio.open_connection(target.host, target.port)
+    try:
+        writer.write((f"GET {path} HTTP/1.1\r\nHost: {target.host}:{target.port}\r\n"
+                      f"Authorization: Bearer {target.token}\r\nX-Client-Id: {client_id}\r\n"
+                      f"Connection: close\r\n\r\n").encode('ascii'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if on_first_byte is not None:
+            on_first_byte()
+        parts = status_line.split(None, 2)
+        if len(parts) < 2:
+            raise ConnectionError("пустой ответ сервера")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if status != 200:
+            raise ConnectionError(f"HTTP {status}")
+
+        length = int(headers['content-length']) if 'content-length' in headers else None
+        body, received = [], 0
+        while length is None or received < length:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if sink is not None:
+                sink(chunk)
+            else:
+                body.append(chunk)
+        if length is not None and received != length:
+            raise ConnectionError(f"обрыв: получено {received} из {length} байт")
+        return b''.join(body)
+    finally:
+        writer.close()
+
+
+async def virtual_client(target: Target, client_id: str, archive_name: str, timeout: float) -> Dict[str, Any]:
+    """Один клиент: версия, затем хеш и архив параллельно, сверка хеша объявленным алгоритмом"""
+    result = {'ok': False, 'bytes': 0}
+    start = time.perf_counter()
+    try:
+        async def flow():
+            await http_get(target, target.path("version.txt"), client_id)
+            result['check'] = time.perf_counter() - start
+
+            download_start = time.perf_counter()
+            hash_task = asyncio.ensure_future(
+                http_get(target, target.path(f"{archive_name}.sha256"), client_id))
+            # Алгоритм известен только после ответа с хешем: до него чанки копятся
+            state = {'hasher': None, 'pending': []}
+
+            def start_hasher():
+                expected = parse_hash(hash_task.result().decode())
+                state['hasher'] = StreamHasher(expected)
+                for chunk in state['pending']:
+                    state['hasher'].update(chunk)
+                state['pending'] = []
+                return expected
+
+            def first_byte():
+                result['ttfb'] = time.perf_counter() - download_start
+
+            def sink(chunk):
+                result['bytes'] += len(chunk)
+                if state['hasher'] is None and hash_task.done() and hash_task.exception() is None:
+                    start_hasher()
+                if state['hasher'] is not None:
+                    state['hasher'].update(chunk)
+                else:
+                    state['pending'].append(chunk)
+
+            try:
+                await http_get(target, target.path(archive_name), client_id, first_byte, sink)
+            finally:
+                await asyncio.gather(hash_task, return_exceptions=True)
+            result['download'] = time.perf_counter() - download_start
+            expected = start_hasher() if state['hasher'] is None else parse_hash(hash_task.result().decode())
+            if not expected.matches(state['hasher'].result()):
+                raise ValueError("хеш не совпадает")
+
+        await asyncio.wait_for(flow(), timeout)
+        result['ok'] = True
+    except asyncio.TimeoutError:
+        result['error'] = 'таймаут'
+    except (OSError, ValueError) as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['total'] = time.perf_counter() - start
+    return result
+
+
+async def run_asyncio(target: Target, arrivals: List[float], archive_name: str, timeout: float) -> List[Dict[str, Any]]:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def arrive(index, at):
+        await asyncio.sleep(max(0.0, started + at - loop.time()))
+        return await virtual_client(target, f"fleet-{index}", archive_name, timeout)
+
+    return await asyncio.gather(*(arrive(i, at) for i, at in enumerate(arrivals)))
+
+
+def checker_client(base_url: str, token: str, archive_name: str, client_id: str,
+                   download_dir: str) -> Dict[str, Any]:
+    """Один клиент на настоящем UpdateChecker (выполняется в процессе пула)"""
+    from updater_core import UpdateChecker
+
+    url = base_url.rstrip('/')
+    settings = {'token': token, 'version_url': f"{url}/version.txt", 'download_url': f"{url}/{archive_name}",
+                'hash_url': f"{url}/{archive_name}.sha256"}
+    result = {'ok': False, 'bytes': 0}
+    start = time.perf_counter()
+    archive_path = Path(download_dir) / f"{client_id}.zip"
+    try:
+        checker = UpdateChecker(settings)
+        checker.session.headers['X-Client-Id'] = client_id
+        response = checker.session.get(settings['version_url'], timeout=10)
+        response.raise_for_status()
+        result['check'] = time.perf_counter() - start
+
+        download_start = time.perf_counter()
+        checker.download_file(settings['download_url'], archive_path)
+        result['download'] = time.perf_counter() - download_start
+        result['ttfb'] = checker.metrics.phases['connect']['duration']
+        result['bytes'] = archive_path.stat().st_size
+        if not checker.verify_hash(archive_path, settings['hash_url'], actual_hash=checker.last_download_hash):
+            raise ValueError("хеш не совпадает")
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        archive_path.unlink(missing_ok=True)
+    result['total'] = time.perf_counter() - start
+    return result
+
+
+def run_processes(target: Target, arrivals: List[float], archive_name: str, workers: int) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="fleet_") as download_dir, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        started = time.monotonic()
+        futures = []
+        for i, at in enumerate(arrivals):
+            delay = started + at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(checker_client, target.base_url, target.token, archive_name,
+                                           f"fleet-{i}", download_dir))
+        for future in futures:
+            results.append(future.result())
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(root: Optional[Path], server_args: List[str]) -> tuple:
+    """Запустить simple_server.py отдельным процессом; возвращает (процесс, базовый URL)"""
+    port = free_port()
+    command = [sys.executable, str(PROJECT_DIR / "simple_server.py"), "--port", str(port), "--quiet", *server_args]
+    if root is not None:
+        command += ["--root", str(root)]
+    process = subprocess.Popen(command, cwd=PROJECT_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, f"http://localhost:{port}"
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Тестовый сервер не запустился")
+
+
+def summarize(results: List[Dict[str, Any]], wall: float) -> Dict[str, Any]:
+    ok = [r for r in results if r['ok']]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r['ok']:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+    total_bytes = sum(r['bytes'] for r in results)
+    return {
+        'clients': len(results),
+        'succeeded': len(ok),
+        'failure_rate': round(1 - len(ok) / len(results), 4) if results else 0,
+        'errors': dict(sorted(errors.items(), key=lambda item: -item[1])),
+        'wall_seconds': round(wall, 2),
+        'throughput_mb_per_s': round(total_bytes / wall / 1024 ** 2, 2) if wall > 0 else None,
+        'completed_per_s': round(len(ok) / wall, 2) if wall > 0 else None,
+        'latency_ms': {
+            'check': percentiles([r['check'] for r in results if 'check' in r]),
+            'ttfb': percentiles([r['ttfb'] for r in results if 'ttfb' in r]),
+            'download': percentiles([r['download'] for r in ok]),
+            'total': percentiles([r['total'] for r in ok]),
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("")
+    print(f"👥 Клиентов: {report['clients']}, успешно: {report['succeeded']}, "
+          f"отказов: {report['failure_rate'] * 100:.2f}%")
+    print(f"⏱️  Длительность: {report['wall_seconds']} с, {report['completed_per_s']} обновлений/с, "
+          f"{report['throughput_mb_per_s']} МБ/с")
+    for name, stats in report['latency_ms'].items():
+        if stats:
+            print(f"   {name:<9} p50={stats['p50']} мс  p90={stats['p90']} мс  "
+                  f"p99={stats['p99']} мс  max={stats['max']} мс")
+    for error, count in list(report['errors'].items())[:5]:
+        print(f"   ❌ {count} × {error}")
+    cpu = report.get('server_cpu')
+    if cpu:
+        print(f"🖥️  CPU сервера (pid {cpu['pid']}): {cpu['cpu_seconds']} с, в среднем {cpu['avg_percent']}%, "
+              f"пик {cpu['peak_percent']}% одного ядра")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа симулятора"""
+    parser = argparse.ArgumentParser(description="Нагрузочная симуляция парка клиентов обновления")
+    parser.add_argument("--clients", type=int, default=200, help="количество клиентов (по умолчанию: 200)")
+    parser.add_argument("--mode", choices=('asyncio', 'process'), default='asyncio',
+                        help="asyncio - лёгкие клиенты, process - UpdateChecker в пуле процессов")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="процессов в режиме process")
+    parser.add_argument("--arrival", choices=ARRIVALS, default='burst', help="как приходят клиенты")
+    parser.add_argument("--rate", type=float, default=50, help="клиентов в секунду для poisson")
+    parser.add_argument("--stages", type=float, nargs='+', default=[0.1, 0.3, 0.6],
+                        help="доли клиентов в волнах для staged (по умолчанию: 0.1 0.3 0.6)")
+    parser.add_argument("--stage-interval", type=float, default=10, help="интервал между волнами, с")
+    parser.add_argument("--timeout", type=float, default=120, help="таймаут одного клиента, с")
+    parser.add_argument("--seed", type=int, default=1, help="seed для потока Пуассона")
+    parser.add_argument("--url", default=None,
+                        help="адрес работающего сервера (папка с version.txt и архивом); иначе запускается свой")
+    parser.add_argument("--server-pid", type=int, default=None, help="pid сервера для замера CPU при --url")
+    parser.add_argument("--root", default=None, help="папка релизов для запускаемого сервера")
+    parser.add_argument("--archive-size", default=None,
+                        help="сгенерировать архив такого размера для запускаемого сервера (например, 16M)")
+    parser.add_argument("--server-arg", action='append', default=[],
+                        help="дополнительный аргумент simple_server.py (например, --server-arg=--latency=50)")
+    parser.add_argument("--archive-name", default="myfile.zip", help="имя архива на сервере")
+    parser.add_argument("--token", default=DEFAULT_TOKEN, help="токен авторизации")
+    parser.add_argument("--output", default=None, help="файл для отчёта в JSON")
+    args = parser.parse_args(argv)
+
+    arrivals = arrival_times(args.clients, args.arrival, args.rate, args.stages, args.stage_interval, args.seed)
+    server_process = None
+    work_dir = None
+    try:
+        base_url = args.url
+        server_pid = args.server_pid
+        if base_url is None:
+            root = Path(args.root) if args.root else None
+            prefix = ""
+            if args.archive_size:
+                from bench_pipeline import parse_size, prepare_case
+
+                work_dir = tempfile.mkdtemp(prefix="fleet_release_")
+                case = prepare_case(Path(work_dir), parse_size(args.archive_size), 'large', 'deflated', 4, 0)
+                root, prefix = Path(work_dir), f"/releases/{case['name']}"
+            server_process, base_url = start_server(root, args.server_arg)
+            base_url += prefix
+            server_pid = server_process.pid
+        target = Target(base_url, args.token)
+
+        print(f"🚀 {args.clients} клиентов ({args.mode}, {args.arrival}) → {target.base_url}")
+        sampler = CpuSampler(server_pid) if server_pid and Path(f"/proc/{server_pid}").exists() else None
+        start = time.perf_counter()
+        with sampler or nullcontext():
+            if args.mode == 'asyncio':
+                results = asyncio.run(run_asyncio(target, arrivals, args.archive_name, args.timeout))
+            else:
+                results = run_processes(target, arrivals, args.archive_name, args.workers)
+        wall = time.perf_counter() - start
+
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'mode': args.mode,
+            'arrival': args.arrival,
+            'url': target.base_url,
+            **summarize(results, wall),
+            'server_cpu': sampler.report() if sampler else None,
+        }
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"💾 Отчёт сохранён: {args.output}")
+    return 0 if report['succeeded'] == report['clients'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хеширование архивов обновлений
+
+Алгоритм объявляется в файле хеша (hash_url) и в манифесте строкой вида
+    <hex>                          - SHA256 (прежний формат)
+    sha256:<hex>, blake2b:<hex>    - явный алгоритм
+    blake3:<hex>                   - если установлен пакет blake3
+    sha256-tree-4194304:<hex>      - дерево хешей с листьями по 4 МБ
+
+В режиме дерева файл делится на листья фиксированного размера, листья
+хешируются параллельно в пуле потоков (hashlib отпускает GIL на больших
+блоках), корень - хеш от списка хешей листьев:
+    лист  = H(0x00 || данные листа)
+    корень = H(0x01 || хеш листа 1 || ... || хеш листа N)
+
+Хеши листьев публикуются в манифесте (поле chunks), и клиент проверяет
+каждый чанк архива по мере загрузки, а повреждённый загружает заново.
+"""
+
+import hashlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+try:
+    import blake3
+except ImportError:  # необязательная зависимость
+    blake3 = None
+
+
+DEFAULT_ALGORITHM = 'sha256'
+DEFAULT_LEAF_SIZE = 4 * 1024 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+TREE_MARKER = '-tree-'
+
+
+def available_algorithms() -> List[str]:
+    """Алгоритмы, доступные в этой установке"""
+    algorithms = ['sha256', 'blake2b']
+    if blake3 is not None:
+        algorithms.append('blake3')
+    return algorithms
+
+
+def new_hasher(algorithm: str, threads: bool = False):
+    """Новый объект хеша (update/digest/hexdigest)"""
+    if algorithm == 'sha256':
+        return hashlib.sha256()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b()
+    if algorithm == 'blake3':
+        if blake3 is None:
+            raise ValueError("Алгоритм blake3 недоступен: установите пакет blake3")
+        # BLAKE3 сам распараллеливает хеширование больших буферов
+        return blake3.blake3(max_threads=blake3.blake3.AUTO) if threads else blake3.blake3()
+    raise ValueError(f"Неизвестный алгоритм хеша: {algorithm}")
+
+
+def default_workers() -> int:
+    return min(8, os.cpu_count() or 1)
+
+
+class HashSpec:
+    """Объявленный хеш: алгоритм, размер листа дерева (0 - без дерева) и значение"""
+
+    def __init__(self, algorithm: str = DEFAULT_ALGORITHM, leaf_size: int = 0, digest: Optional[str] = None):
+        if algorithm not in ('sha256', 'blake2b', 'blake3'):
+            raise ValueError(f"Неизвестный алгоритм хеша: {algorithm}")
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.digest = digest.lower() if digest else None
+
+    @property
+    def scheme(self) -> str:
+        """Алгоритм и режим без значения, например 'sha256' или 'blake2b-tree-4194304'"""
+        return f"{self.algorithm}{TREE_MARKER}{self.leaf_size}" if self.leaf_size else self.algorithm
+
+    def with_digest(self, digest: str) -> 'HashSpec':
+        return HashSpec(self.algorithm, self.leaf_size, digest)
+
+    def matches(self, other: 'HashSpec') -> bool:
+        """Оба хеша посчитаны одним способом и совпадают"""
+        return self.scheme == other.scheme and self.digest is not None and self.digest == other.digest
+
+    def __str__(self) -> str:
+        return f"{self.scheme}:{self.digest}"
+
+    def __repr__(self) -> str:
+        return f"HashSpec({self})"
+
+
+def parse_hash(text: str) -> HashSpec:
+    """
+    Разобрать объявление хеша
+    Поддерживается и вывод sha256sum ("<hex>  <имя файла>").
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("Пустой хеш")
+    token = text.split()[0]
+    scheme, _, digest = token.rpartition(':')
+    if not scheme:
+        scheme = DEFAULT_ALGORITHM
+    try:
+        int(digest, 16)
+    except ValueError:
+        raise ValueError(f"Неверное значение хеша: {token}")
+
+    algorithm, marker, leaf_size = scheme.lower().partition(TREE_MARKER)
+    return HashSpec(algorithm, int(leaf_size) if marker else 0, digest)
+
+
+def manifest_hashes(manifest: dict) -> List[HashSpec]:
+    """Хеши архива из манифеста: объявление 'hash' и прежнее поле 'sha256'"""
+    hashes = []
+    if manifest.get('hash'):
+        hashes.append(parse_hash(manifest['hash']))
+    if manifest.get('sha256'):
+        hashes.append(HashSpec(DEFAULT_ALGORITHM, 0, manifest['sha256']))
+    return hashes
+
+
+def hash_leaf(algorithm: str, data) -> bytes:
+    """Хеш листа дерева"""
+    hasher = new_hasher(algorithm)
+    hasher.update(LEAF_PREFIX)
+    hasher.update(data)
+    return hasher.digest()
+
+
+def tree_root(algorithm: str, leaf_digests: List[bytes]) -> str:
+    """Корень дерева по хешам листьев"""
+    hasher = new_hasher(algorithm)
+    hasher.update(NODE_PREFIX)
+    for digest in leaf_digests:
+        hasher.update(digest)
+    return hasher.hexdigest()
+
+
+class StreamHasher:
+    """
+    Хеширование потока данных по мере поступления (при загрузке)
+    В режиме дерева листья хешируются последовательно, как только набраны.
+    """
+
+    def __init__(self, spec: HashSpec):
+        self.spec = spec
+        self.leaf_digests: List[bytes] = []
+        if spec.leaf_size:
+            self.buffer = bytearray()
+        else:
+            self.hasher = new_hasher(spec.algorithm)
+
+    def update(self, data: bytes):
+        if not self.spec.leaf_size:
+            self.hasher.update(data)
+            return
+        self.buffer += data
+        leaf_size = self.spec.leaf_size
+        if len(self.buffer) >= leaf_size:
+            view = memoryview(self.buffer)
+            full = len(self.buffer) // leaf_size * leaf_size
+            for start in range(0, full, leaf_size):
+                self.leaf_digests.append(hash_leaf(self.spec.algorithm, view[start:start + leaf_size]))
+            view.release()
+            del self.buffer[:full]
+
+    def result(self) -> HashSpec:
+        """Итоговый хеш (поток больше не дополняется)"""
+        if not self.spec.leaf_size:
+            return self.spec.with_digest(self.hasher.hexdigest())
+        if self.buffer or not self.leaf_digests:
+            self.leaf_digests.append(hash_leaf(self.spec.algorithm, bytes(self.buffer)))
+            self.buffer = bytearray()
+        return self.spec.with_digest(tree_root(self.spec.algorithm, self.leaf_digests))
+
+
+def leaf_digests(path: Path, algorithm: str, leaf_size: int, workers: Optional[int] = None) -> List[bytes]:
+    """Хеши листьев файла, посчитанные параллельно"""
+    path = Path(path)
+    size = path.stat().st_size
+    offsets = list(range(0, size, leaf_size)) or [0]
+    workers = workers or default_workers()
+
+    fd = None
+    files = []
+    if hasattr(os, 'pread'):
+        fd = os.open(path, os.O_RDONLY)
+
+        def hash_at(offset):
+            return hash_leaf(algorithm, os.pread(fd, leaf_size, offset))
+    else:
+        # Без pread (Windows) у каждого потока свой дескриптор и своя позиция
+        local = threading.local()
+
+        def hash_at(offset):
+            if not hasattr(local, 'file'):
+                local.file = open(path, 'rb')
+                files.append(local.file)
+            local.file.seek(offset)
+            return hash_leaf(algorithm, local.file.read(leaf_size))
+
+    digests = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as executor:
+            # Не больше 2 листов на поток в памяти одновременно
+            pending = deque()
+            for offset in offsets:
+                pending.append(executor.submit(hash_at, offset))
+                if len(pending) >= workers * 2:
+                    digests.append(pending.popleft().result())
+            while pending:
+                digests.append(pending.popleft().result())
+    finally:
+        if fd is not None:
+            os.close(fd)
+        for f in files:
+            f.close()
+    return digests
+
+
+def hash_file(path: Path, spec: HashSpec, workers: Optional[int] = None) -> HashSpec:
+    """Посчитать хеш файла тем же способом, что и spec"""
+    if spec.leaf_size:
+        return spec.with_digest(tree_root(spec.algorithm, leaf_digests(path, spec.algorithm, spec.leaf_size, workers)))
+
+    hasher = new_hasher(spec.algorithm, threads=True)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            hasher.update(chunk)
+    return spec.with_digest(hasher.hexdigest())
+
+
+def chunk_table(leaf_size: int, algorithm: str, digests: List[bytes]) -> Dict[str, Any]:
+    """Поле chunks манифеста: хеши листьев дерева"""
+    return {'algorithm': algorithm, 'size': leaf_size, 'hashes': [digest.hex() for digest in digests]}
+
+
+class ChunkVerifier:
+    """
+    Проверка архива по хешам чанков из манифеста по мере загрузки
+    Чанк - лист дерева хешей; список хешей сверяется с корнем из объявления
+    хеша, поэтому подменить его, не меняя хеш архива, нельзя.
+    """
+
+    def __init__(self, algorithm: str, chunk_size: int, expected: List[bytes]):
+        if chunk_size <= 0 or not expected:
+            raise ValueError("Неверная таблица чанков в манифесте")
+        self.algorithm = algorithm
+        self.chunk_size = chunk_size
+        self.expected = expected
+        self.index = 0
+        self.filled = 0
+        self.hasher = self._new_leaf()
+
+    @classmethod
+    def from_manifest(cls, manifest: Dict[str, Any], expected: Optional[HashSpec]) -> Optional['ChunkVerifier']:
+        """
+        Проверка по полю chunks манифеста или None, если его нет
+        Хеши чанков используются, только если их корень совпадает с хешем архива
+        expected (из hash_url); иначе (другой способ хеширования, другой корень,
+        хеш неизвестен) - None, и архив проверяется целиком.
+        """
+        table = manifest.get('chunks')
+        if not table or expected is None:
+            return None
+        verifier = cls(table['algorithm'], int(table['size']), [bytes.fromhex(h) for h in table['hashes']])
+        if not verifier.spec().matches(expected):
+            return None
+        if manifest.get('size') is not None and \
+                len(verifier.expected) != max(1, -(-manifest['size'] // verifier.chunk_size)):
+            raise ValueError("Число чанков в манифесте не совпадает с размером архива")
+        return verifier
+
+    def spec(self) -> HashSpec:
+        """Хеш архива, который дают эти чанки (корень дерева)"""
+        return HashSpec(self.algorithm, self.chunk_size, tree_root(self.algorithm, self.expected))
+
+    def _new_leaf(self):
+        hasher = new_hasher(self.algorithm)
+        hasher.update(LEAF_PREFIX)
+        return hasher
+
+    def _complete(self, bad: List[int]):
+        if self.index >= len(self.expected) or self.hasher.digest() != self.expected[self.index]:
+            bad.append(self.index)
+        self.index += 1
+        self.filled = 0
+        self.hasher = self._new_leaf()
+
+    def update(self, data: bytes) -> List[int]:
+        """Добавить данные потока; возвращает номера завершённых чанков, не прошедших проверку"""
+        bad: List[int] = []
+        view = memoryview(data)
+        while view:
+            size = min(len(view), self.chunk_size - self.filled)
+            self.hasher.update(view[:size])
+            self.filled += size
+            view = view[size:]
+            if self.filled == self.chunk_size:
+                self._complete(bad)
+        return bad
+
+    def finish(self) -> List[int]:
+        """Завершить поток; возвращает номера непрошедших чанков (включая недостающие)"""
+        bad: List[int] = []
+        if self.filled or self.index == 0:
+            self._complete(bad)
+        if self.index != len(self.expected):
+            raise ValueError(f"Архив состоит из {self.index} чанков, по манифесту - {len(self.expected)}")
+        return bad
+
+    def chunk_range(self, index: int) -> tuple:
+        """Смещения первого и последнего байта чанка"""
+        start = index * self.chunk_size
+        return start, start + self.chunk_size - 1
+
+    def verify_chunk(self, index: int, data: bytes) -> bool:
+        return index < len(self.expected) and hash_leaf(self.algorithm, data) == self.expected[index]
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Индекс установленных файлов
+
+В папке данных приложения хранится SQLite база install_index.sqlite3: для
+каждого файла, распакованного из архива обновления, запомнены размер, время
+изменения, SHA256 и CRC32 записи архива. Индекс заполняется во время
+распаковки (хеш считается по ходу записи) и обновляется после выборочной
+загрузки и обновления по чанкам.
+
+Проверка (verify) делает stat каждого файла и хеширует параллельно только
+те, у которых изменились размер или время; файл с изменённым размером
+повреждён без хеширования. Восстановление (repair) загружает заново только
+повреждённые файлы через HTTP Range (remote_zip.download_members) или из
+локального архива, если он содержит ту же версию файла (по CRC32).
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
+
+
+INSTALL_INDEX_NAME = "install_index.sqlite3"
+SCHEMA_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS installs (
+    root TEXT PRIMARY KEY,
+    version TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    crc32 INTEGER,
+    PRIMARY KEY (root, path)
+);
+"""
+
+# Запись индекса: (путь внутри установки, размер, mtime_ns, SHA256, CRC32)
+FileRecord = Tuple[str, int, int, str, Optional[int]]
+
+
+def file_digest(path: Path) -> str:
+    """SHA256 файла"""
+    sha256_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def _safe_target(root: str, name: str) -> str:
+    target = os.path.normpath(os.path.join(root, name))
+    if not target.startswith(root + os.sep):
+        raise ValueError(f"Недопустимый путь в архиве: {name}")
+    return target
+
+
+def extract_entries(zip_ref: zipfile.ZipFile, infos: Iterable[zipfile.ZipInfo],
+                    extract_path: Path) -> Tuple[List[FileRecord], int]:
+    """
+    Распаковать записи архива, считая SHA256 каждого файла по ходу записи
+    Возвращает записи для индекса и объём распакованных данных.
+    """
+    extract_path.mkdir(parents=True, exist_ok=True)
+    root = os.path.abspath(extract_path)
+    created = {root}
+    records = []
+    extracted = 0
+    for info in infos:
+        target = _safe_target(root, info.filename)
+        directory = target if info.is_dir() else os.path.dirname(target)
+        if directory not in created:
+            os.makedirs(directory, exist_ok=True)
+            created.add(directory)
+        if info.is_dir():
+            continue
+        sha256_hash = hashlib.sha256()
+        with zip_ref.open(info) as src, open(target, 'wb') as dst:
+            for chunk in iter(lambda: src.read(HASH_BLOCK_SIZE), b""):
+                sha256_hash.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            stat = os.fstat(dst.fileno())
+        records.append((info.filename, stat.st_size, stat.st_mtime_ns, sha256_hash.hexdigest(), info.CRC))
+        extracted += info.file_size
+    return records, extracted
+
+
+def extract_with_index(archive_path: Path, extract_path: Path) -> Tuple[List[FileRecord], int]:
+    """Распаковать весь архив (см. extract_entries)"""
+    with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+        return extract_entries(zip_ref, zip_ref.infolist(), extract_path)
+
+
+def describe_file(root: Path, name: str) -> Optional[FileRecord]:
+    """Запись индекса для файла на диске (None, если файла нет)"""
+    path = root / name
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    crc = 0
+    sha256_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256_hash.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+    return name, stat.st_size, stat.st_mtime_ns, sha256_hash.hexdigest(), crc & 0xFFFFFFFF
+
+
+class InstallIndex:
+    """Индекс установленных файлов в SQLite (соединение на каждую операцию)"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS installs;" + SCHEMA)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(root: Path) -> str:
+        return str(Path(root).resolve())
+
+    def record_install(self, root: Path, version: Optional[str], records: Iterable[FileRecord]):
+        """Записать полную установку: прежние записи этой папки заменяются"""
+        key = self._key(root)
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM files WHERE root = ?", (key,))
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                             [(key,) + tuple(record) for record in records])
+            conn.execute("INSERT OR REPLACE INTO installs VALUES (?, ?, ?)", (key, version, time.time()))
+
+    def update_files(self, root: Path, names: Iterable[str], version: Optional[str] = None):
+        """Обновить записи файлов, изменённых на месте (хеши считаются с диска)"""
+        key = self._key(root)
+        updated, removed = [], []
+        for name in names:
+            record = describe_file(Path(root), name)
+            if record is None:
+                removed.append((key, name))
+            else:
+                updated.append((key,) + record)
+        with self.lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", updated)
+            conn.executemany("DELETE FROM files WHERE root = ? AND path = ?", removed)
+            if version is not None:
+                conn.execute("INSERT OR REPLACE INTO installs VALUES (?, ?, ?)", (key, version, time.time()))
+
+    def install_info(self, root: Path) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT version, updated_at FROM installs WHERE root = ?",
+                               (self._key(root),)).fetchone()
+        return {'version': row[0], 'updated_at': row[1]} if row else None
+
+    def entries(self, root: Path) -> Dict[str, Dict[str, Any]]:
+        """Записи установленных файлов: путь -> размер, mtime_ns, sha256, crc32"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, size, mtime_ns, sha256, crc32 FROM files WHERE root = ?",
+                                (self._key(root),)).fetchall()
+        return {path: {'size': size, 'mtime_ns': mtime_ns, 'sha256': sha256, 'crc32': crc32}
+                for path, size, mtime_ns, sha256, crc32 in rows}
+
+    def verify_against(self, root: Path, expected: Dict[str, str], workers: Optional[int] = None) -> List[str]:
+        """
+        Файлы установки, не совпадающие с ожидаемыми SHA256 (путь -> sha256)
+        Для файлов с прежними размером и временем берётся хеш из индекса,
+        остальные хешируются параллельно. Отсутствующие файлы тоже в списке.
+        """
+        root = Path(root)
+        entries = self.entries(root)
+        mismatched, suspects = [], []
+        for name, sha256 in expected.items():
+            try:
+                stat = (root / name).stat()
+            except OSError:
+                mismatched.append(name)
+                continue
+            entry = entries.get(name)
+            if entry is not None and stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                if entry['sha256'] != sha256:
+                    mismatched.append(name)
+            else:
+                suspects.append(name)
+
+        def check(name):
+            try:
+                return name, file_digest(root / name) == expected[name]
+            except OSError:
+                return name, False
+
+        if suspects:
+            with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1),
+                                    thread_name_prefix="verify") as executor:
+                mismatched += [name for name, valid in executor.map(check, suspects) if not valid]
+        return sorted(mismatched)
+
+    def verify(self, root: Path, workers: Optional[int] = None, deep: bool = False) -> Dict[str, Any]:
+        """
+        Проверить установленные файлы по индексу
+        Хешируются только файлы с изменённым временем (deep - все файлы).
+        Файлы, совпавшие по хешу, получают в индексе новое время, чтобы
+        следующая проверка их не хешировала.
+        """
+        root = Path(root)
+        entries = self.entries(root)
+        missing, modified, suspects = [], [], []
+        for name, entry in entries.items():
+            try:
+                stat = (root / name).stat()
+            except OSError:
+                missing.append(name)
+                continue
+            if stat.st_size != entry['size']:
+                modified.append(name)
+            elif deep or stat.st_mtime_ns != entry['mtime_ns']:
+                suspects.append((name, stat.st_mtime_ns))
+
+        def check(item):
+            name, mtime_ns = item
+            try:
+                return name, mtime_ns, file_digest(root / name) == entries[name]['sha256']
+            except OSError:
+                return name, mtime_ns, False
+
+        touched = []
+        if suspects:
+            with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1),
+                                    thread_name_prefix="verify") as executor:
+                for name, mtime_ns, valid in executor.map(check, suspects):
+                    if valid:
+                        if mtime_ns != entries[name]['mtime_ns']:
+                            touched.append((mtime_ns, self._key(root), name))
+                    else:
+                        modified.append(name)
+        if touched:
+            with self.lock, self._connect() as conn:
+                conn.executemany("UPDATE files SET mtime_ns = ? WHERE root = ? AND path = ?", touched)
+
+        return {
+            'files': len(entries),
+            'hashed': len(suspects),
+            'missing': sorted(missing),
+            'modified': sorted(modified),
+            'broken': sorted(missing + modified),
+        }
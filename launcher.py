@@ -2,121 +2,220 @@
 # -*- coding: utf-8 -*-
 """
 Лаунчер для выбора версии интерфейса Python Updater
+
+Доступность библиотек проверяется через importlib.util.find_spec без импорта,
+выбранная версия запускается в этом же процессе через свою главную функцию.
+Последний выбор запоминается, повторный запуск открывает его сразу
+(меню можно вызвать флагом --menu).
 """
 
+import argparse
+import importlib
+import json
 import subprocess
 import sys
+from importlib.util import find_spec
 from pathlib import Path
+from typing import Dict, List, Optional
+
+
+LAUNCHER_FILE_NAME = "launcher.json"
+
+# Версии интерфейса: модуль, главная функция и требуемая библиотека
+FRONT_ENDS = {
+    'tkinter': {'title': "Tkinter", 'module': 'main', 'entry': 'main', 'requires': 'tkinter'},
+    'customtkinter': {'title': "CustomTkinter", 'module': 'main_ctk', 'entry': 'main_ctk',
+                      'requires': 'customtkinter'},
+    'dearpygui': {'title': "DearPyGui", 'module': 'main_dpg', 'entry': 'main_dpg',
+                  'requires': 'dearpygui'},
+}
+
+
+def check_dependencies() -> Dict[str, bool]:
+    """Проверка установленных зависимостей (без импорта библиотек)"""
+    return {name: find_spec(front_end['requires']) is not None
+            for name, front_end in FRONT_ENDS.items()}
+
 
-def check_dependencies():
-    """Проверка установленных зависимостей"""
-    dependencies = {
-        'tkinter': True,  # Встроен в Python
-        'customtkinter': False,
-        'dearpygui': False
-    }
-    
+def launcher_file() -> Optional[Path]:
+    """Файл с последним выбором лаунчера (в папке данных приложения)"""
+    if find_spec('appdirs') is None:
+        return None
+    import appdirs
+    from updater_core import Config
+
+    return Path(appdirs.user_data_dir(Config.APP_NAME, Config.APP_AUTHOR)) / LAUNCHER_FILE_NAME
+
+
+def load_last_choice() -> Optional[str]:
+    """Загрузить последний выбранный интерфейс"""
+    path = launcher_file()
+    if path is None or not path.exists():
+        return None
     try:
-        import customtkinter
-        dependencies['customtkinter'] = True
-    except ImportError:
-        pass
-    
+        choice = json.loads(path.read_text(encoding='utf-8')).get('front_end')
+    except Exception:
+        return None
+    return choice if choice in FRONT_ENDS else None
+
+
+def save_last_choice(name: str):
+    """Запомнить выбранный интерфейс"""
+    path = launcher_file()
+    if path is None:
+        return
     try:
-        import dearpygui
-        dependencies['dearpygui'] = True
-    except ImportError:
-        pass
-    
-    return dependencies
-
-def main():
-    """Главная функция лаунчера"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({'front_end': name}), encoding='utf-8')
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить выбор: {e}")
+
+
+def run_front_end(name: str):
+    """Запустить версию интерфейса в текущем процессе"""
+    front_end = FRONT_ENDS[name]
+    print(f"🚀 Запуск {front_end['title']}...")
+    module = importlib.import_module(front_end['module'])
+    getattr(module, front_end['entry'])()
+
+
+def show_menu(deps: Dict[str, bool]) -> Optional[str]:
+    """Показать меню и вернуть выбранный интерфейс (None - интерфейс не запускается)"""
     print("🚀 " + "=" * 50 + " 🚀")
     print("      PYTHON UPDATER - ВЫБОР ИНТЕРФЕЙСА")
     print("🚀 " + "=" * 50 + " 🚀")
     print()
-    
-    # Проверяем зависимости
-    deps = check_dependencies()
-    
+
     print("📋 Доступные версии интерфейса:")
     print()
-    
-    options = []
-    
-    # Tkinter (всегда доступен)
+
+    # Tkinter
     print("1. 🔶 Tkinter (Классический)")
-    print("   ✅ Готов к использованию")
-    options.append(('tkinter', 'python main.py'))
-    
+    if deps['tkinter']:
+        print("   ✅ Готов к использованию")
+    else:
+        print("   ❌ Не установлен (пакет python3-tk)")
+
     # CustomTkinter
     if deps['customtkinter']:
         print("2. 🔷 CustomTkinter (Современный) ⭐ Рекомендуется")
         print("   ✅ Готов к использованию")
-        options.append(('customtkinter', 'python main_ctk.py --ctk'))
     else:
         print("2. 🔷 CustomTkinter (Современный)")
         print("   ❌ Не установлен (pip install customtkinter)")
-    
+
     # DearPyGui
+    print("3. 🔵 DearPyGui (Игровой)")
     if deps['dearpygui']:
-        print("3. 🔵 DearPyGui (Игровой)")
         print("   ✅ Готов к использованию")
-        options.append(('dearpygui', 'python main_dpg.py --dpg'))
     else:
-        print("3. 🔵 DearPyGui (Игровой)")
         print("   ❌ Не установлен (pip install dearpygui)")
-    
+
     print()
     print("4. 🧪 Запустить тестовый сервер")
     print("5. 🔧 Установить все зависимости")
     print("0. ❌ Выход")
     print()
-    
+
+    choice = input("Выберите опцию (0-5): ").strip()
+
+    if choice == "0":
+        print("👋 До свидания!")
+
+    elif choice in ("1", "2", "3"):
+        name = list(FRONT_ENDS)[int(choice) - 1]
+        if deps[name]:
+            return name
+        print(f"❌ {FRONT_ENDS[name]['title']} не установлен!")
+        if name != 'tkinter':
+            print(f"Выполните: pip install {FRONT_ENDS[name]['requires']}")
+
+    elif choice == "4":
+        print("🧪 Запуск тестового сервера...")
+        subprocess.run([sys.executable, 'simple_server.py'], cwd=Path(__file__).resolve().parent)
+
+    elif choice == "5":
+        print("🔧 Установка всех зависимостей...")
+        subprocess.run([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'],
+                       cwd=Path(__file__).resolve().parent)
+        print("✅ Готово! Запустите лаунчер снова.")
+
+    else:
+        print("❌ Неверный выбор!")
+
+    return None
+
+
+def run_maintenance(repair: bool, deep: bool) -> int:
+    """Проверить (или восстановить) установленные файлы без интерфейса"""
+    from updater_core import AppDataManager, UpdateChecker
+
+    checker = UpdateChecker(AppDataManager().load_settings())
+    try:
+        result = checker.repair_install(deep) if repair else checker.verify_install(deep)
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print(f"🔍 Проверено файлов: {result['files']}, хешировано: {result['hashed']}")
+    for name in result['missing']:
+        print(f"   ❌ отсутствует: {name}")
+    for name in result['modified']:
+        print(f"   ⚠️ изменён: {name}")
+    if repair:
+        print(f"🔧 Восстановлено: {len(result['repaired'])}, не удалось: {len(result['unrepaired'])}")
+        return 1 if result['unrepaired'] else 0
+    if not result['broken']:
+        print("✅ Установленные файлы в порядке")
+    return 1 if result['broken'] else 0
+
+
+def main(argv: Optional[List[str]] = None):
+    """Главная функция лаунчера"""
+    parser = argparse.ArgumentParser(description="Лаунчер Python Updater")
+    parser.add_argument("--menu", action="store_true", help="показать меню выбора интерфейса")
+    parser.add_argument("--profile", action="store_true",
+                        help="профилировать первое обновление (cProfile и tracemalloc, отчёт в папке данных)")
+    parser.add_argument("--verify", action="store_true",
+                        help="проверить установленные файлы по индексу установки и выйти")
+    parser.add_argument("--repair", action="store_true",
+                        help="загрузить заново повреждённые установленные файлы и выйти")
+    parser.add_argument("--deep", action="store_true",
+                        help="для --verify/--repair: хешировать все файлы, а не только с изменённым временем")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        import os
+        from profiling import PROFILE_ENV
+        os.environ[PROFILE_ENV] = "1"
+
+    if args.verify or args.repair:
+        return run_maintenance(args.repair, args.deep)
+
+    # Проверяем зависимости
+    deps = check_dependencies()
+
     try:
-        choice = input("Выберите опцию (0-5): ").strip()
-        
-        if choice == "0":
-            print("👋 До свидания!")
-            return
-        
-        elif choice == "1" and len(options) >= 1:
-            print(f"🚀 Запуск {options[0][0]}...")
-            subprocess.run(options[0][1], shell=True)
-        
-        elif choice == "2":
-            if deps['customtkinter'] and len(options) >= 2:
-                print(f"🚀 Запуск CustomTkinter...")
-                subprocess.run('python main_ctk.py --ctk', shell=True)
-            else:
-                print("❌ CustomTkinter не установлен!")
-                print("Выполните: pip install customtkinter")
-        
-        elif choice == "3":
-            if deps['dearpygui']:
-                print(f"🚀 Запуск DearPyGui...")
-                subprocess.run('python main_dpg.py --dpg', shell=True)
-            else:
-                print("❌ DearPyGui не установлен!")
-                print("Выполните: pip install dearpygui")
-        
-        elif choice == "4":
-            print("🧪 Запуск тестового сервера...")
-            subprocess.run('python simple_server.py', shell=True)
-        
-        elif choice == "5":
-            print("🔧 Установка всех зависимостей...")
-            subprocess.run('pip install -r requirements.txt', shell=True)
-            print("✅ Готово! Запустите лаунчер снова.")
-        
+        last_choice = None if args.menu else load_last_choice()
+        if last_choice and deps[last_choice]:
+            print(f"ℹ️ Последний выбор: {FRONT_ENDS[last_choice]['title']} "
+                  f"(меню: python launcher.py --menu)")
+            name = last_choice
         else:
-            print("❌ Неверный выбор!")
-    
+            name = show_menu(deps)
+            if name is None:
+                return
+            save_last_choice(name)
+
+        run_front_end(name)
+
     except KeyboardInterrupt:
         print("\n👋 До свидания!")
     except Exception as e:
         print(f"❌ Ошибка: {e}")
 
 if __name__ == "__main__":
-    main()
+    # Процессы пула (разбиение на чанки) в собранном приложении запускают этот же exe
+    from multiprocessing import freeze_support
+    freeze_support()
+    sys.exit(main())
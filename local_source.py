@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальные источники обновления: пути, file:// и офлайн-пакеты
+
+Адреса версии, архива и хеша могут быть путями файловой системы (в том числе
+сетевыми шарами \\\\server\\share\\...) или URL file://. Такие источники читаются
+без HTTP: архив копируется средствами ядра (copy_file_range, затем sendfile),
+а если они недоступны - через mmap без промежуточного буфера.
+
+Офлайн-пакет - один файл для изолированных площадок: ZIP без сжатия с
+version.txt, myfile.zip, myfile.zip.sha256 и manifest.json последнего релиза
+(python publish.py ... --bundle update.zip). Архив копируется прямо из
+пакета по смещению, без распаковки.
+"""
+
+import errno
+import json
+import mmap
+import os
+import struct
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Iterator
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+
+COPY_BLOCK_SIZE = 8 * 1024 * 1024
+BUNDLE_ARCHIVE = "myfile.zip"
+BUNDLE_MEMBERS = ("version.txt", BUNDLE_ARCHIVE, BUNDLE_ARCHIVE + ".sha256", "manifest.json")
+BUNDLE_REQUIRED = BUNDLE_MEMBERS[:3]
+
+LOCAL_HEADER_STRUCT = struct.Struct('<4s5H3I2H')
+
+# Ошибки, при которых способ копирования не поддерживается для этой пары файлов
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.EPERM,
+                getattr(errno, 'ENOTSUP', errno.EOPNOTSUPP)}
+
+
+def is_local(url: Optional[str]) -> bool:
+    """Адрес указывает на файл (путь или file://), а не на HTTP"""
+    if not url:
+        return False
+    scheme = urlsplit(url).scheme.lower()
+    # Однобуквенная схема - буква диска Windows (C:\...)
+    return scheme in ('', 'file') or len(scheme) == 1
+
+
+def local_path(url: str) -> Path:
+    """Путь к файлу для локального адреса"""
+    parts = urlsplit(url)
+    if parts.scheme.lower() != 'file':
+        return Path(url).expanduser()
+    path = url2pathname(parts.path)
+    if parts.netloc and parts.netloc != 'localhost':
+        # file://server/share/... - сетевой ресурс (UNC)
+        path = '//' + parts.netloc + path
+    return Path(path)
+
+
+def read_bytes(url: str) -> bytes:
+    return local_path(url).read_bytes()
+
+
+def copy_range(src_fd: int, dst_fd: int, offset: int, length: int,
+               progress: Optional[Callable[[int], None]] = None) -> str:
+    """
+    Скопировать length байт источника со смещения offset в текущую позицию dst_fd
+    Возвращает использованный способ: copy_file_range, sendfile или mmap.
+    """
+    methods = [name for name in ('copy_file_range', 'sendfile') if hasattr(os, name)]
+    copied = 0
+    mapping = None
+    try:
+        while copied < length:
+            count = min(COPY_BLOCK_SIZE, length - copied)
+            position = offset + copied
+            written = None
+            while written is None and methods:
+                try:
+                    if methods[0] == 'copy_file_range':
+                        written = os.copy_file_range(src_fd, dst_fd, count, position)
+                    else:
+                        written = os.sendfile(dst_fd, src_fd, position, count)
+                except OSError as e:
+                    if e.errno not in _UNSUPPORTED or copied:
+                        raise
+                    methods.pop(0)
+            if written is None:
+                # Без копирования в ядре: запись прямо из отображения файла
+                if mapping is None:
+                    mapping = mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ)
+                    methods = []
+                with memoryview(mapping)[position:position + count] as view:
+                    written = os.write(dst_fd, view)
+            if written == 0:
+                raise IOError(f"Источник короче ожидаемого: скопировано {copied} из {length} байт")
+            copied += written
+            if progress:
+                progress(copied)
+    finally:
+        if mapping is not None:
+            mapping.close()
+    return methods[0] if methods else 'mmap'
+
+
+def copy_file(src: Path, dst: Path, offset: int = 0, length: Optional[int] = None,
+              progress: Optional[Callable[[int], None]] = None) -> str:
+    """Скопировать файл (или его диапазон) без чтения в пространство Python"""
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        if length is None:
+            length = os.fstat(source.fileno()).st_size - offset
+        return copy_range(source.fileno(), target.fileno(), offset, length, progress)
+
+
+class OfflineBundle:
+    """Офлайн-пакет обновления (ZIP без сжатия)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with zipfile.ZipFile(self.path) as bundle:
+            self.members = {info.filename: info for info in bundle.infolist()}
+        missing = [name for name in BUNDLE_REQUIRED if name not in self.members]
+        if missing:
+            raise ValueError(f"В офлайн-пакете {self.path} нет: {', '.join(missing)}")
+        if self.members[BUNDLE_ARCHIVE].compress_type != zipfile.ZIP_STORED:
+            raise ValueError("Архив в офлайн-пакете должен храниться без сжатия")
+
+    def read(self, name: str) -> bytes:
+        with zipfile.ZipFile(self.path) as bundle:
+            return bundle.read(name)
+
+    def version(self) -> str:
+        return self.read("version.txt").decode('utf-8').strip()
+
+    def hash_text(self) -> str:
+        return self.read(BUNDLE_ARCHIVE + ".sha256").decode('utf-8')
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        if "manifest.json" not in self.members:
+            return None
+        return json.loads(self.read("manifest.json"))
+
+    def member_span(self, name: str) -> tuple:
+        """Смещение и размер данных записи внутри пакета"""
+        info = self.members[name]
+        with open(self.path, 'rb') as f:
+            f.seek(info.header_offset)
+            header = LOCAL_HEADER_STRUCT.unpack(f.read(LOCAL_HEADER_STRUCT.size))
+        if header[0] != b'PK\x03\x04':
+            raise ValueError(f"Повреждён локальный заголовок в офлайн-пакете: {name}")
+        return info.header_offset + LOCAL_HEADER_STRUCT.size + header[9] + header[10], info.file_size
+
+    def copy_archive(self, dst: Path, progress: Optional[Callable[[int], None]] = None) -> str:
+        offset, length = self.member_span(BUNDLE_ARCHIVE)
+        return copy_file(self.path, dst, offset, length, progress)
+
+
+@contextmanager
+def local_archive(url: str, bundle: Optional[OfflineBundle] = None) -> Iterator[zipfile.ZipFile]:
+    """Открыть архив обновления из локального источника (для выборочной распаковки)"""
+    if bundle is None:
+        with zipfile.ZipFile(local_path(url)) as archive:
+            yield archive
+    else:
+        with zipfile.ZipFile(bundle.path) as outer, outer.open(BUNDLE_ARCHIVE) as member, \
+                zipfile.ZipFile(member) as archive:
+            yield archive
+
+
+def create_bundle(release_dir: Path, bundle_path: Path) -> Path:
+    """Собрать офлайн-пакет из последнего релиза в папке релизов"""
+    release_dir = Path(release_dir)
+    bundle_path = Path(bundle_path)
+    tmp_path = bundle_path.with_name(bundle_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as bundle:
+        for name in BUNDLE_MEMBERS:
+            source = release_dir / name
+            if source.exists():
+                bundle.write(source, name)
+            elif name in BUNDLE_REQUIRED:
+                raise FileNotFoundError(f"Нет {source} для офлайн-пакета")
+    os.replace(tmp_path, bundle_path)
+    return bundle_path
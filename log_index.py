@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Индекс журнала для поиска и фильтрации
+
+Рядом с log.txt хранится небольшой индекс log.txt.idx: файл разбит на блоки
+(до 64 КБ и не дольше часа записей), для каждого блока запомнены смещения,
+диапазон времени, маска уровней и идентификаторы запусков. Индекс дополняется
+по мере роста файла, поэтому запрос читает только подходящие блоки.
+Сжатые сегменты после ротации (log.txt.N.gz) описываются одной сводкой
+и распаковываются, только если могут содержать подходящие записи.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+
+INDEX_VERSION = 1
+BLOCK_BYTES = 64 * 1024
+BUCKET_SECONDS = 3600
+MAX_RESULTS = 2000
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+LEVEL_BITS = {level: 1 << i for i, level in enumerate(LEVELS)}
+ALL_LEVELS_MASK = (1 << len(LEVELS)) - 1
+
+TIME_INPUT_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+# Заголовок записи: "2024-01-31 12:00:00,123 - INFO - [run 1a2b3c4d] ..."
+_HEADER_RE = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d):(\d\d),\d+ - ([A-Z]+) - (?:\[run ([0-9a-f]+)\] )?')
+
+
+def parse_time_input(text: str) -> Optional[float]:
+    """Разобрать время из поля фильтра (пустая строка - без ограничения)"""
+    text = text.strip()
+    if not text:
+        return None
+    for fmt in TIME_INPUT_FORMATS:
+        try:
+            return time.mktime(time.strptime(text, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"Неверный формат времени: {text} (ожидается ГГГГ-ММ-ДД ЧЧ:ММ)")
+
+
+def levels_from(level: str) -> Optional[List[str]]:
+    """Уровень и все более серьёзные ('' или неизвестный уровень - все записи)"""
+    if level not in LEVELS:
+        return None
+    return list(LEVELS[LEVELS.index(level):])
+
+
+class LogQuery:
+    """Условия поиска по журналу"""
+
+    def __init__(self, levels: Optional[Iterable[str]] = None, since: Optional[float] = None,
+                 until: Optional[float] = None, text: str = '', run_id: str = ''):
+        self.mask = ALL_LEVELS_MASK if levels is None else \
+            sum(LEVEL_BITS[level] for level in set(levels) if level in LEVEL_BITS)
+        self.since = since
+        self.until = until
+        self.text = text.lower()
+        self.run_id = run_id.strip()
+        # Без фильтров по уровню, времени и запуску заголовки можно не разбирать
+        self.needs_records = self.mask != ALL_LEVELS_MASK or since is not None or \
+            until is not None or bool(self.run_id)
+
+    def matches_summary(self, min_ts: float, max_ts: float, mask: int, runs: List[str]) -> bool:
+        """Может ли блок (или сжатый сегмент) содержать подходящие записи"""
+        if not mask & self.mask:
+            return False
+        if self.since is not None and max_ts < self.since:
+            return False
+        if self.until is not None and min_ts > self.until:
+            return False
+        if self.run_id and self.run_id not in runs:
+            return False
+        return True
+
+    def matches_record(self, record: Tuple[float, str, Optional[str]]) -> bool:
+        """Подходит ли запись по уровню, времени и запуску"""
+        ts, level, run_id = record
+        if not LEVEL_BITS.get(level, 0) & self.mask:
+            return False
+        if self.since is not None and ts < self.since:
+            return False
+        if self.until is not None and ts > self.until:
+            return False
+        return not self.run_id or run_id == self.run_id
+
+
+class _RecordParser:
+    """
+    Разбор заголовков записей
+    Строки продолжения (например, трассировка исключения) относятся к предыдущей записи.
+    """
+
+    def __init__(self, state: Optional[list] = None):
+        self.minutes: Dict[bytes, float] = {}
+        self.state = tuple(state) if state else (0.0, 'INFO', None)
+
+    def parse(self, line: bytes) -> Tuple[Tuple[float, str, Optional[str]], bool]:
+        """(время, уровень, запуск) строки и является ли она заголовком записи"""
+        match = _HEADER_RE.match(line)
+        if not match:
+            return self.state, False
+        minute, seconds, level, run_id = match.groups()
+        base = self.minutes.get(minute)
+        if base is None:
+            base = time.mktime(time.strptime(minute.decode('ascii'), '%Y-%m-%d %H:%M'))
+            self.minutes[minute] = base
+        self.state = (base + int(seconds), level.decode('ascii'), run_id.decode('ascii') if run_id else None)
+        return self.state, True
+
+
+def _summarize(records: Iterable[Tuple[float, str, Optional[str]]]) -> list:
+    """Сводка [min_ts, max_ts, маска уровней, запуски] по записям"""
+    min_ts = max_ts = None
+    mask = 0
+    runs = []
+    for ts, level, run_id in records:
+        min_ts = ts if min_ts is None or ts < min_ts else min_ts
+        max_ts = ts if max_ts is None or ts > max_ts else max_ts
+        mask |= LEVEL_BITS.get(level, 0)
+        if run_id and run_id not in runs:
+            runs.append(run_id)
+    return [min_ts or 0.0, max_ts or 0.0, mask, runs]
+
+
+class LogIndex:
+    """Инкрементальный индекс файла журнала и его сжатых сегментов"""
+
+    def __init__(self, log_file: Path):
+        self.log_file = Path(log_file)
+        self.index_file = self.log_file.with_name(self.log_file.name + ".idx")
+        self.data = self._load()
+
+    def _empty(self) -> Dict[str, Any]:
+        # block: [начало, конец, min_ts, max_ts, маска уровней, запуски]
+        return {'version': INDEX_VERSION, 'inode': None, 'offset': 0, 'state': None,
+                'blocks': [], 'archives': {}}
+
+    def _load(self) -> Dict[str, Any]:
+        if self.index_file.exists():
+            try:
+                data = json.loads(self.index_file.read_text(encoding='utf-8'))
+                if data.get('version') == INDEX_VERSION:
+                    return data
+            except Exception as e:
+                logging.warning(f"Индекс журнала повреждён и будет перестроен: {e}")
+        return self._empty()
+
+    def _save(self):
+        tmp = self.index_file.with_name(self.index_file.name + ".tmp")
+        tmp.write_text(json.dumps(self.data, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.index_file)
+
+    def archives(self) -> List[Path]:
+        """Сжатые сегменты от новых к старым (log.txt.1.gz, log.txt.2.gz, ...)"""
+        def segment_number(path: Path) -> int:
+            number = path.name[len(self.log_file.name) + 1:].split('.')[0]
+            return int(number) if number.isdigit() else 0
+        return sorted(self.log_file.parent.glob(self.log_file.name + ".*.gz"), key=segment_number)
+
+    @staticmethod
+    def _archive_key(stat: os.stat_result) -> str:
+        # При ротации сегменты переименовываются, поэтому ключ - размер и время изменения
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def update(self) -> bool:
+        """Дополнить индекс новыми записями; возвращает True, если индекс изменился"""
+        changed = self._update_archives()
+        try:
+            stat = self.log_file.stat()
+        except OSError:
+            return changed
+
+        data = self.data
+        if stat.st_ino != data['inode'] or stat.st_size < data['offset']:
+            # Файл заменён при ротации или усечён - индексируем заново
+            data.update({'inode': stat.st_ino, 'offset': 0, 'state': None, 'blocks': []})
+            changed = True
+        if stat.st_size > data['offset']:
+            self._index_tail(stat.st_size)
+            changed = True
+        if changed:
+            self._save()
+        return changed
+
+    def _update_archives(self) -> bool:
+        known = self.data['archives']
+        current = {}
+        for path in self.archives():
+            key = self._archive_key(path.stat())
+            if key in known:
+                current[key] = known[key]
+                continue
+            parser = _RecordParser()
+            with gzip.open(path, 'rb') as f:
+                current[key] = _summarize(parser.parse(line)[0] for line in f)
+        changed = current.keys() != known.keys()
+        self.data['archives'] = current
+        return changed
+
+    def _index_tail(self, size: int):
+        """Проиндексировать полные строки от сохранённого смещения до конца файла"""
+        data = self.data
+        blocks = data['blocks']
+        parser = _RecordParser(data['state'])
+
+        with open(self.log_file, 'rb') as f:
+            f.seek(data['offset'])
+            chunk = f.read(size - data['offset'])
+        chunk = chunk[:chunk.rfind(b'\n') + 1]
+        if not chunk:
+            return
+
+        # Последний блок дополняется, пока он не заполнен
+        block = blocks.pop() if blocks and blocks[-1][1] - blocks[-1][0] < BLOCK_BYTES else None
+        offset = data['offset']
+        for line in chunk.splitlines(keepends=True):
+            record, is_header = parser.parse(line)
+            ts, level, run_id = record
+            # Новый блок начинается только с заголовка записи
+            if block is not None and is_header and (
+                    block[1] - block[0] >= BLOCK_BYTES or
+                    int(ts // BUCKET_SECONDS) != int(block[2] // BUCKET_SECONDS)):
+                blocks.append(block)
+                block = None
+            if block is None:
+                block = [offset, offset, ts, ts, 0, []]
+            block[1] = offset + len(line)
+            block[2] = min(block[2], ts)
+            block[3] = max(block[3], ts)
+            block[4] |= LEVEL_BITS.get(level, 0)
+            if run_id and run_id not in block[5]:
+                block[5].append(run_id)
+            offset += len(line)
+        if block is not None:
+            blocks.append(block)
+
+        data['offset'] = offset
+        data['state'] = list(parser.state)
+
+    def recent_runs(self, limit: int = 20) -> List[str]:
+        """Идентификаторы последних запусков, от новых к старым"""
+        runs = []
+        for block in reversed(self.data['blocks']):
+            for run_id in reversed(block[5]):
+                if run_id not in runs:
+                    runs.append(run_id)
+        for summary in self.data['archives'].values():
+            runs.extend(run_id for run_id in summary[3] if run_id not in runs)
+        return runs[:limit]
+
+    def search(self, query: LogQuery, limit: int = MAX_RESULTS) -> Dict[str, Any]:
+        """
+        Найти записи журнала (самые новые, не больше limit)
+        Возвращает строки в хронологическом порядке и статистику чтения.
+        """
+        self.update()
+        found: List[str] = []
+        stats = {'blocks_total': len(self.data['blocks']), 'blocks_read': 0, 'bytes_read': 0,
+                 'archives_read': 0, 'truncated': False}
+
+        def collect(chunk: bytes) -> bool:
+            # Блок без искомой подстроки отбрасывается целиком, без разбора строк
+            if query.text and query.text not in chunk.decode('utf-8', errors='replace').lower():
+                return True
+            parser = _RecordParser()
+            matched = []
+            for line in chunk.splitlines():
+                if query.needs_records and not query.matches_record(parser.parse(line)[0]):
+                    continue
+                text = line.decode('utf-8', errors='replace')
+                if not query.text or query.text in text.lower():
+                    matched.append(text)
+            found.extend(reversed(matched))
+            if len(found) >= limit:
+                stats['truncated'] = True
+                return False
+            return True
+
+        try:
+            with open(self.log_file, 'rb') as f:
+                for block in reversed(self.data['blocks']):
+                    if not query.matches_summary(block[2], block[3], block[4], block[5]):
+                        continue
+                    f.seek(block[0])
+                    chunk = f.read(block[1] - block[0])
+                    stats['blocks_read'] += 1
+                    stats['bytes_read'] += len(chunk)
+                    if not collect(chunk):
+                        return {'lines': list(reversed(found[:limit])), **stats}
+        except OSError:
+            pass
+
+        for path in self.archives():
+            summary = self.data['archives'].get(self._archive_key(path.stat()))
+            if summary and not query.matches_summary(*summary):
+                continue
+            with gzip.open(path, 'rb') as f:
+                chunk = f.read()
+            stats['archives_read'] += 1
+            if not collect(chunk):
+                break
+        return {'lines': list(reversed(found[:limit])), **stats}
+
+
+def search_in_background(index: LogIndex, query: LogQuery, limit: int = MAX_RESULTS) -> Future:
+    """Выполнить поиск в фоновом потоке (первое построение индекса большого журнала занимает время)"""
+    future = Future()
+
+    def search_thread():
+        try:
+            future.set_result(index.search(query, limit))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=search_thread, daemon=True).start()
+    return future
+
+
+def describe_results(result: Dict[str, Any]) -> str:
+    """Строка состояния для результатов поиска"""
+    text = f"Найдено строк: {len(result['lines'])}"
+    if result['truncated']:
+        text += " (показаны последние)"
+    return text + f", прочитано блоков: {result['blocks_read']} из {result['blocks_total']}"
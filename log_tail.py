@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инкрементальное чтение журнала для вкладки лога
+
+Читатель помнит смещение в файле и при каждом опросе возвращает только новые
+строки. В окне держится не больше max_lines последних строк (кольцевой буфер),
+более ранние страницы читаются с конца файла по запросу. Усечение или
+ротация файла обнаруживаются по размеру и номеру inode.
+"""
+
+import os
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+DEFAULT_MAX_LINES = 2000
+DEFAULT_PAGE_LINES = 500
+READ_BLOCK_SIZE = 64 * 1024
+FOLLOW_INTERVAL_MS = 1000
+
+
+def _decode(line: bytes) -> str:
+    return line.rstrip(b'\r').decode('utf-8', errors='replace')
+
+
+class LogTailReader:
+    """Хвост файла журнала с дочитыванием новых строк и подгрузкой старых страниц"""
+
+    def __init__(self, path: Path, max_lines: int = DEFAULT_MAX_LINES,
+                 page_lines: int = DEFAULT_PAGE_LINES):
+        self.path = Path(path)
+        self.max_lines = max_lines
+        self.page_lines = page_lines
+        # Показанные строки: (смещение начала строки, текст)
+        self.lines: deque = deque()
+        self.offset = 0
+        self.inode: Optional[int] = None
+
+    @property
+    def first_offset(self) -> int:
+        """Смещение первой показанной строки"""
+        return self.lines[0][0] if self.lines else self.offset
+
+    def text(self) -> str:
+        """Показанные строки одним текстом"""
+        return "\n".join(text for _, text in self.lines)
+
+    def has_older(self) -> bool:
+        """Есть ли в файле строки раньше показанных"""
+        return self.first_offset > 0
+
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return self.path.stat()
+        except OSError:
+            return None
+
+    def _read_before(self, end: int, count: int) -> List[Tuple[int, str]]:
+        """Прочитать до count полных строк, заканчивающихся перед смещением end (граница строки)"""
+        buffer = b''
+        pos = end
+        with open(self.path, 'rb') as f:
+            while pos > 0 and buffer.count(b'\n') <= count:
+                size = min(READ_BLOCK_SIZE, pos)
+                pos -= size
+                f.seek(pos)
+                buffer = f.read(size) + buffer
+        if not buffer:
+            return []
+
+        parts = buffer[:-1].split(b'\n')
+        if pos > 0:
+            # Первый фрагмент может начинаться с середины строки
+            parts = parts[1:]
+        result = []
+        line_end = end
+        for part in reversed(parts[-count:]):
+            start = line_end - len(part) - 1
+            result.append((start, _decode(part)))
+            line_end = start
+        result.reverse()
+        return result
+
+    def load_tail(self) -> List[str]:
+        """Начать заново: последние max_lines строк файла"""
+        self.lines.clear()
+        stat = self._stat()
+        if stat is None:
+            self.offset = 0
+            self.inode = None
+            return []
+        self.inode = stat.st_ino
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            # Незавершённая последняя строка дочитается при следующем опросе
+            end = size
+            while end > 0:
+                f.seek(end - 1)
+                if f.read(1) == b'\n':
+                    break
+                end -= 1
+        self.offset = end
+        self.lines.extend(self._read_before(end, self.max_lines))
+        return [text for _, text in self.lines]
+
+    def poll(self, trim: bool = True) -> Tuple[List[str], int, bool]:
+        """
+        Дочитать новые полные строки
+        Возвращает (новые строки, сколько строк убрать сверху, файл начат заново).
+        Если файл усечён или заменён, возвращается заново прочитанный хвост.
+        trim=False не ограничивает буфер (пользователь читает старые страницы).
+        """
+        stat = self._stat()
+        if stat is None or stat.st_ino != self.inode or stat.st_size < self.offset:
+            return self.load_tail(), 0, True
+        if stat.st_size == self.offset:
+            return [], self._trim() if trim else 0, False
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        complete = data[:data.rfind(b'\n') + 1]
+        new_lines = []
+        offset = self.offset
+        for part in complete.split(b'\n')[:-1]:
+            new_lines.append((offset, _decode(part)))
+            offset += len(part) + 1
+        self.offset = offset
+        self.lines.extend(new_lines)
+        return [text for _, text in new_lines], self._trim() if trim else 0, False
+
+    def _trim(self) -> int:
+        dropped = 0
+        while len(self.lines) > self.max_lines:
+            self.lines.popleft()
+            dropped += 1
+        return dropped
+
+    def load_older(self) -> List[str]:
+        """Подгрузить страницу строк перед первой показанной"""
+        if not self.has_older():
+            return []
+        older = self._read_before(self.first_offset, self.page_lines)
+        self.lines.extendleft(reversed(older))
+        return [text for _, text in older]
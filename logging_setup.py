@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Настройка журнала приложения
+
+Записи из рабочих потоков попадают в очередь (QueueHandler), а форматирует
+и пишет их отдельный поток QueueListener, поэтому загрузка, проверка хеша
+и распаковка не ждут дискового ввода-вывода. Журнал ротируется по размеру
+или раз в сутки, старые сегменты сжимаются gzip. Дополнительно можно
+включить журнал в формате JSON lines с полями phase, bytes и duration.
+Записи одного обновления (проверка и загрузка) помечаются идентификатором
+запуска, по нему журнал можно отфильтровать (см. log_index.py).
+"""
+
+import atexit
+import contextvars
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(run_tag)s%(message)s'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+JSON_LOG_SUFFIX = ".jsonl"
+
+# Необязательные поля записи, передаются через extra={...}
+STRUCTURED_FIELDS = ('phase', 'bytes', 'duration', 'run_id')
+
+# Идентификатор запуска свой у каждого потока: одновременные запуски не помечают записи друг друга
+_current_run: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('run_id', default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_setup_lock = threading.Lock()
+
+
+def start_run(run_id: Optional[str] = None) -> str:
+    """
+    Начать новый запуск обновления (или продолжить run_id) в текущем потоке
+    Следующие записи этого потока получат идентификатор запуска; рабочим
+    потокам он передаётся через bind_run.
+    """
+    run_id = run_id or uuid.uuid4().hex[:8]
+    _current_run.set(run_id)
+    return run_id
+
+
+def finish_run(run_id: Optional[str]):
+    """Завершить запуск в текущем потоке (если он ещё текущий)"""
+    if run_id is not None and _current_run.get() == run_id:
+        _current_run.set(None)
+
+
+def bind_run(func: Callable) -> Callable:
+    """Обернуть функцию для другого потока: её записи получат идентификатор текущего запуска"""
+    run_id = _current_run.get()
+
+    def run(*args, **kwargs):
+        token = _current_run.set(run_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_run.reset(token)
+    return run
+
+
+class RunIdFilter(logging.Filter):
+    """Добавляет к записи идентификатор текущего запуска (в потоке, где она создана)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        run_id = getattr(record, 'run_id', None) or _current_run.get()
+        record.run_id = run_id
+        record.run_tag = f"[run {run_id}] " if run_id else ''
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """Сжать закрытый сегмент журнала (выполняется в потоке QueueListener)"""
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def create_file_handler(path: Path, rotation: str = 'size', max_bytes: int = DEFAULT_MAX_BYTES,
+                        backup_count: int = DEFAULT_BACKUP_COUNT) -> logging.Handler:
+    """Файловый обработчик с ротацией по размеру ('size') или раз в сутки ('time')"""
+    if rotation == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when='midnight', backupCount=backup_count, encoding='utf-8', delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    return handler
+
+
+def logging_configured() -> bool:
+    """Журнал уже настроен в этом процессе"""
+    return _listener is not None
+
+
+def setup_logging(log_file: Path, settings: Optional[Dict[str, Any]] = None):
+    """
+    Настроить журнал (повторные вызовы ничего не делают)
+    Настройки: log_rotation ('size' или 'time'), log_max_bytes, log_backup_count, log_json.
+    """
+    global _listener, _queue_handler
+
+    settings = settings or {}
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        rotation = settings.get('log_rotation', 'size')
+        max_bytes = int(settings.get('log_max_bytes', DEFAULT_MAX_BYTES))
+        backup_count = int(settings.get('log_backup_count', DEFAULT_BACKUP_COUNT))
+
+        text_handler = create_file_handler(Path(log_file), rotation, max_bytes, backup_count)
+        text_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [text_handler, stream_handler]
+
+        if settings.get('log_json', False):
+            json_file = Path(log_file).with_suffix(JSON_LOG_SUFFIX)
+            json_handler = create_file_handler(json_file, rotation, max_bytes, backup_count)
+            json_handler.setFormatter(JsonLinesFormatter())
+            handlers.append(json_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        _queue_handler = logging.handlers.QueueHandler(log_queue)
+        _queue_handler.addFilter(RunIdFilter())
+        root.addHandler(_queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток журнала"""
+    global _listener, _queue_handler
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
@@ -6,403 +6,21 @@ Python Updater Application
 """
 
 import sys
-import os
-import json
-import hashlib
-import zipfile
 import threading
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional, Callable
+from concurrent.futures import Future
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import requests
-import appdirs
 
+# Классы ядра раньше определялись здесь и реэкспортируются для совместимости с `from main import ...`
+from updater_core import (Config, Translations, AppDataManager, UpdateChecker, InsufficientSpaceError,
+                          OfflineError, network_monitor, start_update_check, startup_probe_enabled,
+                          report_startup_ready)
+from log_tail import LogTailReader, FOLLOW_INTERVAL_MS
+from log_index import (LogIndex, LogQuery, LEVELS, levels_from, parse_time_input, search_in_background,
+                       describe_results)
 
-class Config:
-    """Конфигурация приложения"""
-    APP_NAME = "PythonUpdater"
-    APP_AUTHOR = "YourCompany"
-    VERSION = "1.0.0"
-    
-    # URLs по умолчанию
-    DEFAULT_VERSION_URL = "https://example.com/version.txt"
-    DEFAULT_DOWNLOAD_URL = "https://example.com/myfile.zip"
-    DEFAULT_HASH_URL = "https://example.com/myfile.zip.sha256"
-
-
-class Translations:
-    """Класс для мультиязычности"""
-    
-    LANGUAGES = {
-        'ru': {
-            'app_title': 'Менеджер обновлений',
-            'tab_update': 'Обновление',
-            'tab_settings': 'Настройки',
-            'tab_log': 'Журнал',
-            'check_update': 'Проверить обновление',
-            'current_version': 'Текущая версия:',
-            'latest_version': 'Последняя версия:',
-            'status': 'Статус:',
-            'download_path': 'Путь загрузки:',
-            'browse': 'Обзор...',
-            'progress': 'Прогресс:',
-            'settings_token': 'Токен авторизации:',
-            'settings_version_url': 'URL версии:',
-            'settings_download_url': 'URL загрузки:',
-            'settings_hash_url': 'URL хеша:',
-            'settings_auto_check': 'Автопроверка при запуске',
-            'settings_dark_theme': 'Тёмная тема',
-            'settings_language': 'Язык:',
-            'settings_execute_reg': 'Выполнять .reg файлы',
-            'save_settings': 'Сохранить настройки',
-            'status_up_to_date': 'Файл актуален',
-            'status_update_available': 'Доступно обновление',
-            'status_downloading': 'Загрузка...',
-            'status_downloaded': 'Загружено',
-            'status_connection_error': 'Ошибка соединения',
-            'status_hash_error': 'Ошибка контрольной суммы',
-            'status_extraction_error': 'Ошибка распаковки',
-            'error': 'Ошибка',
-            'success': 'Успех',
-            'settings_saved': 'Настройки сохранены',
-            'download_complete': 'Загрузка завершена',
-            'select_download_path': 'Выберите путь для загрузки',
-        },
-        'en': {
-            'app_title': 'Update Manager',
-            'tab_update': 'Update',
-            'tab_settings': 'Settings',
-            'tab_log': 'Log',
-            'check_update': 'Check Update',
-            'current_version': 'Current Version:',
-            'latest_version': 'Latest Version:',
-            'status': 'Status:',
-            'download_path': 'Download Path:',
-            'browse': 'Browse...',
-            'progress': 'Progress:',
-            'settings_token': 'Authorization Token:',
-            'settings_version_url': 'Version URL:',
-            'settings_download_url': 'Download URL:',
-            'settings_hash_url': 'Hash URL:',
-            'settings_auto_check': 'Auto-check on startup',
-            'settings_dark_theme': 'Dark Theme',
-            'settings_language': 'Language:',
-            'settings_execute_reg': 'Execute .reg files',
-            'save_settings': 'Save Settings',
-            'status_up_to_date': 'File is up to date',
-            'status_update_available': 'Update available',
-            'status_downloading': 'Downloading...',
-            'status_downloaded': 'Downloaded',
-            'status_connection_error': 'Connection error',
-            'status_hash_error': 'Hash verification error',
-            'status_extraction_error': 'Extraction error',
-            'error': 'Error',
-            'success': 'Success',
-            'settings_saved': 'Settings saved',
-            'download_complete': 'Download complete',
-            'select_download_path': 'Select download path',
-        }
-    }
-    
-    def __init__(self, language='ru'):
-        self.current_language = language
-    
-    def get(self, key: str) -> str:
-        """Получить перевод по ключу"""
-        return self.LANGUAGES.get(self.current_language, {}).get(key, key)
-    
-    def set_language(self, language: str):
-        """Установить язык"""
-        if language in self.LANGUAGES:
-            self.current_language = language
-
-
-class AppDataManager:
-    """Менеджер данных приложения"""
-    
-    def __init__(self):
-        self.app_dir = Path(appdirs.user_data_dir(Config.APP_NAME, Config.APP_AUTHOR))
-        self.app_dir.mkdir(parents=True, exist_ok=True)
-        
-        self.settings_file = self.app_dir / "settings.json"
-        self.version_file = self.app_dir / "version.txt"
-        self.log_file = self.app_dir / "log.txt"
-        
-        self._setup_logging()
-    
-    def _setup_logging(self):
-        """Настройка логирования"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(self.log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
-    
-    def load_settings(self) -> Dict[str, Any]:
-        """Загрузить настройки"""
-        default_settings = {
-            'token': '',
-            'version_url': Config.DEFAULT_VERSION_URL,
-            'download_url': Config.DEFAULT_DOWNLOAD_URL,
-            'hash_url': Config.DEFAULT_HASH_URL,
-            'download_path': str(Path.home() / "Downloads"),
-            'auto_check': True,
-            'dark_theme': False,
-            'language': 'ru',
-            'execute_reg_files': True  # Новая настройка для выполнения .reg файлов
-        }
-        
-        if self.settings_file.exists():
-            try:
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                    # Обновляем настройки по умолчанию загруженными
-                    default_settings.update(settings)
-            except Exception as e:
-                logging.error(f"Ошибка загрузки настроек: {e}")
-        
-        return default_settings
-    
-    def save_settings(self, settings: Dict[str, Any]):
-        """Сохранить настройки"""
-        try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=2, ensure_ascii=False)
-            logging.info("Настройки сохранены")
-        except Exception as e:
-            logging.error(f"Ошибка сохранения настроек: {e}")
-            raise
-    
-    def get_current_version(self) -> str:
-        """Получить текущую версию"""
-        if self.version_file.exists():
-            try:
-                return self.version_file.read_text(encoding='utf-8').strip()
-            except Exception as e:
-                logging.error(f"Ошибка чтения версии: {e}")
-        return Config.VERSION
-    
-    def save_version(self, version: str):
-        """Сохранить версию"""
-        try:
-            self.version_file.write_text(version, encoding='utf-8')
-            logging.info(f"Версия обновлена до {version}")
-        except Exception as e:
-            logging.error(f"Ошибка сохранения версии: {e}")
-            raise
-    
-    def get_log_content(self) -> str:
-        """Получить содержимое лога"""
-        if self.log_file.exists():
-            try:
-                return self.log_file.read_text(encoding='utf-8')
-            except Exception as e:
-                logging.error(f"Ошибка чтения лога: {e}")
-                return f"Ошибка чтения лога: {e}"
-        return "Лог пуст"
-
-
-class UpdateChecker:
-    """Класс для проверки и загрузки обновлений"""
-    
-    def __init__(self, settings: Dict[str, Any], progress_callback: Optional[Callable] = None):
-        self.settings = settings
-        self.progress_callback = progress_callback
-        self.session = requests.Session()
-        
-        # Настройка авторизации
-        if settings.get('token'):
-            self.session.headers.update({
-                'Authorization': f"Bearer {settings['token']}"
-            })
-    
-    def check_version(self) -> tuple[bool, str, str]:
-        """
-        Проверить версию
-        Возвращает: (есть_обновление, текущая_версия, последняя_версия)
-        """
-        try:
-            response = self.session.get(self.settings['version_url'], timeout=10)
-            response.raise_for_status()
-            
-            latest_version = response.text.strip()
-            current_version = AppDataManager().get_current_version()
-            
-            has_update = latest_version != current_version
-            logging.info(f"Проверка версии: текущая={current_version}, последняя={latest_version}")
-            
-            return has_update, current_version, latest_version
-            
-        except Exception as e:
-            logging.error(f"Ошибка проверки версии: {e}")
-            raise
-    
-    def download_file(self, url: str, filepath: Path) -> bool:
-        """Загрузить файл с прогрессом"""
-        try:
-            response = self.session.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if self.progress_callback and total_size > 0:
-                            progress = int((downloaded / total_size) * 100)
-                            self.progress_callback(progress)
-            
-            logging.info(f"Файл загружен: {filepath}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"Ошибка загрузки файла {url}: {e}")
-            raise
-    
-    def verify_hash(self, filepath: Path, hash_url: str) -> bool:
-        """Проверить SHA256 хеш файла"""
-        try:
-            # Загружаем хеш
-            response = self.session.get(hash_url, timeout=10)
-            response.raise_for_status()
-            expected_hash = response.text.strip().lower()
-            
-            # Вычисляем хеш файла
-            sha256_hash = hashlib.sha256()
-            with open(filepath, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
-            
-            actual_hash = sha256_hash.hexdigest().lower()
-            
-            is_valid = expected_hash == actual_hash
-            logging.info(f"Проверка хеша: ожидаемый={expected_hash}, фактический={actual_hash}, валидный={is_valid}")
-            
-            return is_valid
-            
-        except Exception as e:
-            logging.error(f"Ошибка проверки хеша: {e}")
-            raise
-    
-    def extract_archive(self, archive_path: Path, extract_path: Path) -> bool:
-        """Распаковать архив"""
-        try:
-            extract_path.mkdir(parents=True, exist_ok=True)
-            
-            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_path)
-            
-            logging.info(f"Архив распакован в: {extract_path}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"Ошибка распаковки архива: {e}")
-            raise
-    
-    def execute_reg_files(self, extract_path: Path) -> bool:
-        """Выполнить .reg файлы из распакованного архива"""
-        import subprocess
-        import sys
-        
-        # Проверяем настройку выполнения .reg файлов
-        if not self.settings.get('execute_reg_files', True):
-            logging.info("Выполнение REG файлов отключено в настройках")
-            return True
-        
-        try:
-            # Ищем все .reg файлы в распакованной папке
-            reg_files = list(extract_path.rglob("*.reg"))
-            
-            if not reg_files:
-                logging.info("REG файлы не найдены")
-                return True
-            
-            logging.info(f"Найдено REG файлов: {len(reg_files)}")
-            
-            # Выполняем каждый .reg файл
-            for reg_file in reg_files:
-                try:
-                    logging.info(f"Выполнение REG файла: {reg_file}")
-                    
-                    if sys.platform == "win32":
-                        # Windows: используем regedit
-                        result = subprocess.run([
-                            "regedit", "/s", str(reg_file)
-                        ], capture_output=True, text=True, timeout=30)
-                        
-                        if result.returncode == 0:
-                            logging.info(f"REG файл успешно выполнен: {reg_file.name}")
-                        else:
-                            logging.error(f"Ошибка выполнения REG файла {reg_file.name}: {result.stderr}")
-                            return False
-                    else:
-                        # На macOS/Linux .reg файлы не поддерживаются
-                        logging.warning(f"REG файлы не поддерживаются на {sys.platform}: {reg_file.name}")
-                        
-                except subprocess.TimeoutExpired:
-                    logging.error(f"Таймаут выполнения REG файла: {reg_file.name}")
-                    return False
-                except Exception as e:
-                    logging.error(f"Ошибка выполнения REG файла {reg_file.name}: {e}")
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logging.error(f"Ошибка обработки REG файлов: {e}")
-            return False
-    
-    def download_update(self, download_path: str, version: str) -> bool:
-        """Загрузить и установить обновление"""
-        try:
-            download_dir = Path(download_path)
-            archive_path = download_dir / "myfile.zip"
-            
-            # Загружаем архив
-            if self.progress_callback:
-                self.progress_callback(0)
-            
-            self.download_file(self.settings['download_url'], archive_path)
-            
-            # Проверяем хеш
-            if not self.verify_hash(archive_path, self.settings['hash_url']):
-                archive_path.unlink()
-                return False
-            
-            # Распаковываем
-            extract_path = download_dir / "update"
-            if not self.extract_archive(archive_path, extract_path):
-                return False
-            
-            # Выполняем .reg файлы, если они есть
-            if not self.execute_reg_files(extract_path):
-                logging.warning("Некоторые REG файлы не были выполнены, но обновление продолжается")
-            
-            # Обновляем версию
-            AppDataManager().save_version(version)
-            
-            # Удаляем архив
-            archive_path.unlink()
-            
-            if self.progress_callback:
-                self.progress_callback(100)
-            
-            logging.info(f"Обновление успешно загружено и установлено: версия {version}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"Ошибка загрузки обновления: {e}")
-            raise
+__all__ = ['Config', 'Translations', 'AppDataManager', 'UpdateChecker', 'UpdaterApp', 'main']
 
 
 class UpdaterApp:
@@ -413,6 +31,11 @@ class UpdaterApp:
         self.settings = self.data_manager.load_settings()
         self.translations = Translations(self.settings.get('language', 'ru'))
         
+        # Автопроверка при запуске: запрос версии идёт параллельно с построением окна
+        pending_check = None
+        if self.settings.get('auto_check', True):
+            pending_check = start_update_check(self.settings, self.update_progress)
+        
         self.root = tk.Tk()
         self.root.title(self.translations.get('app_title'))
         self.root.geometry("600x500")
@@ -437,9 +60,11 @@ class UpdaterApp:
         self.setup_ui()
         self.apply_theme()
         
-        # Автопроверка при запуске
-        if self.settings.get('auto_check', True):
-            self.root.after(1000, self.check_update_async)
+        # Результат автопроверки показывается, как только он готов
+        if pending_check is not None:
+            self.check_button.configure(state=tk.DISABLED)
+            self.status_var.set("Проверка обновлений...")
+            self.deliver_check_result(pending_check)
     
     def setup_ui(self):
         """Создание интерфейса"""
@@ -455,12 +80,24 @@ class UpdaterApp:
         # Вкладка "Настройки"
         self.settings_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.settings_frame, text=self.translations.get('tab_settings'))
-        self.setup_settings_tab()
         
         # Вкладка "Журнал"
         self.log_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.log_frame, text=self.translations.get('tab_log'))
-        self.setup_log_tab()
+        self.log_text = None
+        
+        # Настройки и журнал строятся при первом открытии вкладки
+        self.lazy_tabs = {
+            str(self.settings_frame): self.setup_settings_tab,
+            str(self.log_frame): self.setup_log_tab,
+        }
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+    
+    def on_tab_changed(self, event=None):
+        """Построить вкладку при первом выборе"""
+        builder = self.lazy_tabs.pop(self.notebook.select(), None)
+        if builder:
+            builder()
     
     def setup_update_tab(self):
         """Настройка вкладки обновления"""
@@ -570,21 +207,115 @@ class UpdaterApp:
     
     def setup_log_tab(self):
         """Настройка вкладки журнала"""
+        self.setup_log_filter()
+        
         # Текстовое поле для лога
         text_frame = ttk.Frame(self.log_frame)
         text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         self.log_text = tk.Text(text_frame, wrap=tk.WORD, state=tk.DISABLED)
-        scrollbar_log = ttk.Scrollbar(text_frame, command=self.log_text.yview)
-        self.log_text.configure(yscrollcommand=scrollbar_log.set)
+        self.log_scrollbar = ttk.Scrollbar(text_frame, command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=self.on_log_scroll)
         
         self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar_log.pack(side=tk.RIGHT, fill=tk.Y)
+        self.log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Кнопка обновления лога
         ttk.Button(self.log_frame, text="Обновить журнал", command=self.refresh_log).pack(pady=5)
         
-        # Загружаем лог при запуске
+        # Загружаем хвост лога и дальше дочитываем только новые строки
+        self.log_reader = LogTailReader(self.data_manager.log_file)
+        self.loading_older_log = False
+        self.follow_log()
+    
+    def setup_log_filter(self):
+        """Панель поиска и фильтрации журнала"""
+        self.log_index = LogIndex(self.data_manager.log_file)
+        self.log_search_active = False
+        
+        filter_frame = ttk.LabelFrame(self.log_frame, text="Поиск")
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        
+        self.log_level_var = tk.StringVar()
+        self.log_since_var = tk.StringVar()
+        self.log_until_var = tk.StringVar()
+        self.log_query_var = tk.StringVar()
+        self.log_run_var = tk.StringVar()
+        
+        ttk.Label(filter_frame, text="Уровень:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Combobox(filter_frame, textvariable=self.log_level_var, values=['', *LEVELS],
+                     state='readonly', width=10).grid(row=0, column=1, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(filter_frame, text="С:").grid(row=0, column=2, sticky=tk.W, padx=5, pady=2)
+        ttk.Entry(filter_frame, textvariable=self.log_since_var, width=17).grid(row=0, column=3, padx=5, pady=2)
+        ttk.Label(filter_frame, text="По:").grid(row=0, column=4, sticky=tk.W, padx=5, pady=2)
+        ttk.Entry(filter_frame, textvariable=self.log_until_var, width=17).grid(row=0, column=5, padx=5, pady=2)
+        
+        ttk.Label(filter_frame, text="Текст:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Entry(filter_frame, textvariable=self.log_query_var, width=20).grid(row=1, column=1, padx=5, pady=2)
+        ttk.Label(filter_frame, text="Запуск:").grid(row=1, column=2, sticky=tk.W, padx=5, pady=2)
+        self.log_run_combo = ttk.Combobox(filter_frame, textvariable=self.log_run_var, width=15,
+                                          postcommand=self.update_log_runs)
+        self.log_run_combo.grid(row=1, column=3, padx=5, pady=2)
+        
+        buttons = ttk.Frame(filter_frame)
+        buttons.grid(row=1, column=4, columnspan=2, sticky=tk.E, padx=5, pady=2)
+        self.log_search_button = ttk.Button(buttons, text="Найти", command=self.search_log)
+        self.log_search_button.pack(side=tk.LEFT, padx=2)
+        ttk.Button(buttons, text="Сбросить", command=self.reset_log_filter).pack(side=tk.LEFT, padx=2)
+        
+        self.log_search_status = ttk.Label(filter_frame, text="")
+        self.log_search_status.grid(row=2, column=0, columnspan=6, sticky=tk.W, padx=5)
+    
+    def update_log_runs(self):
+        """Подставить в список последние запуски"""
+        self.log_run_combo.configure(values=self.log_index.recent_runs())
+    
+    def search_log(self):
+        """Найти записи журнала по фильтрам"""
+        try:
+            query = LogQuery(levels=levels_from(self.log_level_var.get()),
+                             since=parse_time_input(self.log_since_var.get()),
+                             until=parse_time_input(self.log_until_var.get()),
+                             text=self.log_query_var.get(), run_id=self.log_run_var.get())
+        except ValueError as e:
+            messagebox.showerror(self.translations.get('error'), str(e))
+            return
+        
+        # Пока показаны результаты поиска, хвост журнала не дочитывается
+        self.log_search_active = True
+        self.log_search_button.configure(state=tk.DISABLED)
+        self.log_search_status.configure(text="Поиск...")
+        self.deliver_log_search(search_in_background(self.log_index, query))
+    
+    def deliver_log_search(self, future: Future):
+        """Показать результаты поиска, когда они готовы"""
+        if not future.done():
+            self.root.after(50, self.deliver_log_search, future)
+            return
+        
+        self.log_search_button.configure(state=tk.NORMAL)
+        try:
+            result = future.result()
+        except Exception as e:
+            self.log_search_status.configure(text=f"Ошибка поиска: {e}")
+            logging.error(f"Ошибка поиска в журнале: {e}")
+            return
+        
+        self.log_text.configure(state=tk.NORMAL)
+        self.log_text.delete(1.0, tk.END)
+        self.log_text.insert(tk.END, "\n".join(result['lines']))
+        self.log_text.configure(state=tk.DISABLED)
+        self.log_text.see(tk.END)
+        self.log_search_status.configure(text=describe_results(result))
+    
+    def reset_log_filter(self):
+        """Вернуться к хвосту журнала"""
+        for var in (self.log_level_var, self.log_since_var, self.log_until_var,
+                    self.log_query_var, self.log_run_var):
+            var.set('')
+        self.log_search_active = False
+        self.log_search_status.configure(text="")
+        self.log_reader = LogTailReader(self.data_manager.log_file)
         self.refresh_log()
     
     def apply_theme(self):
@@ -629,7 +360,8 @@ class UpdaterApp:
     def save_settings(self):
         """Сохранить настройки"""
         try:
-            settings = {
+            settings = dict(self.settings)
+            settings.update({
                 'token': self.token_var.get(),
                 'version_url': self.version_url_var.get(),
                 'download_url': self.download_url_var.get(),
@@ -639,7 +371,7 @@ class UpdaterApp:
                 'dark_theme': self.dark_theme_var.get(),
                 'language': self.language_var.get(),
                 'execute_reg_files': self.execute_reg_var.get()
-            }
+            })
             
             self.data_manager.save_settings(settings)
             self.settings = settings
@@ -652,54 +384,110 @@ class UpdaterApp:
     
     def refresh_log(self):
         """Обновить содержимое журнала"""
+        if self.log_text is None or self.log_search_active:
+            return
+        
         try:
-            log_content = self.data_manager.get_log_content()
+            # Пока пользователь читает старые записи, буфер не обрезается
+            at_bottom = self.log_text.yview()[1] >= 1.0
+            lines, dropped, reset = self.log_reader.poll(trim=at_bottom)
+            if not (lines or dropped or reset):
+                return
             
             self.log_text.configure(state=tk.NORMAL)
-            self.log_text.delete(1.0, tk.END)
-            self.log_text.insert(tk.END, log_content)
+            if reset:
+                self.log_text.delete(1.0, tk.END)
+            elif dropped:
+                self.log_text.delete(1.0, f"{dropped + 1}.0")
+            if lines:
+                self.log_text.insert(tk.END, "\n".join(lines) + "\n")
             self.log_text.configure(state=tk.DISABLED)
             
             # Прокрутка в конец
-            self.log_text.see(tk.END)
+            if at_bottom or reset:
+                self.log_text.see(tk.END)
             
         except Exception as e:
             logging.error(f"Ошибка обновления лога: {e}")
     
+    def follow_log(self):
+        """Следить за файлом журнала"""
+        self.refresh_log()
+        self.root.after(FOLLOW_INTERVAL_MS, self.follow_log)
+    
+    def on_log_scroll(self, first: str, last: str):
+        """Подгрузить более ранние записи, когда журнал прокручен до начала"""
+        self.log_scrollbar.set(first, last)
+        if float(first) <= 0.0 and float(last) < 1.0 and not self.loading_older_log \
+                and not self.log_search_active and self.log_reader.has_older():
+            self.loading_older_log = True
+            self.root.after_idle(self.load_older_log)
+    
+    def load_older_log(self):
+        """Добавить страницу более ранних записей в начало журнала"""
+        try:
+            older = self.log_reader.load_older()
+            if older:
+                self.log_text.configure(state=tk.NORMAL)
+                self.log_text.insert(1.0, "\n".join(older) + "\n")
+                self.log_text.configure(state=tk.DISABLED)
+                # Сохраняем положение: наверху остаётся та же строка, что и до подгрузки
+                self.log_text.yview(f"{len(older) + 1}.0")
+        except Exception as e:
+            logging.error(f"Ошибка чтения журнала: {e}")
+        finally:
+            self.loading_older_log = False
+    
     def update_progress(self, progress: int):
         """Обновить прогресс"""
         self.progress_var.set(progress)
         self.progress_label.configure(text=f"{progress}%")
         self.root.update_idletasks()
     
-    def check_update_async(self):
-        """Асинхронная проверка обновлений"""
-        def check_update_thread():
-            try:
-                self.check_button.configure(state=tk.DISABLED)
-                self.status_var.set("Проверка обновлений...")
-                
-                checker = UpdateChecker(self.settings, self.update_progress)
-                has_update, current_version, latest_version = checker.check_version()
-                
-                self.current_version_var.set(current_version)
-                self.latest_version_var.set(latest_version)
+    def deliver_check_result(self, future: Future):
+        """Показать результат проверки в потоке интерфейса, когда он готов"""
+        if not future.done():
+            self.root.after(50, self.deliver_check_result, future)
+            return
+        
+        try:
+            checker, (has_update, current_version, latest_version) = future.result()
+            
+            self.current_version_var.set(current_version)
+            self.latest_version_var.set(latest_version)
+            
+            if has_update:
+                self.status_var.set(self.translations.get('status_update_available'))
+                # Запускаем загрузку
+                self.download_update_async(checker, latest_version)
+            else:
+                self.status_var.set(self.translations.get('status_up_to_date'))
                 
-                if has_update:
-                    self.status_var.set(self.translations.get('status_update_available'))
-                    # Запускаем загрузку
-                    self.download_update_async(checker, latest_version)
-                else:
-                    self.status_var.set(self.translations.get('status_up_to_date'))
-                    
-            except Exception as e:
-                self.status_var.set(self.translations.get('status_connection_error'))
-                logging.error(f"Ошибка проверки обновлений: {e}")
-            finally:
-                self.check_button.configure(state=tk.NORMAL)
+        except OfflineError as e:
+            self.status_var.set(self.translations.get('status_offline'))
+            logging.warning(f"Проверка обновлений отложена: {e}")
+            self.wait_for_network(network_monitor.when_online(self.settings['version_url']))
+        except Exception as e:
+            self.status_var.set(self.translations.get('status_connection_error'))
+            logging.error(f"Ошибка проверки обновлений: {e}")
+        finally:
+            self.check_button.configure(state=tk.NORMAL)
+    
+    def wait_for_network(self, future: Future):
+        """Повторить проверку, когда сеть снова появится"""
+        if not future.done():
+            self.root.after(500, self.wait_for_network, future)
+            return
         
-        thread = threading.Thread(target=check_update_thread, daemon=True)
-        thread.start()
+        # Проверка уже могла быть запущена вручную
+        if str(self.check_button['state']) != tk.DISABLED:
+            self.check_update_async()
+    
+    def check_update_async(self):
+        """Асинхронная проверка обновлений"""
+        self.check_button.configure(state=tk.DISABLED)
+        self.status_var.set("Проверка обновлений...")
+        self.deliver_check_result(start_update_check(self.settings, self.update_progress))
     
     def download_update_async(self, checker: UpdateChecker, version: str):
         """Асинхронная загрузка обновления"""
@@ -714,12 +502,13 @@ class UpdaterApp:
                     self.current_version_var.set(version)
                     messagebox.showinfo(self.translations.get('success'), 
                                        self.translations.get('download_complete'))
-                    self.refresh_log()  # Обновляем лог
                 else:
                     self.status_var.set(self.translations.get('status_hash_error'))
                     
             except Exception as e:
-                if "hash" in str(e).lower():
+                if isinstance(e, InsufficientSpaceError):
+                    self.status_var.set(self.translations.get('status_disk_space_error'))
+                elif "hash" in str(e).lower():
                     self.status_var.set(self.translations.get('status_hash_error'))
                 elif "extract" in str(e).lower():
                     self.status_var.set(self.translations.get('status_extraction_error'))
@@ -733,7 +522,16 @@ class UpdaterApp:
     
     def run(self):
         """Запустить приложение"""
+        if startup_probe_enabled():
+            # Замер времени запуска: выходим, как только окно отрисовано
+            self.root.bind('<Map>', self.on_startup_probe_map, add='+')
         self.root.mainloop()
+    
+    def on_startup_probe_map(self, event=None):
+        """Сообщить о готовности окна и закрыть приложение (режим замера запуска)"""
+        if event is not None and event.widget is self.root:
+            self.root.unbind('<Map>')
+            self.root.after_idle(lambda: (report_startup_ready('tkinter'), self.root.destroy()))
 
 
 def main():
@@ -743,4 +541,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Процессы пула (разбиение на чанки) в собранном приложении запускают этот же exe
+    from multiprocessing import freeze_support
+    freeze_support()
     main()
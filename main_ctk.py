@@ -6,17 +6,9 @@ Python Updater Application with CustomTkinter
 """
 
 import sys
-import os
-import json
-import hashlib
-import zipfile
 import threading
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional, Callable
-import requests
-import appdirs
+from concurrent.futures import Future
 
 try:
     import customtkinter as ctk
@@ -25,8 +17,13 @@ try:
 except ImportError:
     CUSTOMTKINTER_AVAILABLE = False
 
-# Импортируем классы из основного модуля
-from main import Config, Translations, AppDataManager, UpdateChecker
+# Импортируем классы ядра (без tkinter-интерфейса из main.py)
+from updater_core import (Translations, AppDataManager, UpdateChecker, InsufficientSpaceError,
+                          OfflineError, network_monitor, start_update_check, startup_probe_enabled,
+                          report_startup_ready)
+from log_tail import LogTailReader, FOLLOW_INTERVAL_MS
+from log_index import (LogIndex, LogQuery, LEVELS, levels_from, parse_time_input, search_in_background,
+                       describe_results)
 
 
 class UpdaterAppCTK:
@@ -44,6 +41,11 @@ class UpdaterAppCTK:
         self.settings = self.data_manager.load_settings()
         self.translations = Translations(self.settings.get('language', 'ru'))
         
+        # Автопроверка при запуске: запрос версии идёт параллельно с построением окна
+        pending_check = None
+        if self.settings.get('auto_check', True):
+            pending_check = start_update_check(self.settings, self.update_progress)
+        
         # Переменные состояния
         self.current_version = self.data_manager.get_current_version()
         self.latest_version = "Неизвестно"
@@ -63,9 +65,11 @@ class UpdaterAppCTK:
         
         self.setup_ui()
         
-        # Автопроверка при запуске
-        if self.settings.get('auto_check', True):
-            self.root.after(1000, self.check_update_async)
+        # Результат автопроверки показывается, как только он готов
+        if pending_check is not None:
+            self.check_button.configure(state="disabled")
+            self.update_status("Проверка обновлений...")
+            self.deliver_check_result(pending_check)
     
     def setup_ui(self):
         """Создание интерфейса CustomTkinter"""
@@ -82,18 +86,27 @@ class UpdaterAppCTK:
         title_label.pack(pady=(0, 20))
         
         # Создаем вкладки
-        self.tabview = ctk.CTkTabview(main_frame)
+        self.tabview = ctk.CTkTabview(main_frame, command=self.on_tab_changed)
         self.tabview.pack(fill="both", expand=True)
         
         # Добавляем вкладки
         self.tab_update = self.tabview.add(self.translations.get('tab_update'))
         self.tab_settings = self.tabview.add(self.translations.get('tab_settings'))
         self.tab_log = self.tabview.add(self.translations.get('tab_log'))
+        self.log_textbox = None
         
-        # Настройка вкладок
+        # Настройка вкладок: настройки и журнал строятся при первом открытии
         self.setup_update_tab()
-        self.setup_settings_tab()
-        self.setup_log_tab()
+        self.lazy_tabs = {
+            self.translations.get('tab_settings'): self.setup_settings_tab,
+            self.translations.get('tab_log'): self.setup_log_tab,
+        }
+    
+    def on_tab_changed(self):
+        """Построить вкладку при первом выборе"""
+        builder = self.lazy_tabs.pop(self.tabview.get(), None)
+        if builder:
+            builder()
     
     def setup_update_tab(self):
         """Настройка вкладки обновления"""
@@ -348,15 +361,29 @@ class UpdaterAppCTK:
         )
         log_title.pack(pady=(20, 10))
         
-        # Кнопка обновления
+        # Кнопки обновления и подгрузки ранних записей
+        log_buttons = ctk.CTkFrame(self.tab_log, fg_color="transparent")
+        log_buttons.pack(pady=(0, 15))
+        
         refresh_button = ctk.CTkButton(
-            self.tab_log,
+            log_buttons,
             text="Обновить журнал",
             command=self.refresh_log,
             width=150,
             height=35
         )
-        refresh_button.pack(pady=(0, 15))
+        refresh_button.pack(side="left", padx=5)
+        
+        older_button = ctk.CTkButton(
+            log_buttons,
+            text="Более ранние записи",
+            command=self.load_older_log,
+            width=150,
+            height=35
+        )
+        older_button.pack(side="left", padx=5)
+        
+        self.setup_log_filter()
         
         # Текстовое поле для лога
         self.log_textbox = ctk.CTkTextbox(
@@ -368,7 +395,90 @@ class UpdaterAppCTK:
         )
         self.log_textbox.pack(fill="both", expand=True, padx=20, pady=(0, 20))
         
-        # Загружаем лог
+        # Загружаем хвост лога и дальше дочитываем только новые строки
+        self.log_reader = LogTailReader(self.data_manager.log_file)
+        self.follow_log()
+    
+    def setup_log_filter(self):
+        """Панель поиска и фильтрации журнала"""
+        self.log_index = LogIndex(self.data_manager.log_file)
+        self.log_search_active = False
+        
+        filter_frame = ctk.CTkFrame(self.tab_log)
+        filter_frame.pack(fill="x", padx=20, pady=(0, 10))
+        
+        self.log_level_combo = ctk.CTkComboBox(filter_frame, values=['', *LEVELS], width=110, state="readonly")
+        self.log_level_combo.set('')
+        self.log_level_combo.grid(row=0, column=0, padx=5, pady=5)
+        
+        self.log_since_entry = ctk.CTkEntry(filter_frame, placeholder_text="С: ГГГГ-ММ-ДД ЧЧ:ММ", width=160)
+        self.log_since_entry.grid(row=0, column=1, padx=5, pady=5)
+        
+        self.log_until_entry = ctk.CTkEntry(filter_frame, placeholder_text="По: ГГГГ-ММ-ДД ЧЧ:ММ", width=160)
+        self.log_until_entry.grid(row=0, column=2, padx=5, pady=5)
+        
+        self.log_query_entry = ctk.CTkEntry(filter_frame, placeholder_text="Текст", width=160)
+        self.log_query_entry.grid(row=1, column=0, padx=5, pady=5)
+        
+        self.log_run_combo = ctk.CTkComboBox(filter_frame, values=['', *self.log_index.recent_runs()], width=160)
+        self.log_run_combo.set('')
+        self.log_run_combo.grid(row=1, column=1, padx=5, pady=5)
+        
+        buttons = ctk.CTkFrame(filter_frame, fg_color="transparent")
+        buttons.grid(row=1, column=2, padx=5, pady=5)
+        self.log_search_button = ctk.CTkButton(buttons, text="Найти", command=self.search_log, width=75)
+        self.log_search_button.pack(side="left", padx=(0, 5))
+        ctk.CTkButton(buttons, text="Сбросить", command=self.reset_log_filter, width=75).pack(side="left")
+        
+        self.log_search_status = ctk.CTkLabel(filter_frame, text="")
+        self.log_search_status.grid(row=2, column=0, columnspan=3, sticky="w", padx=5)
+    
+    def search_log(self):
+        """Найти записи журнала по фильтрам"""
+        try:
+            query = LogQuery(levels=levels_from(self.log_level_combo.get()),
+                             since=parse_time_input(self.log_since_entry.get()),
+                             until=parse_time_input(self.log_until_entry.get()),
+                             text=self.log_query_entry.get(), run_id=self.log_run_combo.get())
+        except ValueError as e:
+            messagebox.showerror(self.translations.get('error'), str(e))
+            return
+        
+        # Пока показаны результаты поиска, хвост журнала не дочитывается
+        self.log_search_active = True
+        self.log_search_button.configure(state="disabled")
+        self.log_search_status.configure(text="Поиск...")
+        self.deliver_log_search(search_in_background(self.log_index, query))
+    
+    def deliver_log_search(self, future: Future):
+        """Показать результаты поиска, когда они готовы"""
+        if not future.done():
+            self.root.after(50, self.deliver_log_search, future)
+            return
+        
+        self.log_search_button.configure(state="normal")
+        try:
+            result = future.result()
+        except Exception as e:
+            self.log_search_status.configure(text=f"Ошибка поиска: {e}")
+            logging.error(f"Ошибка поиска в журнале: {e}")
+            return
+        
+        self.log_textbox.delete("1.0", "end")
+        self.log_textbox.insert("end", "\n".join(result['lines']))
+        self.log_textbox.see("end")
+        self.log_search_status.configure(text=describe_results(result))
+        self.log_run_combo.configure(values=['', *self.log_index.recent_runs()])
+    
+    def reset_log_filter(self):
+        """Вернуться к хвосту журнала"""
+        self.log_level_combo.set('')
+        self.log_run_combo.set('')
+        for entry in (self.log_since_entry, self.log_until_entry, self.log_query_entry):
+            entry.delete(0, "end")
+        self.log_search_active = False
+        self.log_search_status.configure(text="")
+        self.log_reader = LogTailReader(self.data_manager.log_file)
         self.refresh_log()
     
     def toggle_theme(self):
@@ -393,7 +503,8 @@ class UpdaterAppCTK:
     def save_settings(self):
         """Сохранить настройки"""
         try:
-            settings = {
+            settings = dict(self.settings)
+            settings.update({
                 'token': self.token_entry.get(),
                 'version_url': self.version_url_entry.get(),
                 'download_url': self.download_url_entry.get(),
@@ -403,7 +514,7 @@ class UpdaterAppCTK:
                 'dark_theme': self.dark_theme_var.get(),
                 'language': self.language_combo.get(),
                 'execute_reg_files': self.execute_reg_var.get()
-            }
+            })
             
             self.data_manager.save_settings(settings)
             self.settings = settings
@@ -418,18 +529,48 @@ class UpdaterAppCTK:
     
     def refresh_log(self):
         """Обновить содержимое журнала"""
+        if self.log_textbox is None or self.log_search_active:
+            return
+        
         try:
-            log_content = self.data_manager.get_log_content()
+            # Пока пользователь читает старые записи, буфер не обрезается
+            at_bottom = self.log_textbox.yview()[1] >= 1.0
+            lines, dropped, reset = self.log_reader.poll(trim=at_bottom)
+            if not (lines or dropped or reset):
+                return
             
-            self.log_textbox.delete("1.0", "end")
-            self.log_textbox.insert("1.0", log_content)
+            if reset:
+                self.log_textbox.delete("1.0", "end")
+            elif dropped:
+                self.log_textbox.delete("1.0", f"{dropped + 1}.0")
+            if lines:
+                self.log_textbox.insert("end", "\n".join(lines) + "\n")
             
             # Прокрутка в конец
-            self.log_textbox.see("end")
+            if at_bottom or reset:
+                self.log_textbox.see("end")
             
         except Exception as e:
             logging.error(f"Ошибка обновления лога: {e}")
     
+    def follow_log(self):
+        """Следить за файлом журнала"""
+        self.refresh_log()
+        self.root.after(FOLLOW_INTERVAL_MS, self.follow_log)
+    
+    def load_older_log(self):
+        """Добавить страницу более ранних записей в начало журнала"""
+        if self.log_search_active:
+            return
+        
+        try:
+            older = self.log_reader.load_older()
+            if older:
+                self.log_textbox.insert("1.0", "\n".join(older) + "\n")
+                self.log_textbox.see("1.0")
+        except Exception as e:
+            logging.error(f"Ошибка чтения журнала: {e}")
+    
     def update_progress(self, progress: int):
         """Обновить прогресс"""
         self.progress_value = progress
@@ -454,33 +595,49 @@ class UpdaterAppCTK:
             text=f"{self.translations.get('latest_version')} {latest}"
         )
     
+    def deliver_check_result(self, future: Future):
+        """Показать результат проверки в потоке интерфейса, когда он готов"""
+        if not future.done():
+            self.root.after(50, self.deliver_check_result, future)
+            return
+        
+        try:
+            checker, (has_update, current_version, latest_version) = future.result()
+            
+            self.update_versions(current_version, latest_version)
+            
+            if has_update:
+                self.update_status(self.translations.get('status_update_available'))
+                # Запускаем загрузку
+                self.download_update_async(checker, latest_version)
+            else:
+                self.update_status(self.translations.get('status_up_to_date'))
+                
+        except OfflineError as e:
+            self.update_status(self.translations.get('status_offline'))
+            logging.warning(f"Проверка обновлений отложена: {e}")
+            self.wait_for_network(network_monitor.when_online(self.settings['version_url']))
+        except Exception as e:
+            self.update_status(self.translations.get('status_connection_error'))
+            logging.error(f"Ошибка проверки обновлений: {e}")
+        finally:
+            self.check_button.configure(state="normal")
+    
+    def wait_for_network(self, future: Future):
+        """Повторить проверку, когда сеть снова появится"""
+        if not future.done():
+            self.root.after(500, self.wait_for_network, future)
+            return
+        
+        # Проверка уже могла быть запущена вручную
+        if self.check_button.cget("state") != "disabled":
+            self.check_update_async()
+    
     def check_update_async(self):
         """Асинхронная проверка обновлений"""
-        def check_update_thread():
-            try:
-                self.check_button.configure(state="disabled")
-                self.update_status("Проверка обновлений...")
-                
-                checker = UpdateChecker(self.settings, self.update_progress)
-                has_update, current_version, latest_version = checker.check_version()
-                
-                self.update_versions(current_version, latest_version)
-                
-                if has_update:
-                    self.update_status(self.translations.get('status_update_available'))
-                    # Запускаем загрузку
-                    self.download_update_async(checker, latest_version)
-                else:
-                    self.update_status(self.translations.get('status_up_to_date'))
-                    
-            except Exception as e:
-                self.update_status(self.translations.get('status_connection_error'))
-                logging.error(f"Ошибка проверки обновлений: {e}")
-            finally:
-                self.check_button.configure(state="normal")
-        
-        thread = threading.Thread(target=check_update_thread, daemon=True)
-        thread.start()
+        self.check_button.configure(state="disabled")
+        self.update_status("Проверка обновлений...")
+        self.deliver_check_result(start_update_check(self.settings, self.update_progress))
     
     def download_update_async(self, checker: UpdateChecker, version: str):
         """Асинхронная загрузка обновления"""
@@ -502,12 +659,13 @@ class UpdaterAppCTK:
                         self.translations.get('success'),
                         self.translations.get('download_complete')
                     )
-                    self.refresh_log()  # Обновляем лог
                 else:
                     self.update_status(self.translations.get('status_hash_error'))
                     
             except Exception as e:
-                if "hash" in str(e).lower():
+                if isinstance(e, InsufficientSpaceError):
+                    self.update_status(self.translations.get('status_disk_space_error'))
+                elif "hash" in str(e).lower():
                     self.update_status(self.translations.get('status_hash_error'))
                 elif "extract" in str(e).lower():
                     self.update_status(self.translations.get('status_extraction_error'))
@@ -521,7 +679,16 @@ class UpdaterAppCTK:
     
     def run(self):
         """Запустить приложение"""
+        if startup_probe_enabled():
+            # Замер времени запуска: выходим, как только окно отрисовано
+            self.root.bind('<Map>', self.on_startup_probe_map, add='+')
         self.root.mainloop()
+    
+    def on_startup_probe_map(self, event=None):
+        """Сообщить о готовности окна и закрыть приложение (режим замера запуска)"""
+        if event is not None and event.widget is self.root:
+            self.root.unbind('<Map>')
+            self.root.after_idle(lambda: (report_startup_ready('customtkinter'), self.root.destroy()))
 
 
 def main_ctk():
@@ -536,6 +703,9 @@ def main_ctk():
 
 
 if __name__ == "__main__":
+    # Процессы пула (разбиение на чанки) в собранном приложении запускают этот же exe
+    from multiprocessing import freeze_support
+    freeze_support()
     # Выбираем интерфейс в зависимости от аргументов командной строки
     if len(sys.argv) > 1 and sys.argv[1] == "--ctk":
         main_ctk()
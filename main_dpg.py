@@ -6,17 +6,10 @@ Python Updater Application with DearPyGui
 """
 
 import sys
-import os
-import json
-import hashlib
-import zipfile
 import threading
+import time
 import logging
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional, Callable
-import requests
-import appdirs
+from concurrent.futures import Future
 
 try:
     import dearpygui.dearpygui as dpg
@@ -24,8 +17,13 @@ try:
 except ImportError:
     DEARPYGUI_AVAILABLE = False
 
-# Импортируем классы из основного модуля
-from main import Config, Translations, AppDataManager, UpdateChecker
+# Импортируем классы ядра (без tkinter-интерфейса из main.py)
+from updater_core import (Translations, AppDataManager, UpdateChecker, InsufficientSpaceError,
+                          OfflineError, network_monitor, start_update_check, startup_probe_enabled,
+                          report_startup_ready)
+from log_tail import LogTailReader, FOLLOW_INTERVAL_MS
+from log_index import (LogIndex, LogQuery, LEVELS, levels_from, parse_time_input, search_in_background,
+                       describe_results)
 
 
 class UpdaterAppDPG:
@@ -39,6 +37,11 @@ class UpdaterAppDPG:
         self.settings = self.data_manager.load_settings()
         self.translations = Translations(self.settings.get('language', 'ru'))
         
+        # Автопроверка при запуске: запрос версии идёт параллельно с построением окна
+        pending_check = None
+        if self.settings.get('auto_check', True):
+            pending_check = start_update_check(self.settings, self.update_progress_dpg)
+        
         # Переменные состояния
         self.current_version = self.data_manager.get_current_version()
         self.latest_version = "Неизвестно"
@@ -50,33 +53,46 @@ class UpdaterAppDPG:
         
         self.setup_ui()
         
-        # Автопроверка при запуске
-        if self.settings.get('auto_check', True):
-            threading.Timer(1.0, self.check_update_async).start()
+        # Результат автопроверки показывается, как только он готов
+        if pending_check is not None:
+            self.wait_check_result_dpg(pending_check)
     
     def setup_ui(self):
         """Создание интерфейса DearPyGui"""
         # Главное окно
         with dpg.window(label=self.translations.get('app_title'), tag="main_window"):
             
-            # Вкладки
-            with dpg.tab_bar():
+            # Вкладки: настройки и журнал строятся при первом открытии
+            with dpg.tab_bar(callback=self.on_tab_changed_dpg):
                 
                 # Вкладка обновления
                 with dpg.tab(label=self.translations.get('tab_update')):
                     self.setup_update_tab_dpg()
                 
                 # Вкладка настроек
-                with dpg.tab(label=self.translations.get('tab_settings')):
-                    self.setup_settings_tab_dpg()
+                settings_tab = dpg.add_tab(label=self.translations.get('tab_settings'))
                 
                 # Вкладка журнала
-                with dpg.tab(label=self.translations.get('tab_log')):
-                    self.setup_log_tab_dpg()
+                log_tab = dpg.add_tab(label=self.translations.get('tab_log'))
+        
+        self.lazy_tabs = {
+            settings_tab: self.setup_settings_tab_dpg,
+            log_tab: self.setup_log_tab_dpg,
+        }
         
         # Настройка темы
         self.setup_theme()
     
+    def on_tab_changed_dpg(self, sender, app_data):
+        """Построить вкладку при первом выборе"""
+        builder = self.lazy_tabs.pop(app_data, None)
+        if builder:
+            dpg.push_container_stack(app_data)
+            try:
+                builder()
+            finally:
+                dpg.pop_container_stack()
+    
     def setup_update_tab_dpg(self):
         """Настройка вкладки обновления для DearPyGui"""
         with dpg.group():
@@ -166,18 +182,41 @@ class UpdaterAppDPG:
     
     def setup_log_tab_dpg(self):
         """Настройка вкладки журнала для DearPyGui"""
+        self.log_reader = LogTailReader(self.data_manager.log_file)
+        self.log_lock = threading.Lock()
+        self.log_index = LogIndex(self.data_manager.log_file)
+        self.log_search_active = False
+        
         with dpg.group():
-            dpg.add_button(label="Обновить журнал", callback=self.refresh_log_dpg)
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Обновить журнал", callback=self.refresh_log_dpg)
+                dpg.add_button(label="Более ранние записи", callback=self.load_older_log_dpg)
+                dpg.add_checkbox(label="Следить за журналом", tag="log_follow", default_value=True)
+            
+            # Поиск и фильтрация
+            with dpg.group(horizontal=True):
+                dpg.add_combo(['', *LEVELS], tag="log_level", default_value='', width=100)
+                dpg.add_input_text(tag="log_since", hint="С: ГГГГ-ММ-ДД ЧЧ:ММ", width=160)
+                dpg.add_input_text(tag="log_until", hint="По: ГГГГ-ММ-ДД ЧЧ:ММ", width=160)
+            with dpg.group(horizontal=True):
+                dpg.add_input_text(tag="log_query", hint="Текст", width=160)
+                dpg.add_combo(['', *self.log_index.recent_runs()], tag="log_run", default_value='', width=160)
+                dpg.add_button(label="Найти", tag="log_search_button", callback=self.search_log_dpg)
+                dpg.add_button(label="Сбросить", callback=self.reset_log_filter_dpg)
+            dpg.add_text("", tag="log_search_status")
             dpg.add_separator()
             
-            # Поле для лога
-            log_content = self.data_manager.get_log_content()
+            # Поле для лога: хвост файла, дальше дочитываются только новые строки
+            self.log_reader.load_tail()
             dpg.add_input_text(tag="log_text", 
-                              default_value=log_content,
+                              default_value=self.log_reader.text(),
                               multiline=True, 
                               readonly=True,
                               width=700, 
                               height=400)
+        
+        thread = threading.Thread(target=self.follow_log_dpg, daemon=True)
+        thread.start()
     
     def setup_theme(self):
         """Настройка темы DearPyGui"""
@@ -215,7 +254,8 @@ class UpdaterAppDPG:
     def save_settings_dpg(self):
         """Сохранить настройки DearPyGui"""
         try:
-            settings = {
+            settings = dict(self.settings)
+            settings.update({
                 'token': dpg.get_value("token_input"),
                 'version_url': dpg.get_value("version_url_input"),
                 'download_url': dpg.get_value("download_url_input"),
@@ -224,7 +264,7 @@ class UpdaterAppDPG:
                 'auto_check': dpg.get_value("auto_check_checkbox"),
                 'dark_theme': dpg.get_value("dark_theme_checkbox"),
                 'language': dpg.get_value("language_combo")
-            }
+            })
             
             self.data_manager.save_settings(settings)
             self.settings = settings
@@ -237,12 +277,80 @@ class UpdaterAppDPG:
     
     def refresh_log_dpg(self):
         """Обновить содержимое журнала DearPyGui"""
+        if not dpg.does_item_exist("log_text") or self.log_search_active:
+            return
+        
         try:
-            log_content = self.data_manager.get_log_content()
-            dpg.set_value("log_text", log_content)
+            with self.log_lock:
+                # Пока пользователь читает старые записи, буфер не обрезается
+                lines, dropped, reset = self.log_reader.poll(trim=dpg.get_value("log_follow"))
+                if lines or dropped or reset:
+                    dpg.set_value("log_text", self.log_reader.text())
         except Exception as e:
             logging.error(f"Ошибка обновления лога: {e}")
     
+    def follow_log_dpg(self):
+        """Следить за файлом журнала в фоновом потоке"""
+        while dpg.is_dearpygui_running():
+            time.sleep(FOLLOW_INTERVAL_MS / 1000)
+            if dpg.get_value("log_follow"):
+                self.refresh_log_dpg()
+    
+    def load_older_log_dpg(self):
+        """Добавить страницу более ранних записей в начало журнала"""
+        if self.log_search_active:
+            return
+        
+        try:
+            with self.log_lock:
+                dpg.set_value("log_follow", False)
+                if self.log_reader.load_older():
+                    dpg.set_value("log_text", self.log_reader.text())
+        except Exception as e:
+            logging.error(f"Ошибка чтения журнала: {e}")
+    
+    def search_log_dpg(self):
+        """Найти записи журнала по фильтрам"""
+        try:
+            query = LogQuery(levels=levels_from(dpg.get_value("log_level")),
+                             since=parse_time_input(dpg.get_value("log_since")),
+                             until=parse_time_input(dpg.get_value("log_until")),
+                             text=dpg.get_value("log_query"), run_id=dpg.get_value("log_run"))
+        except ValueError as e:
+            self.show_error_popup(self.translations.get('error'), str(e))
+            return
+        
+        # Пока показаны результаты поиска, хвост журнала не дочитывается
+        self.log_search_active = True
+        dpg.configure_item("log_search_button", enabled=False)
+        dpg.set_value("log_search_status", "Поиск...")
+        future = search_in_background(self.log_index, query)
+        
+        def search_log_thread():
+            try:
+                result = future.result()
+                dpg.set_value("log_text", "\n".join(result['lines']))
+                dpg.set_value("log_search_status", describe_results(result))
+                dpg.configure_item("log_run", items=['', *self.log_index.recent_runs()])
+            except Exception as e:
+                dpg.set_value("log_search_status", f"Ошибка поиска: {e}")
+                logging.error(f"Ошибка поиска в журнале: {e}")
+            finally:
+                dpg.configure_item("log_search_button", enabled=True)
+        
+        thread = threading.Thread(target=search_log_thread, daemon=True)
+        thread.start()
+    
+    def reset_log_filter_dpg(self):
+        """Вернуться к хвосту журнала"""
+        for tag in ("log_level", "log_since", "log_until", "log_query", "log_run"):
+            dpg.set_value(tag, '')
+        dpg.set_value("log_search_status", "")
+        with self.log_lock:
+            self.log_search_active = False
+            self.log_reader = LogTailReader(self.data_manager.log_file)
+        self.refresh_log_dpg()
+    
     def update_progress_dpg(self, progress: int):
         """Обновить прогресс DearPyGui"""
         dpg.set_value("progress_bar", progress / 100.0)
@@ -262,14 +370,17 @@ class UpdaterAppDPG:
     
     def check_update_async(self):
         """Асинхронная проверка обновлений DearPyGui"""
+        self.wait_check_result_dpg(start_update_check(self.settings, self.update_progress_dpg))
+    
+    def wait_check_result_dpg(self, future: Future):
+        """Дождаться результата проверки в фоновом потоке и показать его"""
         def check_update_thread():
             try:
                 dpg.configure_item("check_button", enabled=False)
                 self.status = "Проверка обновлений..."
                 dpg.set_value("status_text", f"{self.translations.get('status')} {self.status}")
                 
-                checker = UpdateChecker(self.settings, self.update_progress_dpg)
-                has_update, current_version, latest_version = checker.check_version()
+                checker, (has_update, current_version, latest_version) = future.result()
                 
                 self.current_version = current_version
                 self.latest_version = latest_version
@@ -288,6 +399,11 @@ class UpdaterAppDPG:
                     self.status = self.translations.get('status_up_to_date')
                     dpg.set_value("status_text", f"{self.translations.get('status')} {self.status}")
                     
+            except OfflineError as e:
+                self.status = self.translations.get('status_offline')
+                dpg.set_value("status_text", f"{self.translations.get('status')} {self.status}")
+                logging.warning(f"Проверка обновлений отложена: {e}")
+                self.wait_for_network_dpg(network_monitor.when_online(self.settings['version_url']))
             except Exception as e:
                 self.status = self.translations.get('status_connection_error')
                 dpg.set_value("status_text", f"{self.translations.get('status')} {self.status}")
@@ -298,6 +414,17 @@ class UpdaterAppDPG:
         thread = threading.Thread(target=check_update_thread, daemon=True)
         thread.start()
     
+    def wait_for_network_dpg(self, future: Future):
+        """Повторить проверку, когда сеть снова появится"""
+        def wait_network_thread():
+            future.result()
+            # Проверка уже могла быть запущена вручную
+            if dpg.get_item_configuration("check_button").get('enabled', True):
+                self.check_update_async()
+        
+        thread = threading.Thread(target=wait_network_thread, daemon=True)
+        thread.start()
+    
     def download_update_async_dpg(self, checker: UpdateChecker, version: str):
         """Асинхронная загрузка обновления DearPyGui"""
         def download_thread():
@@ -316,13 +443,14 @@ class UpdaterAppDPG:
                                 f"{self.translations.get('current_version')} {version}")
                     self.show_info_popup(self.translations.get('success'), 
                                        self.translations.get('download_complete'))
-                    self.refresh_log_dpg()  # Обновляем лог
                 else:
                     self.status = self.translations.get('status_hash_error')
                     dpg.set_value("status_text", f"{self.translations.get('status')} {self.status}")
                     
             except Exception as e:
-                if "hash" in str(e).lower():
+                if isinstance(e, InsufficientSpaceError):
+                    self.status = self.translations.get('status_disk_space_error')
+                elif "hash" in str(e).lower():
                     self.status = self.translations.get('status_hash_error')
                 elif "extract" in str(e).lower():
                     self.status = self.translations.get('status_extraction_error')
@@ -341,8 +469,16 @@ class UpdaterAppDPG:
         dpg.setup_dearpygui()
         dpg.show_viewport()
         dpg.set_primary_window("main_window", True)
+        if startup_probe_enabled():
+            # Замер времени запуска: выходим после отрисовки первых кадров
+            dpg.set_frame_callback(2, self.finish_startup_probe_dpg)
         dpg.start_dearpygui()
         dpg.destroy_context()
+    
+    def finish_startup_probe_dpg(self):
+        """Сообщить о готовности окна и закрыть приложение (режим замера запуска)"""
+        report_startup_ready('dearpygui')
+        dpg.stop_dearpygui()
 
 
 def main_dpg():
@@ -357,6 +493,9 @@ def main_dpg():
 
 
 if __name__ == "__main__":
+    # Процессы пула (разбиение на чанки) в собранном приложении запускают этот же exe
+    from multiprocessing import freeze_support
+    freeze_support()
     # Выбираем интерфейс в зависимости от аргументов командной строки
     if len(sys.argv) > 1 and sys.argv[1] == "--dpg":
         main_dpg()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Метрики запусков обновления
+
+Каждый запуск (проверка версии и загрузка) измеряется по фазам монотонными
+таймерами: время, объём данных и скорость, число повторных попыток.
+Метрики запуска дописываются в историю metrics.jsonl (хранятся последние
+HISTORY_LIMIT запусков) и, если задан путь, в текстовый файл Prometheus
+для textfile-коллектора node_exporter.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator
+
+
+METRICS_HISTORY_NAME = "metrics.jsonl"
+HISTORY_LIMIT = 500
+PROMETHEUS_PREFIX = "python_updater"
+# Фазы, байты которых получены из сети (у остальных - обработанные байты)
+DOWNLOAD_PHASES = ('transfer', 'download_ranges', 'download_chunks')
+
+
+class PhaseTimer:
+    """Монотонный таймер фазы"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stopped: Optional[float] = None
+
+    def stop(self) -> float:
+        self.stopped = time.perf_counter()
+        return self.elapsed()
+
+    def elapsed(self) -> float:
+        """Прошедшее время, с"""
+        return (self.stopped or time.perf_counter()) - self.started
+
+
+class RunMetrics:
+    """
+    Метрики одного запуска обновления (потокобезопасно)
+    Если передан tracer (tracing.Tracer), каждая фаза записывается и в трассировку.
+    При включённом tracemalloc (профилирование) для фазы запоминается пиковая память
+    сверх занятой на её начало: при потоковой обработке она не растёт с размером архива.
+    """
+
+    def __init__(self, run_id: Optional[str] = None, tracer=None):
+        self.run_id = run_id
+        self.tracer = tracer
+        self.started_at = time.time()
+        self.timer = PhaseTimer()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.info: Dict[str, Any] = {}
+        self.outcome: Optional[str] = None
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.outcome is not None
+
+    def _phase_entry(self, name: str) -> Dict[str, float]:
+        return self.phases.setdefault(name, {'duration': 0.0, 'bytes': 0, 'count': 0})
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseTimer]:
+        """Измерить фазу; повторные фазы с тем же именем суммируются"""
+        timer = PhaseTimer()
+        span = self.tracer.span(name) if self.tracer is not None else nullcontext()
+        memory = tracemalloc.is_tracing()
+        if memory:
+            tracemalloc.reset_peak()
+            memory_at_start = tracemalloc.get_traced_memory()[0]
+        try:
+            with span:
+                yield timer
+        finally:
+            elapsed = timer.stop()
+            with self.lock:
+                entry = self._phase_entry(name)
+                entry['duration'] += elapsed
+                entry['count'] += 1
+                if memory and tracemalloc.is_tracing():
+                    peak = tracemalloc.get_traced_memory()[1] - memory_at_start
+                    entry['peak_memory'] = max(entry.get('peak_memory', 0), peak)
+
+    def add_bytes(self, phase: str, count: int):
+        """Учесть переданные в фазе байты"""
+        with self.lock:
+            self._phase_entry(phase)['bytes'] += count
+
+    def count(self, name: str, value: int = 1):
+        """Увеличить счётчик (например, retries)"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_info(self, **info):
+        """Дополнительные сведения о запуске (версия, режим загрузки)"""
+        with self.lock:
+            self.info.update(info)
+
+    def finish(self, outcome: str) -> Dict[str, Any]:
+        """Завершить запуск и вернуть запись для истории"""
+        with self.lock:
+            self.outcome = outcome
+            duration = self.timer.stop()
+            phases = {}
+            for name, entry in self.phases.items():
+                phase = {'duration': round(entry['duration'], 4), 'count': entry['count']}
+                if entry['bytes']:
+                    phase['bytes'] = entry['bytes']
+                    if entry['duration'] > 0:
+                        phase['throughput'] = round(entry['bytes'] / entry['duration'])
+                if 'peak_memory' in entry:
+                    phase['peak_memory'] = entry['peak_memory']
+                phases[name] = phase
+            return {
+                'run_id': self.run_id,
+                'started': round(self.started_at, 3),
+                'finished': round(time.time(), 3),
+                'duration': round(duration, 4),
+                'outcome': outcome,
+                'bytes_downloaded': sum(self.phases[name]['bytes'] for name in DOWNLOAD_PHASES
+                                        if name in self.phases),
+                'retries': self.counters.get('retries', 0),
+                'counters': dict(self.counters),
+                'phases': phases,
+                **self.info,
+            }
+
+
+def append_history(path: Path, record: Dict[str, Any], limit: int = HISTORY_LIMIT):
+    """Дописать запись в историю, оставив не больше limit последних"""
+    path = Path(path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    lines = path.read_text(encoding='utf-8').splitlines(keepends=True)
+    if len(lines) > limit:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(''.join(lines[-limit:]), encoding='utf-8')
+        os.replace(tmp, path)
+
+
+def load_history(path: Path) -> list:
+    """Прочитать историю запусков (повреждённые строки пропускаются)"""
+    records = []
+    if Path(path).exists():
+        for line in Path(path).read_text(encoding='utf-8').splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def _label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(record: Dict[str, Any]) -> str:
+    """Метрики последнего запуска в текстовом формате Prometheus"""
+    p = PROMETHEUS_PREFIX
+    lines = [
+        f"# HELP {p}_last_run_timestamp_seconds Время завершения последнего запуска обновления",
+        f"# TYPE {p}_last_run_timestamp_seconds gauge",
+        f"{p}_last_run_timestamp_seconds {record['finished']}",
+        f"# HELP {p}_last_run_duration_seconds Длительность последнего запуска",
+        f"# TYPE {p}_last_run_duration_seconds gauge",
+        f"{p}_last_run_duration_seconds {record['duration']}",
+        f"# HELP {p}_last_run_success Последний запуск завершился без ошибок",
+        f"# TYPE {p}_last_run_success gauge",
+        f"{p}_last_run_success {0 if record['outcome'] in ('error', 'failed') else 1}",
+        f"# HELP {p}_last_run_info Сведения о последнем запуске",
+        f"# TYPE {p}_last_run_info gauge",
+        f'{p}_last_run_info{{run_id="{_label(record["run_id"])}",outcome="{_label(record["outcome"])}",'
+        f'version="{_label(record.get("version", ""))}",mode="{_label(record.get("mode", ""))}"}} 1',
+        f"# HELP {p}_last_run_retries Повторные попытки в последнем запуске",
+        f"# TYPE {p}_last_run_retries gauge",
+        f"{p}_last_run_retries {record['retries']}",
+        f"# HELP {p}_phase_duration_seconds Длительность фазы последнего запуска",
+        f"# TYPE {p}_phase_duration_seconds gauge",
+    ]
+    for name, phase in record['phases'].items():
+        lines.append(f'{p}_phase_duration_seconds{{phase="{_label(name)}"}} {phase["duration"]}')
+    lines += [
+        f"# HELP {p}_phase_bytes Байты, переданные в фазе последнего запуска",
+        f"# TYPE {p}_phase_bytes gauge",
+    ]
+    for name, phase in record['phases'].items():
+        if 'bytes' in phase:
+            lines.append(f'{p}_phase_bytes{{phase="{_label(name)}"}} {phase["bytes"]}')
+    lines += [
+        f"# HELP {p}_phase_throughput_bytes_per_second Скорость передачи в фазе последнего запуска",
+        f"# TYPE {p}_phase_throughput_bytes_per_second gauge",
+    ]
+    for name, phase in record['phases'].items():
+        if 'throughput' in phase:
+            lines.append(f'{p}_phase_throughput_bytes_per_second{{phase="{_label(name)}"}} {phase["throughput"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: Path, record: Dict[str, Any]):
+    """Записать файл для textfile-коллектора (атомарно, чтобы коллектор не прочитал половину)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_text(prometheus_text(record), encoding='utf-8')
+    os.replace(tmp, path)
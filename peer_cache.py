@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Кэш обновлений для соседей по локальной сети
+
+В режиме соседей (настройка peer_enabled) проверенный архив после установки
+не удаляется, а остаётся в peer_cache/ папки данных и раздаётся по HTTP
+другим машинам площадки. Перед загрузкой с сервера обновлений клиент ищет
+соседей - из списка peers и через UDP multicast (объявления и запрос) - и
+загружает архив у того, кто его объявил. Архив от соседа всегда проверяется
+хешем, опубликованным сервером обновлений; при ошибке загрузка идёт с сервера.
+
+Соседи узнают друг друга по ключу, производному от токена (токен сервера
+обновлений соседям не передаётся). Для проверки на одной машине:
+    HOME=/tmp/a python peer_cache.py serve --port 8801
+    HOME=/tmp/b python peer_cache.py discover
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import struct
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+PEER_CACHE_DIR_NAME = "peer_cache"
+SERVICE_NAME = "python-updater-peer"
+MULTICAST_GROUP = "239.255.77.77"
+MULTICAST_PORT = 48777
+ANNOUNCE_INTERVAL = 30.0
+DEFAULT_PEER_PORT = 8765
+CACHE_KEEP = 2
+ARTIFACT_PATH = "/peer/artifact/"
+KEY_HEADER = "X-Peer-Key"
+
+# Идентификатор процесса: свои объявления не считаются соседями
+INSTANCE_ID = uuid.uuid4().hex
+
+
+def peer_key(token: str) -> str:
+    """Ключ соседей площадки: производный от токена, сам токен по сети не передаётся"""
+    return hashlib.sha256(f"{SERVICE_NAME}:{token}".encode('utf-8')).hexdigest()
+
+
+class PeerCache:
+    """Проверенные архивы, доступные соседям: <digest>.zip и <digest>.json"""
+
+    def __init__(self, directory: Path, keep: int = CACHE_KEEP):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    def store(self, archive_path: Path, declaration: str, version: str) -> Path:
+        """Перенести проверенный архив в кэш (объявление хеша - от сервера обновлений)"""
+        digest = declaration.rpartition(':')[2]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / f"{digest}.zip"
+        with self.lock:
+            shutil.move(str(archive_path), str(target))
+            meta = {'digest': digest, 'hash': declaration, 'version': version,
+                    'size': target.stat().st_size, 'stored_at': time.time()}
+            (self.directory / f"{digest}.json").write_text(json.dumps(meta), encoding='utf-8')
+            self._prune()
+        return target
+
+    def _prune(self):
+        artifacts = sorted(self.artifacts(), key=lambda meta: meta['stored_at'], reverse=True)
+        for meta in artifacts[self.keep:]:
+            for suffix in ('.zip', '.json'):
+                (self.directory / f"{meta['digest']}{suffix}").unlink(missing_ok=True)
+
+    def artifacts(self) -> List[Dict[str, Any]]:
+        result = []
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            if (self.directory / f"{meta['digest']}.zip").exists():
+                result.append(meta)
+        return result
+
+    def path(self, digest: str) -> Optional[Path]:
+        if not digest.isalnum():
+            return None
+        path = self.directory / f"{digest}.zip"
+        return path if path.exists() else None
+
+
+class PeerRequestHandler(BaseHTTPRequestHandler):
+    """GET /peer/artifacts - список архивов, GET /peer/artifact/<digest> - архив (с Range)"""
+
+    def log_message(self, format, *args):
+        logging.debug(f"Сосед {self.client_address[0]}: {format % args}")
+
+    def do_GET(self):
+        if self.headers.get(KEY_HEADER) != self.server.key:
+            self.send_error(403)
+            return
+        if self.path == "/peer/artifacts":
+            body = json.dumps(self.server.cache.artifacts()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith(ARTIFACT_PATH):
+            path = self.server.cache.path(self.path[len(ARTIFACT_PATH):])
+            if path is None:
+                self.send_error(404)
+                return
+            self.send_artifact(path)
+        else:
+            self.send_error(404)
+
+    def send_artifact(self, path: Path):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            start, end = 0, size - 1
+            range_header = self.headers.get('Range', '')
+            if range_header.startswith('bytes=') and ',' not in range_header:
+                first, _, last = range_header[6:].partition('-')
+                try:
+                    start, end = (int(first), min(int(last), size - 1) if last else size - 1) if first \
+                        else (max(0, size - int(last)), size - 1)
+                except ValueError:
+                    start, end = 0, size - 1
+                if start > end:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{size}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+            self.wfile.flush()
+            # Тело отдаётся из файла в сокет без копирования в Python
+            self.connection.sendfile(f, start, end - start + 1)
+
+
+class PeerServer:
+    """HTTP сервер кэша и объявления в multicast (фоновые потоки)"""
+
+    def __init__(self, cache: PeerCache, key: str, port: int = DEFAULT_PEER_PORT, multicast: bool = True):
+        self.cache = cache
+        self.key = key
+        self.multicast = multicast
+        self.httpd = ThreadingHTTPServer(('', port), PeerRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.cache = cache
+        self.httpd.key = key
+        self.port = self.httpd.server_address[1]
+        self.stop_event = threading.Event()
+
+    def start(self) -> 'PeerServer':
+        threading.Thread(target=self.httpd.serve_forever, name="peer-server", daemon=True).start()
+        if self.multicast:
+            threading.Thread(target=self._announce_loop, name="peer-announce", daemon=True).start()
+        logging.info(f"Раздача обновлений соседям на порту {self.port}")
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def announcement(self) -> bytes:
+        return json.dumps({
+            'service': SERVICE_NAME, 'type': 'announce', 'instance': INSTANCE_ID,
+            'key_id': self.key[:16], 'port': self.port,
+            'artifacts': [meta['digest'] for meta in self.cache.artifacts()],
+        }).encode('utf-8')
+
+    def _announce_loop(self):
+        """Объявлять себя раз в ANNOUNCE_INTERVAL и сразу в ответ на запрос"""
+        try:
+            sock = multicast_socket(bind=True)
+        except OSError as e:
+            logging.warning(f"Объявления соседям через multicast недоступны: {e}")
+            return
+        with sock:
+            sock.settimeout(1.0)
+            next_announce = 0.0
+            while not self.stop_event.is_set():
+                if time.monotonic() >= next_announce:
+                    sock.sendto(self.announcement(), (MULTICAST_GROUP, MULTICAST_PORT))
+                    next_announce = time.monotonic() + ANNOUNCE_INTERVAL
+                try:
+                    data, address = sock.recvfrom(65536)
+                except socket.timeout:
+                    continue
+                message = parse_message(data, self.key)
+                if message and message['type'] == 'query' and message['instance'] != INSTANCE_ID:
+                    sock.sendto(self.announcement(), address)
+
+
+def multicast_socket(bind: bool) -> socket.socket:
+    """UDP сокет группы соседей; несколько процессов на одной машине делят порт"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    if bind:
+        sock.bind(('', MULTICAST_PORT))
+        membership = struct.pack('4s4s', socket.inet_aton(MULTICAST_GROUP), socket.inet_aton('0.0.0.0'))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    return sock
+
+
+def parse_message(data: bytes, key: str) -> Optional[Dict[str, Any]]:
+    """Сообщение соседа той же площадки или None"""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or message.get('service') != SERVICE_NAME or \
+            message.get('key_id') != key[:16] or message.get('type') not in ('announce', 'query'):
+        return None
+    return message
+
+
+def discover_peers(key: str, digest: Optional[str] = None, timeout: float = 0.5) -> List[str]:
+    """
+    Найти соседей через multicast: запрос и ответы в течение timeout
+    Возвращает адреса http://host:port соседей, у которых есть digest (или всех).
+    """
+    peers = []
+    with multicast_socket(bind=False) as sock:
+        query = {'service': SERVICE_NAME, 'type': 'query', 'instance': INSTANCE_ID, 'key_id': key[:16]}
+        sock.sendto(json.dumps(query).encode('utf-8'), (MULTICAST_GROUP, MULTICAST_PORT))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, address = sock.recvfrom(65536)
+            except socket.timeout:
+                break
+            message = parse_message(data, key)
+            if not message or message['type'] != 'announce' or message['instance'] == INSTANCE_ID:
+                continue
+            if digest is not None and digest not in message.get('artifacts', []):
+                continue
+            url = f"http://{address[0]}:{int(message['port'])}"
+            if url not in peers:
+                peers.append(url)
+    return peers
+
+
+def artifact_url(peer: str, digest: str) -> str:
+    peer = peer if '://' in peer else f"http://{peer}"
+    return f"{peer.rstrip('/')}{ARTIFACT_PATH}{digest}"
+
+
+_server_lock = threading.Lock()
+_server: Optional[PeerServer] = None
+
+
+def ensure_server(settings: Dict[str, Any], cache_dir: Path) -> Optional[PeerServer]:
+    """Запустить раздачу соседям один раз на процесс (если режим соседей включён)"""
+    global _server
+    if not settings.get('peer_enabled', False):
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = PeerServer(PeerCache(cache_dir, settings.get('peer_cache_keep', CACHE_KEEP)),
+                                     peer_key(settings.get('token', '')),
+                                     settings.get('peer_port', DEFAULT_PEER_PORT),
+                                     settings.get('peer_multicast', True)).start()
+            except OSError as e:
+                logging.warning(f"Не удалось запустить раздачу обновлений соседям: {e}")
+        return _server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Раздача кэша и поиск соседей из командной строки (проверка на одной машине)"""
+    from updater_core import AppDataManager
+
+    parser = argparse.ArgumentParser(description="Кэш обновлений для соседей по локальной сети")
+    parser.add_argument("command", choices=('serve', 'discover'))
+    parser.add_argument("--port", type=int, default=None, help="порт раздачи (по умолчанию: peer_port из настроек)")
+    parser.add_argument("--no-multicast", action="store_true", help="не объявлять себя через multicast")
+    parser.add_argument("--timeout", type=float, default=1.0, help="ожидание ответов при поиске, с")
+    args = parser.parse_args(argv)
+
+    app_data = AppDataManager()
+    settings = app_data.load_settings()
+    key = peer_key(settings.get('token', ''))
+
+    if args.command == 'discover':
+        for peer in discover_peers(key, timeout=args.timeout):
+            print(peer)
+        return 0
+
+    server = PeerServer(PeerCache(app_data.app_dir / PEER_CACHE_DIR_NAME, settings.get('peer_cache_keep', CACHE_KEEP)),
+                        key, args.port if args.port is not None else settings.get('peer_port', DEFAULT_PEER_PORT),
+                        not args.no_multicast).start()
+    print(f"📡 Раздача {len(server.cache.artifacts())} архивов на порту {server.port} (Ctrl+C - остановить)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
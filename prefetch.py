@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновая загрузка и подготовка обновления до установки
+
+При настройке prefetch обновление, найденное проверкой (start_update_check),
+загружается, проверяется и распаковывается в download_path/staging/<версия>/
+в фоновом потоке с пониженным приоритетом. Установка подготовленной версии -
+только перенос файлов (os.replace в пределах одного диска), запись индекса
+установки, .reg файлы и сохранение версии.
+
+Установка не ждёт фоновую подготовку своего процесса: download_update
+отменяет её (cancel_prefetch) и загружает обновление с обычным приоритетом.
+Подготовка поэтому пригодится, если установку откладывают: приложение
+закрыли до неё или устанавливает другой процесс.
+
+Подготовка ограничена бюджетом prefetch_max_bytes (архив и распакованные
+файлы) и свободным местом на диске. Пока она идёт, сервер раз в
+prefetch_recheck_interval секунд опрашивается: если появилась другая
+версия, подготовка отменяется и начинается заново для неё. Загрузку
+подготовка ведёт под общей блокировкой (см. download_lock.py), поэтому
+установка в другом процессе дожидается её и показывает прогресс.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+STAGING_DIR_NAME = "staging"
+STAGED_FILE_NAME = "staged.json"
+PREFETCH_NICE = 10
+
+# Windows: фоновый режим потока снижает приоритет процессора, ввода-вывода и памяти
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+
+
+class PrefetchCancelled(Exception):
+    """Подготовка обновления отменена (появилась другая версия или началась установка)"""
+
+
+def lower_thread_priority():
+    """
+    Понизить приоритет текущего потока
+    В Linux nice задаётся для потока; приоритет ввода-вывода планировщик
+    выводит из nice. Потоки, созданные этим потоком, наследуют приоритет.
+    """
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+        elif sys.platform.startswith("linux"):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICE)
+    except (OSError, AttributeError) as e:
+        logging.debug(f"Не удалось понизить приоритет подготовки обновления: {e}")
+
+
+def staging_root(download_path: str) -> Path:
+    return Path(download_path) / STAGING_DIR_NAME
+
+
+def staging_path(download_path: str, version: str) -> Path:
+    return staging_root(download_path) / version
+
+
+def clear_staging(download_path: str, keep: Optional[str] = None):
+    """Удалить подготовленные версии (кроме keep) и остатки прерванной подготовки"""
+    root = staging_root(download_path)
+    if not root.exists():
+        return
+    for path in root.iterdir():
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def write_staged(stage_dir: Path, version: str, declaration: str, records: List[tuple]):
+    """Отметить подготовку завершённой (пишется последним и атомарно)"""
+    marker = {'version': version, 'hash': declaration, 'staged_at': time.time(),
+              'records': [list(record) for record in records]}
+    tmp_path = stage_dir / (STAGED_FILE_NAME + ".tmp")
+    tmp_path.write_text(json.dumps(marker), encoding='utf-8')
+    os.replace(tmp_path, stage_dir / STAGED_FILE_NAME)
+
+
+def read_staged(download_path: str, version: str) -> Optional[Dict[str, Any]]:
+    """Отметка полностью подготовленной версии или None"""
+    try:
+        marker = json.loads((staging_path(download_path, version) / STAGED_FILE_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return marker if marker.get('version') == version else None
+
+
+def check_budget(download_path: str, needed: int, budget: int):
+    """Проверить, что подготовка укладывается в бюджет и свободное место"""
+    if needed > budget:
+        raise OSError(f"Подготовка обновления требует {needed} байт, бюджет {budget} байт")
+    existing = Path(download_path).resolve()
+    while not existing.exists():
+        existing = existing.parent
+    free = shutil.disk_usage(existing).free
+    if needed >= free:
+        raise OSError(f"Недостаточно места для подготовки обновления: нужно {needed} байт, свободно {free}")
+
+
+def activate(download_path: str, version: str, extract_path: Path) -> List[tuple]:
+    """
+    Перенести подготовленные файлы в папку установки
+    Размер и время изменения при переносе сохраняются, поэтому записи индекса
+    установки из отметки подготовки остаются верными. Возвращает эти записи.
+    """
+    stage_dir = staging_path(download_path, version)
+    marker = read_staged(download_path, version)
+    if marker is None:
+        raise FileNotFoundError(f"Версия {version} не подготовлена")
+    source_root = stage_dir / "update"
+    created = set()
+    for name, *_ in marker['records']:
+        target = extract_path / name
+        if target.parent not in created:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            created.add(target.parent)
+        os.replace(source_root / name, target)
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    try:
+        staging_root(download_path).rmdir()
+    except OSError:
+        pass  # остались другие подготовленные версии
+    return [tuple(record) for record in marker['records']]
+
+
+class Prefetcher:
+    """Фоновая подготовка обновления: одна версия за раз, с отменой при появлении новой"""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.cancel_event: Optional[threading.Event] = None
+        self.version: Optional[str] = None
+
+    def start(self, version: str):
+        """Подготовить версию; подготовка другой версии отменяется"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                if self.version == version:
+                    return
+                logging.info(f"Подготовка версии {self.version} отменена: доступна версия {version}")
+                self.cancel_event.set()
+            previous = self.thread
+            self.version = version
+            self.cancel_event = threading.Event()
+            self.thread = threading.Thread(target=self._run, args=(version, self.cancel_event, previous),
+                                           name="prefetch", daemon=True)
+            self.thread.start()
+
+    def cancel(self):
+        with self.lock:
+            if self.cancel_event is not None:
+                self.cancel_event.set()
+
+    def stop(self):
+        """Отменить подготовку и дождаться, пока она освободит блокировку загрузки"""
+        with self.lock:
+            thread = self.thread
+            if thread is None or not thread.is_alive():
+                return
+            logging.info(f"Подготовка версии {self.version} отменена: начата установка")
+            self.cancel_event.set()
+        thread.join()
+
+    def _run(self, version: str, cancel_event: threading.Event, previous: Optional[threading.Thread]):
+        from updater_core import UpdateChecker
+
+        # Отменённая подготовка должна освободить блокировку загрузки
+        if previous is not None:
+            previous.join()
+        lower_thread_priority()
+        checker = UpdateChecker(self.settings)
+        stopped = threading.Event()
+        # У наблюдателя своё соединение: сессия подготовки занята загрузкой
+        threading.Thread(target=self._watch, args=(UpdateChecker(self.settings), version, cancel_event, stopped),
+                         name="prefetch-watch", daemon=True).start()
+        try:
+            checker.prefetch_update(self.settings['download_path'], version, cancel_event)
+        except Exception as e:
+            logging.warning(f"Подготовка обновления {version} не удалась: {e}")
+        finally:
+            stopped.set()
+
+    def _watch(self, checker, version: str, cancel_event: threading.Event, stopped: threading.Event):
+        """Опрашивать сервер, пока идёт подготовка, и перезапустить её для новой версии"""
+        interval = self.settings.get('prefetch_recheck_interval', 60)
+        while not stopped.wait(interval):
+            try:
+                latest = checker.read_text(self.settings['version_url']).strip()
+            except Exception as e:
+                logging.debug(f"Повторная проверка версии при подготовке не удалась: {e}")
+                continue
+            # Отменённую подготовку (новая версия или установка) не перезапускаем
+            if latest and latest != version and not cancel_event.is_set():
+                self.start(latest)
+                return
+
+
+_prefetcher_lock = threading.Lock()
+_prefetcher: Optional[Prefetcher] = None
+
+
+def start_prefetch(settings: Dict[str, Any], version: str) -> Optional[Prefetcher]:
+    """Начать фоновую подготовку версии (если включена настройка prefetch)"""
+    global _prefetcher
+    if not settings.get('prefetch', False):
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(settings)
+    _prefetcher.start(version)
+    return _prefetcher
+
+
+def cancel_prefetch():
+    """
+    Отменить фоновую подготовку в этом процессе и дождаться её
+    Полностью подготовленная версия остаётся в staging и переносится установкой.
+    """
+    with _prefetcher_lock:
+        prefetcher = _prefetcher
+    if prefetcher is not None:
+        prefetcher.stop()
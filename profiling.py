@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Профилирование запуска обновления
+
+С флагом лаунчера --profile (переменная окружения PYTHON_UPDATER_PROFILE)
+или настройкой profile первый запуск обновления в процессе - проверка,
+загрузка, распаковка - выполняется под cProfile и tracemalloc. Рядом с
+журналом сохраняются profile-<run_id>.prof (для pstats, snakeviz) и
+profile-<run_id>.txt: самые затратные по времени функции, места выделения
+памяти и пиковая память каждой фазы, по которой видно, что большой архив
+обрабатывается потоком, а не читается в память целиком.
+cProfile и pstats импортируются только при профилировании.
+"""
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator
+
+
+PROFILE_ENV = "PYTHON_UPDATER_PROFILE"
+TOP_N = 30
+
+_claim_lock = threading.Lock()
+_claimed = False
+
+
+def profiling_requested(settings: Dict[str, Any]) -> bool:
+    """Запрошено ли профилирование (флагом --profile или настройкой)"""
+    return bool(os.environ.get(PROFILE_ENV)) or bool(settings.get('profile', False))
+
+
+def claim_profile() -> bool:
+    """Профилируется только один запуск за процесс: True для первого запросившего"""
+    global _claimed
+    with _claim_lock:
+        if _claimed:
+            return False
+        _claimed = True
+        return True
+
+
+def _format_size(size: float) -> str:
+    for unit in ('Б', 'КБ', 'МБ'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'Б' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+class RunProfiler:
+    """
+    cProfile и tracemalloc для одного запуска
+    cProfile работает в потоке, где включён, поэтому проверка (фоновый поток)
+    и загрузка (поток загрузки) оборачиваются в profiling() по очереди, а
+    статистика накапливается в одном профиле. tracemalloc видит все потоки.
+    """
+
+    def __init__(self, run_id: Optional[str], top_n: int = TOP_N):
+        import cProfile
+
+        self.run_id = run_id
+        self.top_n = top_n
+        self.profile = cProfile.Profile()
+        self.lock = threading.Lock()
+        self.own_tracemalloc = not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        self.start_snapshot = tracemalloc.take_snapshot()
+
+    @contextmanager
+    def profiling(self) -> Iterator[None]:
+        """Профилировать блок в текущем потоке"""
+        with self.lock:
+            self.profile.enable()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.profile.disable()
+
+    def _cpu_summary(self) -> str:
+        import io
+        import pstats
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+        return stream.getvalue()
+
+    def _memory_summary(self, snapshot: tracemalloc.Snapshot) -> str:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                   tracemalloc.Filter(False, "<unknown>")]
+        snapshot = snapshot.filter_traces(filters)
+        lines = [f"Выделения памяти за запуск (прирост, топ-{self.top_n}):"]
+        for stat in snapshot.compare_to(self.start_snapshot.filter_traces(filters), 'lineno')[:self.top_n]:
+            lines.append(f"  {_format_size(stat.size_diff):>10}  {stat.count_diff:+7d} блоков  {stat.traceback}")
+        return "\n".join(lines)
+
+    def finish(self, directory: Path, record: Dict[str, Any]) -> Path:
+        """Остановить профилирование и сохранить .prof и текстовую сводку; возвращает путь к сводке"""
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+
+        directory = Path(directory)
+        prof_path = directory / f"profile-{self.run_id}.prof"
+        summary_path = directory / f"profile-{self.run_id}.txt"
+        self.profile.dump_stats(str(prof_path))
+
+        lines = [
+            f"Запуск {self.run_id}: результат={record.get('outcome')}, режим={record.get('mode', '-')}, "
+            f"длительность={record.get('duration')} с",
+            f"Память (tracemalloc): текущая={_format_size(current)}, пиковая={_format_size(peak)}",
+            "",
+            "Фазы: длительность, байты, пиковая память сверх занятой на начало фазы",
+        ]
+        for name, phase in record.get('phases', {}).items():
+            peak_memory = phase.get('peak_memory')
+            lines.append(f"  {name:<16} {phase['duration']:>9.4f} с  {_format_size(phase.get('bytes', 0)):>10}  "
+                         f"{_format_size(peak_memory) if peak_memory is not None else '-':>10}")
+        lines += ["", self._memory_summary(snapshot), "",
+                  f"Время CPU (топ-{self.top_n}, полный профиль: {prof_path.name}):", self._cpu_summary()]
+        summary_path.write_text("\n".join(lines), encoding='utf-8')
+        return summary_path
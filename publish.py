@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инструмент публикации релизов Python Updater
+
+Собирает из папки сборки детерминированный ZIP архив, SHA256 хеш,
+пофайловый манифест и дельты относительно последних N релизов.
+Результат раскладывается в папку, которую simple_server.py умеет
+раздавать напрямую (python simple_server.py --root <папка>).
+
+Структура папки релизов:
+    version.txt                     - последняя версия
+    myfile.zip                      - архив последней версии
+    myfile.zip.sha256               - хеш архива (SHA256 или объявление --hash-algorithm/--tree-leaf-size)
+    manifest.json                   - манифест последней версии
+    releases.json                   - список опубликованных версий
+    versions/<версия>/...           - архив, хеш и манифест каждой версии
+    deltas/<из>-<в>.zip[.sha256]    - дельты между версиями
+    chunk_index.json                - индекс чанков последней версии (--chunks)
+    chunks/<xx>/<sha256>            - общее хранилище чанков всех версий (--chunks)
+
+С --bundle последний релиз дополнительно упаковывается в офлайн-пакет
+(см. local_source.py) для установки без сети.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+# Фиксированная дата для всех записей архива (минимум формата ZIP)
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+ARCHIVE_NAME = "myfile.zip"
+MANIFEST_NAME = "manifest.json"
+DELTA_MANIFEST_NAME = "delta.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def list_build_files(build_dir: Path) -> List[str]:
+    """Получить отсортированный список файлов сборки (POSIX пути)"""
+    files = []
+    for path in build_dir.rglob("*"):
+        if path.is_file():
+            files.append(path.relative_to(build_dir).as_posix())
+    return sorted(files)
+
+
+def hash_files(build_dir: str, names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Вычислить размер, SHA256 и CRC32 для группы файлов (выполняется в процессе пула)"""
+    result = {}
+    for name in names:
+        sha256_hash = hashlib.sha256()
+        crc = 0
+        size = 0
+        with open(os.path.join(build_dir, name), "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                sha256_hash.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+        result[name] = {
+            'size': size,
+            'sha256': sha256_hash.hexdigest(),
+            'crc32': f"{crc & 0xFFFFFFFF:08x}",
+        }
+    return result
+
+
+def file_sha256(path: Path) -> str:
+    """Вычислить SHA256 хеш файла"""
+    sha256_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def _zip_info(name: str, source: Optional[Path] = None) -> zipfile.ZipInfo:
+    """Создать запись ZIP с фиксированными метаданными"""
+    info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3  # Unix, независимо от платформы публикации
+    mode = 0o644
+    if source is not None and os.access(source, os.X_OK):
+        mode = 0o755
+    info.external_attr = (0o100000 | mode) << 16
+    return info
+
+
+def write_deterministic_zip(archive_path: str, build_dir: str, names: List[str],
+                            extra: Optional[Dict[str, bytes]] = None) -> str:
+    """
+    Записать детерминированный ZIP архив (выполняется в процессе пула)
+    Одинаковые входные данные дают побайтно одинаковый архив.
+    Возвращает SHA256 хеш архива.
+    """
+    archive_path = Path(archive_path)
+    tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zip_file:
+        for name in sorted(names):
+            source = Path(build_dir) / name
+            info = _zip_info(name, source)
+            info.file_size = source.stat().st_size  # нужен для выбора ZIP64 заранее
+            with open(source, 'rb') as src, zip_file.open(info, 'w') as dst:
+                shutil.copyfileobj(src, dst, HASH_BLOCK_SIZE)
+        for name in sorted(extra or {}):
+            zip_file.writestr(_zip_info(name), extra[name])
+    os.replace(tmp_path, archive_path)
+    return file_sha256(archive_path)
+
+
+def build_delta(delta_path: str, build_dir: str, base_manifest: Dict[str, Any],
+                manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Построить дельту между базовой и новой версией (выполняется в процессе пула)
+    Дельта - детерминированный ZIP с изменёнными и новыми файлами и delta.json
+    со списком удалённых файлов.
+    """
+    base_files = base_manifest.get('files', {})
+    files = manifest['files']
+    changed = sorted(name for name, info in files.items()
+                     if base_files.get(name, {}).get('sha256') != info['sha256'])
+    removed = sorted(name for name in base_files if name not in files)
+
+    delta_info = {
+        'from': base_manifest['version'],
+        'to': manifest['version'],
+        'base_sha256': base_manifest.get('sha256'),
+        'changed': changed,
+        'removed': removed,
+    }
+    payload = json.dumps(delta_info, indent=2, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    sha256 = write_deterministic_zip(delta_path, build_dir, changed, {DELTA_MANIFEST_NAME: payload})
+    Path(delta_path + ".sha256").write_text(sha256, encoding='utf-8')
+
+    return {
+        'from': delta_info['from'],
+        'path': f"deltas/{Path(delta_path).name}",
+        'size': os.path.getsize(delta_path),
+        'sha256': sha256,
+        'changed': len(changed),
+        'removed': len(removed),
+    }
+
+
+class ReleasePublisher:
+    """Публикация релиза в папку, раздаваемую сервером обновлений"""
+
+    def __init__(self, output_dir: Path, workers: Optional[int] = None, delta_count: int = 3,
+                 chunks: bool = False, hash_algorithm: str = 'sha256', tree_leaf_size: int = 0):
+        from hashing import HashSpec
+        
+        self.output_dir = Path(output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.delta_count = delta_count
+        self.chunks = chunks
+        self.hash_spec = HashSpec(hash_algorithm, tree_leaf_size)
+        self.releases_file = self.output_dir / "releases.json"
+
+    def load_releases(self) -> List[str]:
+        """Загрузить список опубликованных версий (от старых к новым)"""
+        if self.releases_file.exists():
+            return json.loads(self.releases_file.read_text(encoding='utf-8'))
+        return []
+
+    def load_manifest(self, version: str) -> Optional[Dict[str, Any]]:
+        """Загрузить манифест опубликованной версии"""
+        manifest_path = self.output_dir / "versions" / version / MANIFEST_NAME
+        if manifest_path.exists():
+            return json.loads(manifest_path.read_text(encoding='utf-8'))
+        return None
+
+    def _hash_build(self, pool: ProcessPoolExecutor, build_dir: Path,
+                    names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Хешировать файлы сборки параллельно, группами по процессам пула"""
+        batch_count = max(1, min(len(names), self.workers * 4))
+        batches = [names[i::batch_count] for i in range(batch_count)]
+        files = {}
+        for result in pool.map(hash_files, [str(build_dir)] * len(batches), batches):
+            files.update(result)
+        return {name: files[name] for name in names}
+    
+    def _chunk_build(self, pool: ProcessPoolExecutor, build_dir: Path, names: List[str]):
+        """Запустить разбиение файлов на чанки в процессах пула"""
+        from chunk_store import publish_chunks, CHUNKS_DIR_NAME
+        
+        chunks_dir = self.output_dir / CHUNKS_DIR_NAME
+        batch_count = max(1, min(len(names), self.workers * 4))
+        return [pool.submit(publish_chunks, str(build_dir), names[i::batch_count], str(chunks_dir))
+                for i in range(batch_count)]
+
+    def publish(self, build_dir: Path, version: str) -> Dict[str, Any]:
+        """Опубликовать версию из папки сборки"""
+        build_dir = Path(build_dir)
+        if not build_dir.is_dir():
+            raise FileNotFoundError(f"Папка сборки не найдена: {build_dir}")
+
+        releases = self.load_releases()
+        if version in releases:
+            raise ValueError(f"Версия {version} уже опубликована")
+
+        version_dir = self.output_dir / "versions" / version
+        version_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / "deltas").mkdir(parents=True, exist_ok=True)
+
+        names = list_build_files(build_dir)
+        archive_path = version_dir / ARCHIVE_NAME
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            files = self._hash_build(pool, build_dir, names)
+            manifest = {
+                'version': version,
+                'archive': ARCHIVE_NAME,
+                'files': files,
+            }
+
+            # Архив и дельты строятся одновременно в разных процессах
+            archive_future = pool.submit(write_deterministic_zip, str(archive_path),
+                                         str(build_dir), names)
+            delta_futures = []
+            for base_version in releases[-self.delta_count:] if self.delta_count > 0 else []:
+                base_manifest = self.load_manifest(base_version)
+                if base_manifest is None:
+                    continue
+                delta_path = self.output_dir / "deltas" / f"{base_version}-{version}.zip"
+                delta_futures.append(pool.submit(build_delta, str(delta_path), str(build_dir),
+                                                 base_manifest, manifest))
+
+            chunk_futures = self._chunk_build(pool, build_dir, names) if self.chunks else []
+            
+            manifest['sha256'] = archive_future.result()
+            manifest['size'] = archive_path.stat().st_size
+            hash_declaration = manifest['sha256']
+            if self.hash_spec.leaf_size:
+                # Дерево хешей: листья публикуются как хеши чанков для проверки при загрузке
+                from hashing import leaf_digests, tree_root, chunk_table
+                spec = self.hash_spec
+                digests = leaf_digests(archive_path, spec.algorithm, spec.leaf_size, workers=self.workers)
+                manifest['hash'] = str(spec.with_digest(tree_root(spec.algorithm, digests)))
+                manifest['chunks'] = chunk_table(spec.leaf_size, spec.algorithm, digests)
+                hash_declaration = manifest['hash']
+            elif self.hash_spec.scheme != 'sha256':
+                # Объявление алгоритма для клиентов; поле sha256 остаётся для старых версий
+                from hashing import hash_file
+                manifest['hash'] = str(hash_file(archive_path, self.hash_spec, workers=self.workers))
+                hash_declaration = manifest['hash']
+            manifest['deltas'] = [future.result() for future in delta_futures]
+            
+            chunk_index = None
+            if self.chunks:
+                from chunk_store import chunk_params, CHUNK_INDEX_NAME
+                chunk_files = {}
+                for future in chunk_futures:
+                    chunk_files.update(future.result())
+                chunk_index = {
+                    'version': version,
+                    'params': chunk_params(),
+                    'files': {name: chunk_files[name] for name in names},
+                }
+
+        manifest_bytes = json.dumps(manifest, indent=2, ensure_ascii=False,
+                                    sort_keys=True).encode('utf-8')
+        (version_dir / MANIFEST_NAME).write_bytes(manifest_bytes)
+        (version_dir / (ARCHIVE_NAME + ".sha256")).write_text(hash_declaration, encoding='utf-8')
+
+        # Последняя версия доступна по фиксированным путям
+        shutil.copyfile(archive_path, self.output_dir / ARCHIVE_NAME)
+        shutil.copyfile(version_dir / (ARCHIVE_NAME + ".sha256"),
+                        self.output_dir / (ARCHIVE_NAME + ".sha256"))
+        (self.output_dir / MANIFEST_NAME).write_bytes(manifest_bytes)
+        (self.output_dir / "version.txt").write_text(version, encoding='utf-8')
+        
+        if chunk_index is not None:
+            chunk_index_bytes = json.dumps(chunk_index, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            (version_dir / CHUNK_INDEX_NAME).write_bytes(chunk_index_bytes)
+            (self.output_dir / CHUNK_INDEX_NAME).write_bytes(chunk_index_bytes)
+
+        releases.append(version)
+        self.releases_file.write_text(json.dumps(releases, indent=2), encoding='utf-8')
+
+        return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа команды publish"""
+    from hashing import available_algorithms
+    
+    parser = argparse.ArgumentParser(description="Публикация релиза Python Updater")
+    parser.add_argument("build_dir", help="папка со сборкой")
+    parser.add_argument("version", help="номер публикуемой версии")
+    parser.add_argument("--out", default="releases", help="папка релизов (по умолчанию: releases)")
+    parser.add_argument("--deltas", type=int, default=3,
+                        help="количество предыдущих релизов для дельт (по умолчанию: 3)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="количество процессов (по умолчанию: число ядер)")
+    parser.add_argument("--chunks", action="store_true",
+                        help="выложить чанки и индекс чанков для дедупликации между версиями")
+    parser.add_argument("--hash-algorithm", default="sha256", choices=available_algorithms(),
+                        help="алгоритм хеша архива (по умолчанию: sha256)")
+    parser.add_argument("--tree-leaf-size", type=int, default=0,
+                        help="хешировать архив деревом с листьями этого размера в байтах, например "
+                             "4194304; хеши листьев попадают в манифест, и клиент проверяет архив по чанкам")
+    parser.add_argument("--bundle", default=None, metavar="ФАЙЛ",
+                        help="собрать офлайн-пакет опубликованной версии (архив, манифест и хеш в одном файле)")
+    args = parser.parse_args(argv)
+
+    publisher = ReleasePublisher(Path(args.out), workers=args.workers, delta_count=args.deltas,
+                                 chunks=args.chunks, hash_algorithm=args.hash_algorithm,
+                                 tree_leaf_size=args.tree_leaf_size)
+    try:
+        manifest = publisher.publish(Path(args.build_dir), args.version)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print(f"📦 Опубликована версия {manifest['version']}: {len(manifest['files'])} файлов, "
+          f"{manifest['size']} байт")
+    print(f"🔐 SHA256: {manifest['sha256']}")
+    if manifest.get('hash'):
+        print(f"🔐 Хеш: {manifest['hash']}")
+    for delta in manifest['deltas']:
+        print(f"🧩 Дельта {delta['from']} → {manifest['version']}: "
+              f"{delta['changed']} изменено, {delta['removed']} удалено, {delta['size']} байт")
+    if args.bundle:
+        from local_source import create_bundle
+        bundle_path = create_bundle(Path(args.out), Path(args.bundle))
+        print(f"💼 Офлайн-пакет: {bundle_path} ({bundle_path.stat().st_size} байт)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
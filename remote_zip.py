@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Чтение оглавления удалённого ZIP архива через HTTP Range
+
+Вместо загрузки всего архива запрашиваются только запись конца
+центрального каталога (EOCD) и сам центральный каталог - обычно
+несколько килобайт.
+"""
+
+import hashlib
+import io
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Callable
+
+import requests
+
+
+# Сигнатуры и форматы записей ZIP (APPNOTE.TXT)
+EOCD_SIGNATURE = b"PK\x05\x06"
+EOCD_STRUCT = struct.Struct("<4s4H2LH")
+ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+ZIP64_LOCATOR_STRUCT = struct.Struct("<4sLQL")
+ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+ZIP64_EOCD_STRUCT = struct.Struct("<4sQ2H2L4Q")
+CENTRAL_DIR_SIGNATURE = b"PK\x01\x02"
+CENTRAL_DIR_STRUCT = struct.Struct("<4s4B4H3L5H2L")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+LOCAL_HEADER_STRUCT = struct.Struct("<4s5H3L2H")
+
+# EOCD (22 байта) + максимальный комментарий архива (65535 байт)
+EOCD_SEARCH_SIZE = EOCD_STRUCT.size + 0xFFFF
+CRC_BLOCK_SIZE = 1024 * 1024
+
+# Параметры объединения диапазонов при выборочной загрузке
+RANGE_MERGE_GAP = 64 * 1024         # меньшие промежутки выгоднее скачать, чем делать новый диапазон
+MAX_RANGES_PER_REQUEST = 16
+MAX_BATCH_BYTES = 32 * 1024 * 1024  # объём multipart ответа, держащегося в памяти
+
+
+class RemoteZipError(Exception):
+    """Оглавление удалённого архива недоступно или повреждено"""
+
+
+class RemoteZipEntry:
+    """Запись центрального каталога удалённого архива"""
+
+    def __init__(self, name: str, crc32: int, compress_type: int, compress_size: int,
+                 file_size: int, header_offset: int):
+        self.name = name
+        self.crc32 = crc32
+        self.compress_type = compress_type
+        self.compress_size = compress_size
+        self.file_size = file_size
+        self.header_offset = header_offset
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith('/')
+
+    def __repr__(self):
+        return f"RemoteZipEntry({self.name!r}, size={self.file_size}, crc32={self.crc32:08x})"
+
+
+class RemoteZipIndex:
+    """Оглавление удалённого архива"""
+
+    def __init__(self, url: str, archive_size: int, entries: List[RemoteZipEntry],
+                 central_dir_offset: int):
+        self.url = url
+        self.archive_size = archive_size
+        self.entries = entries
+        self.central_dir_offset = central_dir_offset
+
+    @property
+    def files(self) -> List[RemoteZipEntry]:
+        return [entry for entry in self.entries if not entry.is_dir]
+
+    @property
+    def total_uncompressed(self) -> int:
+        return sum(entry.file_size for entry in self.files)
+
+    @property
+    def reg_entries(self) -> List[RemoteZipEntry]:
+        return [entry for entry in self.files if entry.name.lower().endswith('.reg')]
+
+
+def _get_range(session: requests.Session, url: str, start: int, end: int, timeout: float) -> bytes:
+    """Загрузить диапазон байт [start, end] включительно"""
+    response = session.get(url, headers={'Range': f"bytes={start}-{end}"}, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code != 206:
+        raise RemoteZipError("Сервер не поддерживает HTTP Range запросы")
+    return response.content
+
+
+def _parse_zip64_extra(extra: bytes, file_size: int, compress_size: int,
+                       header_offset: int) -> tuple[int, int, int]:
+    """Получить 64-битные размеры и смещение из дополнительного поля ZIP64"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<2H", extra, pos)
+        data = extra[pos + 4:pos + 4 + length]
+        if tag == 0x0001:
+            values = list(struct.unpack_from(f"<{len(data) // 8}Q", data))
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compress_size == 0xFFFFFFFF and values:
+                compress_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF and values:
+                header_offset = values.pop(0)
+            break
+        pos += 4 + length
+    return file_size, compress_size, header_offset
+
+
+def parse_central_directory(data: bytes) -> List[RemoteZipEntry]:
+    """Разобрать записи центрального каталога"""
+    entries = []
+    pos = 0
+    while pos + CENTRAL_DIR_STRUCT.size <= len(data):
+        fields = CENTRAL_DIR_STRUCT.unpack_from(data, pos)
+        if fields[0] != CENTRAL_DIR_SIGNATURE:
+            raise RemoteZipError("Повреждён центральный каталог архива")
+
+        flags, compress_type = fields[5], fields[6]
+        crc32, compress_size, file_size = fields[9], fields[10], fields[11]
+        name_length, extra_length, comment_length = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        pos += CENTRAL_DIR_STRUCT.size
+        raw_name = data[pos:pos + name_length]
+        extra = data[pos + name_length:pos + name_length + extra_length]
+        pos += name_length + extra_length + comment_length
+
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        file_size, compress_size, header_offset = _parse_zip64_extra(
+            extra, file_size, compress_size, header_offset)
+        entries.append(RemoteZipEntry(name, crc32, compress_type, compress_size,
+                                      file_size, header_offset))
+    return entries
+
+
+def fetch_remote_index(session: requests.Session, url: str, timeout: float = 10) -> RemoteZipIndex:
+    """
+    Получить оглавление удалённого архива
+    Выполняет HEAD и 1-3 Range запроса в зависимости от размера каталога.
+    """
+    response = session.head(url, timeout=timeout, allow_redirects=True)
+    response.raise_for_status()
+
+    archive_size = int(response.headers.get('content-length', 0))
+    if archive_size <= 0:
+        raise RemoteZipError("Сервер не сообщил размер архива")
+    if response.headers.get('accept-ranges', '').lower() != 'bytes':
+        raise RemoteZipError("Сервер не поддерживает HTTP Range запросы")
+
+    tail_start = max(0, archive_size - EOCD_SEARCH_SIZE)
+    tail = _get_range(session, url, tail_start, archive_size - 1, timeout)
+
+    eocd_pos = tail.rfind(EOCD_SIGNATURE)
+    if eocd_pos < 0 or eocd_pos + EOCD_STRUCT.size > len(tail):
+        raise RemoteZipError("Не найдена запись конца центрального каталога")
+    eocd = EOCD_STRUCT.unpack_from(tail, eocd_pos)
+    cd_size, cd_offset = eocd[5], eocd[6]
+
+    # ZIP64: настоящие размер и смещение каталога лежат в отдельной записи
+    locator_pos = eocd_pos - ZIP64_LOCATOR_STRUCT.size
+    if locator_pos >= 0 and tail[locator_pos:locator_pos + 4] == ZIP64_LOCATOR_SIGNATURE:
+        zip64_offset = ZIP64_LOCATOR_STRUCT.unpack_from(tail, locator_pos)[2]
+        if zip64_offset >= tail_start:
+            record = tail[zip64_offset - tail_start:]
+        else:
+            record = _get_range(session, url, zip64_offset,
+                                zip64_offset + ZIP64_EOCD_STRUCT.size - 1, timeout)
+        zip64_eocd = ZIP64_EOCD_STRUCT.unpack_from(record, 0)
+        if zip64_eocd[0] != ZIP64_EOCD_SIGNATURE:
+            raise RemoteZipError("Повреждена запись ZIP64 конца каталога")
+        cd_size, cd_offset = zip64_eocd[8], zip64_eocd[9]
+
+    if cd_offset >= tail_start:
+        central_dir = tail[cd_offset - tail_start:cd_offset - tail_start + cd_size]
+    else:
+        central_dir = _get_range(session, url, cd_offset, cd_offset + cd_size - 1, timeout)
+
+    return RemoteZipIndex(url, archive_size, parse_central_directory(central_dir), cd_offset)
+
+
+def local_crc32(filepath: Path) -> int:
+    """Вычислить CRC32 локального файла"""
+    crc = 0
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(CRC_BLOCK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def changed_entries(index: RemoteZipIndex, extract_path: Path) -> List[RemoteZipEntry]:
+    """
+    Найти записи архива, отличающиеся от установленных файлов
+    CRC32 считается только для файлов с совпадающим размером.
+    """
+    changed = []
+    for entry in index.files:
+        local_path = extract_path / entry.name
+        try:
+            if local_path.stat().st_size == entry.file_size and local_crc32(local_path) == entry.crc32:
+                continue
+        except OSError:
+            pass
+        changed.append(entry)
+    return changed
+
+
+class _RangeStream:
+    """Последовательное чтение потока байт, начинающегося с известного смещения архива"""
+
+    def __init__(self, read: Callable[[int], bytes], start: int):
+        self._read = read
+        self.position = start
+
+    def read(self, size: int) -> bytes:
+        chunks = []
+        while size > 0:
+            chunk = self._read(size)
+            if not chunk:
+                raise RemoteZipError(f"Неожиданный конец данных на смещении {self.position}")
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.position += len(chunk)
+        return b"".join(chunks)
+
+    def skip_to(self, offset: int):
+        if offset < self.position:
+            raise RemoteZipError(f"Смещение {offset} уже пройдено")
+        while self.position < offset:
+            self.read(min(CRC_BLOCK_SIZE, offset - self.position))
+
+
+def _member_spans(index: RemoteZipIndex, entries: List[RemoteZipEntry],
+                  merge_gap: int) -> List[tuple[int, int, List[RemoteZipEntry]]]:
+    """
+    Вычислить диапазоны байт для записей и объединить соседние
+    Запись занимает место от своего локального заголовка до следующей записи
+    (или центрального каталога), что включает дескриптор данных.
+    """
+    boundaries = sorted({entry.header_offset for entry in index.entries} | {index.central_dir_offset})
+    next_offset = {offset: boundaries[i + 1] for i, offset in enumerate(boundaries[:-1])}
+
+    spans = []
+    for entry in sorted(entries, key=lambda e: e.header_offset):
+        start, end = entry.header_offset, next_offset[entry.header_offset] - 1
+        if spans and start - spans[-1][1] - 1 <= merge_gap:
+            spans[-1] = (spans[-1][0], end, spans[-1][2] + [entry])
+        else:
+            spans.append((start, end, [entry]))
+    return spans
+
+
+def _batch_spans(spans, max_ranges: int, max_bytes: int):
+    """Сгруппировать диапазоны в multi-range запросы"""
+    batch, batch_bytes = [], 0
+    for span in spans:
+        size = span[1] - span[0] + 1
+        if batch and (len(batch) >= max_ranges or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(span)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _parse_multipart(body: bytes, content_type: str) -> List[tuple[int, bytes]]:
+    """Разобрать ответ multipart/byteranges в список (начало, данные)"""
+    boundary = None
+    for param in content_type.split(';')[1:]:
+        key, _, value = param.strip().partition('=')
+        if key.lower() == 'boundary':
+            boundary = value.strip('"').encode('ascii')
+    if not boundary:
+        raise RemoteZipError("В ответе multipart/byteranges нет boundary")
+
+    parts = []
+    delimiter = b"--" + boundary
+    pos = body.find(delimiter)
+    while pos >= 0:
+        pos += len(delimiter)
+        if body[pos:pos + 2] == b"--":
+            break
+        headers_end = body.find(b"\r\n\r\n", pos)
+        if headers_end < 0:
+            raise RemoteZipError("Повреждён ответ multipart/byteranges")
+        content_range = None
+        for line in body[pos:headers_end].decode('latin-1').split("\r\n"):
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-range':
+                content_range = value.strip()
+        if content_range is None:
+            raise RemoteZipError("В части multipart/byteranges нет Content-Range")
+        start, end = _parse_content_range(content_range)
+        data_start = headers_end + 4
+        parts.append((start, body[data_start:data_start + end - start + 1]))
+        pos = body.find(delimiter, data_start + end - start + 1)
+    return parts
+
+
+def _covering_part(parts: List[tuple[int, bytes]], start: int, end: int) -> _RangeStream:
+    """
+    Поток запрошенного диапазона из частей ответа
+    Сервер может объединить соседние диапазоны и вернуть части в другом
+    порядке (RFC 7233), поэтому ищется часть, целиком содержащая диапазон.
+    """
+    for part_start, data in parts:
+        if part_start <= start and end < part_start + len(data):
+            return _RangeStream(io.BytesIO(data[start - part_start:end - part_start + 1]).read, start)
+    raise RemoteZipError(f"Сервер не вернул запрошенный диапазон {start}-{end}")
+
+
+def _parse_content_range(value: str) -> tuple[int, int]:
+    """Разобрать заголовок Content-Range: bytes начало-конец/размер"""
+    unit, _, rest = value.partition(' ')
+    if unit != 'bytes':
+        raise RemoteZipError(f"Неподдерживаемый Content-Range: {value}")
+    start, _, end = rest.split('/')[0].partition('-')
+    try:
+        return int(start), int(end)
+    except ValueError:
+        raise RemoteZipError(f"Неподдерживаемый Content-Range: {value}") from None
+
+
+def _extract_member(stream: _RangeStream, entry: RemoteZipEntry, extract_path: Path,
+                    expected_sha256: Optional[str] = None) -> int:
+    """
+    Распаковать запись из потока прямо на место установки, проверив CRC32
+    и, если задан, SHA256 из манифеста (до замены установленного файла).
+    """
+    stream.skip_to(entry.header_offset)
+    header = LOCAL_HEADER_STRUCT.unpack(stream.read(LOCAL_HEADER_STRUCT.size))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise RemoteZipError(f"Повреждён локальный заголовок: {entry.name}")
+    stream.read(header[9] + header[10])  # имя и дополнительное поле
+
+    if entry.compress_type == 8:
+        decompressor = zlib.decompressobj(-15)
+    elif entry.compress_type == 0:
+        decompressor = None
+    else:
+        raise RemoteZipError(f"Неподдерживаемый метод сжатия {entry.compress_type}: {entry.name}")
+
+    root = extract_path.resolve()
+    target = (extract_path / entry.name).resolve()
+    if root not in target.parents:
+        raise RemoteZipError(f"Недопустимый путь в архиве: {entry.name}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".part")
+
+    crc = 0
+    sha256_hash = hashlib.sha256()
+    remaining = entry.compress_size
+    try:
+        with open(partial, 'wb') as f:
+            while remaining > 0:
+                chunk = stream.read(min(CRC_BLOCK_SIZE, remaining))
+                remaining -= len(chunk)
+                data = decompressor.decompress(chunk) if decompressor else chunk
+                crc = zlib.crc32(data, crc)
+                sha256_hash.update(data)
+                f.write(data)
+            if decompressor:
+                data = decompressor.flush()
+                crc = zlib.crc32(data, crc)
+                sha256_hash.update(data)
+                f.write(data)
+        if crc & 0xFFFFFFFF != entry.crc32:
+            raise RemoteZipError(f"Несовпадение CRC32: {entry.name}")
+        if expected_sha256 is not None and sha256_hash.hexdigest() != expected_sha256:
+            raise RemoteZipError(f"Несовпадение SHA256 с манифестом: {entry.name}")
+        os.replace(partial, target)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return entry.compress_size
+
+
+def download_members(session: requests.Session, index: RemoteZipIndex, entries: List[RemoteZipEntry],
+                     extract_path: Path, progress_callback: Optional[Callable] = None,
+                     timeout: float = 30, expected_sha256: Optional[Dict[str, str]] = None) -> int:
+    """
+    Загрузить и распаковать только указанные записи удалённого архива
+    Соседние записи объединяются в общие диапазоны, диапазоны - в multi-range
+    запросы. Если передан expected_sha256 (путь -> SHA256), каждая запись
+    проверяется и по нему. Возвращает количество загруженных байт.
+    """
+    spans = _member_spans(index, entries, RANGE_MERGE_GAP)
+    total = sum(end - start + 1 for start, end, _ in spans)
+    downloaded = 0
+
+    for batch in _batch_spans(spans, MAX_RANGES_PER_REQUEST, MAX_BATCH_BYTES):
+        ranges = ",".join(f"{start}-{end}" for start, end, _ in batch)
+        response = session.get(index.url, headers={'Range': f"bytes={ranges}"},
+                               stream=True, timeout=timeout)
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '')
+
+        if response.status_code == 206 and content_type.startswith('multipart/byteranges'):
+            parts = _parse_multipart(response.content, content_type)
+            streams = [(_covering_part(parts, start, end), members) for start, end, members in batch]
+        elif response.status_code == 206:
+            # Один диапазон: сервер мог объединить все запрошенные в один охватывающий
+            start, end = _parse_content_range(response.headers.get('content-range', ''))
+            if start > batch[0][0] or end < batch[-1][1]:
+                response.close()
+                raise RemoteZipError(f"Сервер вернул диапазон {start}-{end} вместо запрошенных")
+            stream = _RangeStream(response.raw.read, start)
+            streams = [(stream, members) for _, _, members in batch]
+        else:
+            response.close()
+            raise RemoteZipError("Сервер проигнорировал заголовок Range")
+
+        try:
+            for stream, members in streams:
+                for entry in members:
+                    _extract_member(stream, entry, extract_path,
+                                    expected_sha256[entry.name] if expected_sha256 is not None else None)
+        finally:
+            response.close()
+
+        downloaded += sum(end - start + 1 for start, end, _ in batch)
+        if progress_callback and total > 0:
+            progress_callback(int(downloaded / total * 100))
+
+    return downloaded
@@ -2,64 +2,361 @@
 # -*- coding: utf-8 -*-
 """
 Простой тестовый сервер без CORS для локального тестирования
+
+Сервер умеет эмулировать плохую сеть для проверки докачки, обнаружения
+зависаний и переключения зеркал: задержку и её разброс, ограничение
+скорости, обрывы соединения на заданных смещениях или в случайном месте,
+паузы и медленную выдачу ответа маленькими порциями (slow loris).
+Условия задаются флагами командной строки, файлом --network-config или
+через управляющий эндпоинт /_network (только с локального адреса),
+в том числе отдельно для путей и клиентов:
+
+    curl -X PUT localhost:8001/_network -d '{"default": {"latency_ms": 100},
+        "rules": [{"path": "/myfile.zip", "client": "bench-*", "bandwidth": 262144}]}'
+
+Клиент определяется заголовком X-Client-Id или IP адресом.
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import fnmatch
+import json
 import os
+import random
+import socket
+import struct
 import tempfile
+import threading
+import time
 import zipfile
 import hashlib
 from pathlib import Path
 
 
+CONTROL_PATH = '/_network'
+COPY_CHUNK_SIZE = 8192
+
+
+def parse_bytes(text):
+    """Размер вида 512K, 1M, 2G или число байт"""
+    text = str(text).strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class EmulatedReset(Exception):
+    """Эмулируемый обрыв соединения"""
+
+
+class NetworkConditions:
+    """Условия сети для одного ответа"""
+    
+    FIELDS = {
+        'latency_ms': 0.0,          # задержка перед ответом
+        'jitter_ms': 0.0,           # случайный разброс задержки (±)
+        'bandwidth': 0,             # ограничение скорости, байт/с (0 - без ограничения)
+        'reset_at': [],             # обрыв соединения при передаче этих смещений файла
+        'reset_probability': 0.0,   # вероятность обрыва ответа в случайном месте
+        'stall_at': [],             # пауза при передаче этих смещений файла
+        'stall_seconds': 0.0,       # длительность паузы
+        'corrupt_at': [],           # испортить байт на этих смещениях файла (только в ответах без Range)
+        'trickle_bytes': 0,         # slow loris: выдавать тело порциями по N байт...
+        'trickle_interval': 0.0,    # ...с таким интервалом, с
+    }
+    
+    def __init__(self, **values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры сети: {', '.join(sorted(unknown))}")
+        for name, default in self.FIELDS.items():
+            value = values.get(name, default)
+            if isinstance(default, list):
+                value = sorted(parse_bytes(item) for item in value)
+            elif name in ('bandwidth', 'trickle_bytes'):
+                value = parse_bytes(value)
+            else:
+                value = float(value)
+            setattr(self, name, value)
+    
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+    
+    def is_clear(self):
+        """Условия не меняют поведение сервера"""
+        return self.as_dict() == NetworkConditions().as_dict()
+    
+    def response_delay(self, rng):
+        jitter = rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+
+class BodyShaper:
+    """
+    Выдача тела ответа с учётом условий сети
+    Скорость ограничивается по всему ответу, события (обрыв, пауза)
+    срабатывают ровно на заданном смещении файла. Обрыв на смещении, с которого
+    начинается ответ, не срабатывает: докачка с этого места проходит. Порча
+    байт применяется только к ответам на весь файл, повторный запрос
+    диапазона получает верные данные.
+    """
+    
+    def __init__(self, conditions, body_length, rng, partial=False):
+        self.conditions = conditions
+        self.partial = partial
+        self.started = time.monotonic()
+        self.sent = 0
+        self.first_offset = None
+        self.pending_stalls = list(conditions.stall_at)
+        self.random_reset = None
+        if body_length > 1 and rng.random() < conditions.reset_probability:
+            self.random_reset = rng.randint(1, body_length - 1)
+        
+        if conditions.trickle_bytes:
+            self.piece_size = conditions.trickle_bytes
+        elif conditions.bandwidth:
+            self.piece_size = int(min(65536, max(512, conditions.bandwidth // 20)))
+        else:
+            self.piece_size = COPY_CHUNK_SIZE
+    
+    def _next_event(self, offset, size):
+        """Ближайшее событие внутри [offset, offset + size): (позиция в порции, тип)"""
+        events = []
+        for reset_offset in self.conditions.reset_at:
+            if offset <= reset_offset < offset + size and reset_offset > self.first_offset:
+                events.append((reset_offset - offset, 'reset'))
+        for stall_offset in self.pending_stalls:
+            if offset <= stall_offset < offset + size:
+                events.append((stall_offset - offset, 'stall'))
+        if self.random_reset is not None and self.sent <= self.random_reset < self.sent + size:
+            events.append((self.random_reset - self.sent, 'reset'))
+        return min(events) if events else None
+    
+    def write(self, wfile, data, offset):
+        """Отправить data, начинающиеся со смещения offset файла"""
+        if self.first_offset is None:
+            self.first_offset = offset
+        if not self.partial:
+            data = self._corrupt(data, offset)
+        position = 0
+        while position < len(data):
+            size = min(self.piece_size, len(data) - position)
+            event = self._next_event(offset + position, size)
+            if event is not None:
+                size = event[0]
+            
+            if size:
+                wfile.write(data[position:position + size])
+                position += size
+                self.sent += size
+                self._throttle()
+            
+            if event is not None:
+                wfile.flush()
+                if event[1] == 'reset':
+                    raise EmulatedReset(f"обрыв на смещении {offset + position}")
+                self.pending_stalls.remove(offset + position)
+                time.sleep(self.conditions.stall_seconds)
+    
+    def _corrupt(self, data, offset):
+        targets = [at - offset for at in self.conditions.corrupt_at if offset <= at < offset + len(data)]
+        if not targets:
+            return data
+        data = bytearray(data)
+        for position in targets:
+            data[position] ^= 0xFF
+        return bytes(data)
+    
+    def _throttle(self):
+        if self.conditions.trickle_bytes:
+            time.sleep(self.conditions.trickle_interval)
+        elif self.conditions.bandwidth:
+            expected = self.sent / self.conditions.bandwidth
+            delay = expected - (time.monotonic() - self.started)
+            if delay > 0:
+                time.sleep(delay)
+
+
+class NetworkEmulator:
+    """
+    Условия сети сервера: общие и правила для путей и клиентов
+    Правило - словарь с шаблонами 'path' и 'client' (fnmatch) и параметрами
+    NetworkConditions; подходящие правила применяются по порядку поверх общих.
+    """
+    
+    def __init__(self, default=None, rules=None, seed=None):
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.configure({'default': default or {}, 'rules': rules or []})
+    
+    def configure(self, config):
+        """Заменить условия (проверяются до применения)"""
+        default = dict(config.get('default', {}))
+        rules = [dict(rule) for rule in config.get('rules', [])]
+        NetworkConditions(**default)
+        for rule in rules:
+            NetworkConditions(**{k: v for k, v in rule.items() if k not in ('path', 'client')})
+        with self.lock:
+            self.default = default
+            self.rules = rules
+    
+    def config(self):
+        with self.lock:
+            return {'default': dict(self.default), 'rules': [dict(rule) for rule in self.rules]}
+    
+    def conditions_for(self, path, client):
+        """Условия для запроса к path от клиента client"""
+        path = path.split('?', 1)[0]
+        with self.lock:
+            values = dict(self.default)
+            for rule in self.rules:
+                if fnmatch.fnmatch(path, rule.get('path', '*')) and fnmatch.fnmatch(client, rule.get('client', '*')):
+                    values.update({k: v for k, v in rule.items() if k not in ('path', 'client')})
+        return NetworkConditions(**values)
+    
+    def random_source(self):
+        """Генератор случайных чисел для одного ответа (воспроизводим при заданном seed)"""
+        with self.lock:
+            return random.Random(self.rng.getrandbits(64))
+
+
 class SimpleUpdateServer(BaseHTTPRequestHandler):
     """Простой обработчик без CORS"""
     
+    head_only = False
+    conditions = NetworkConditions()
+    rng = random.Random()
+    
+    def log(self, message):
+        """Вывести сообщение о запросе (кроме режима --quiet)"""
+        if not getattr(self.server, 'quiet', False):
+            print(message)
+    
+    def client_id(self):
+        return self.headers.get('X-Client-Id') or self.client_address[0]
+    
+    def do_HEAD(self):
+        """Обработка HEAD запросов (только заголовки)"""
+        self.head_only = True
+        self.do_GET()
+    
     def do_GET(self):
-        """Обработка GET запросов"""
+        """Обработка GET запросов с учётом эмулируемых условий сети"""
+        if self.path.split('?', 1)[0] == CONTROL_PATH:
+            self.handle_control()
+            return
+        
+        network = getattr(self.server, 'network', None)
+        if network is not None:
+            self.conditions = network.conditions_for(self.path, self.client_id())
+            self.rng = network.random_source()
+            delay = self.conditions.response_delay(self.rng)
+            if delay:
+                time.sleep(delay)
+        
+        try:
+            self.respond()
+        except EmulatedReset as e:
+            self.log(f"💥 Эмуляция обрыва соединения: {self.path}, {e}")
+            self.reset_connection()
+    
+    def do_PUT(self):
+        """Изменение условий сети"""
+        self.handle_control()
+    
+    do_POST = do_PUT
+    
+    def do_DELETE(self):
+        """Сброс условий сети"""
+        self.handle_control()
+    
+    def reset_connection(self):
+        """Оборвать соединение с RST, как при сбое сети"""
+        self.close_connection = True
+        try:
+            self.wfile.flush()
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.connection.close()
+        except OSError:
+            pass
+    
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not self.head_only:
+            self.wfile.write(body)
+    
+    def send_text(self, status, text, content_type='text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not self.head_only:
+            self.wfile.write(body)
+    
+    def handle_control(self):
+        """
+        Управление эмуляцией сети: GET - текущие условия, PUT/POST - заменить,
+        DELETE - сбросить. Доступно только с локального адреса.
+        """
+        network = getattr(self.server, 'network', None)
+        if self.path.split('?', 1)[0] != CONTROL_PATH:
+            self.send_json(405, {'error': f'Method not allowed: {self.command} {self.path}'})
+            return
+        if network is None:
+            self.send_json(404, {'error': 'Эмуляция сети не включена'})
+            return
+        if self.client_address[0] not in ('127.0.0.1', '::1'):
+            self.send_json(403, {'error': 'Управление доступно только с локального адреса'})
+            return
+        
+        if self.command in ('PUT', 'POST'):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                network.configure(json.loads(self.rfile.read(length) or b'{}'))
+            except (ValueError, TypeError, AttributeError) as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            self.log(f"🌐 Условия сети изменены: {network.config()}")
+        elif self.command == 'DELETE':
+            network.configure({})
+            self.log("🌐 Условия сети сброшены")
+        self.send_json(200, network.config())
+    
+    def respond(self):
+        """Ответ на GET/HEAD запрос"""
         # Проверка авторизации
         auth_header = self.headers.get('Authorization')
         if auth_header != 'Bearer test-token-123':
-            self.send_response(401)
-            self.send_header('Content-Type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'Unauthorized: Invalid token')
-            print(f"❌ Неавторизованный запрос: {auth_header}")
+            self.send_text(401, 'Unauthorized: Invalid token', 'text/plain')
+            self.log(f"❌ Неавторизованный запрос: {auth_header}")
             return
         
-        print(f"✅ Авторизованный запрос: {self.path}")
+        self.log(f"✅ Авторизованный запрос: {self.path}")
+        
+        # Раздача папки релизов, подготовленной publish.py
+        if getattr(self.server, 'release_root', None) is not None:
+            self.send_release_file()
+            return
         
         if self.path == '/version.txt':
-            self.send_response(200)
-            self.send_header('Content-Type', 'text/plain; charset=utf-8')
-            self.end_headers()
             # Возвращаем версию 1.0.3 (чтобы было обновление)
-            self.wfile.write('1.0.3'.encode('utf-8'))
-            print("📄 Отправлена версия: 1.0.3")
+            self.send_text(200, '1.0.3')
+            self.log("📄 Отправлена версия: 1.0.3")
             
         elif self.path == '/myfile.zip':
             zip_path = self.create_test_zip()
             if zip_path and os.path.exists(zip_path):
-                file_size = os.path.getsize(zip_path)
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/zip')
-                self.send_header('Content-Length', str(file_size))
-                self.end_headers()
-                
-                with open(zip_path, 'rb') as f:
-                    while True:
-                        chunk = f.read(8192)
-                        if not chunk:
-                            break
-                        self.wfile.write(chunk)
-                
-                print(f"📦 Отправлен ZIP файл: {zip_path} ({file_size} байт)")
+                self.send_file(Path(zip_path), 'application/zip')
+                self.log(f"📦 Отправлен ZIP файл: {zip_path}")
             else:
-                self.send_response(500)
-                self.send_header('Content-Type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b'Error creating test ZIP file')
-                print("❌ Ошибка создания ZIP файла")
+                self.send_text(500, 'Error creating test ZIP file', 'text/plain')
+                self.log("❌ Ошибка создания ZIP файла")
                 
         elif self.path == '/myfile.zip.sha256':
             zip_path = self.create_test_zip()
@@ -72,23 +369,148 @@ class SimpleUpdateServer(BaseHTTPRequestHandler):
                 
                 file_hash = sha256_hash.hexdigest()
                 
-                self.send_response(200)
-                self.send_header('Content-Type', 'text/plain; charset=utf-8')
-                self.end_headers()
-                self.wfile.write(file_hash.encode('utf-8'))
-                print(f"🔐 Отправлен хеш: {file_hash[:16]}...")
+                self.send_text(200, file_hash)
+                self.log(f"🔐 Отправлен хеш: {file_hash[:16]}...")
             else:
-                self.send_response(500)
-                self.send_header('Content-Type', 'text/plain')
-                self.end_headers()
-                self.wfile.write(b'Error creating test ZIP file')
-                print("❌ Ошибка создания ZIP файла для хеша")
+                self.send_text(500, 'Error creating test ZIP file', 'text/plain')
+                self.log("❌ Ошибка создания ZIP файла для хеша")
         else:
-            self.send_response(404)
-            self.send_header('Content-Type', 'text/plain')
+            self.send_text(404, f'Not found: {self.path}', 'text/plain')
+            self.log(f"❌ Не найден: {self.path}")
+    
+    def send_release_file(self):
+        """Отдать файл из папки релизов"""
+        root = self.server.release_root
+        relative = self.path.split('?', 1)[0].lstrip('/')
+        file_path = (root / relative).resolve()
+        
+        # Не выпускаем запросы за пределы папки релизов
+        if root not in file_path.parents or not file_path.is_file():
+            self.send_text(404, f'Not found: {self.path}', 'text/plain')
+            self.log(f"❌ Не найден: {self.path}")
+            return
+        
+        content_type = 'application/octet-stream'
+        if file_path.suffix == '.zip':
+            content_type = 'application/zip'
+        elif file_path.suffix == '.json':
+            content_type = 'application/json; charset=utf-8'
+        elif file_path.suffix in ('.txt', '.sha256'):
+            content_type = 'text/plain; charset=utf-8'
+        
+        self.send_file(file_path, content_type)
+        self.log(f"📦 Отправлен файл: {relative}")
+    
+    def parse_range(self, file_size):
+        """
+        Разобрать заголовок Range
+        Возвращает список диапазонов (начало, конец) включительно,
+        None без Range или False для неверного диапазона.
+        """
+        range_header = self.headers.get('Range')
+        if not range_header or not range_header.startswith('bytes='):
+            return None
+        
+        ranges = []
+        for spec in range_header[len('bytes='):].split(','):
+            start_text, _, end_text = spec.strip().partition('-')
+            try:
+                if start_text:
+                    start = int(start_text)
+                    end = int(end_text) if end_text else file_size - 1
+                else:
+                    # Суффиксный диапазон: последние N байт
+                    start = max(0, file_size - int(end_text))
+                    end = file_size - 1
+            except ValueError:
+                return False
+            
+            end = min(end, file_size - 1)
+            if start > end:
+                return False
+            ranges.append((start, end))
+        return ranges
+    
+    def copy_range(self, f, start, end, shaper=None):
+        """Отправить диапазон байт файла (через эмуляцию сети, если она задана)"""
+        f.seek(start)
+        offset = start
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if shaper is not None:
+                shaper.write(self.wfile, chunk, offset)
+            else:
+                self.wfile.write(chunk)
+            offset += len(chunk)
+            remaining -= len(chunk)
+    
+    def body_shaper(self, body_length, partial=False):
+        """Формирователь тела ответа или None, если условия сети не заданы"""
+        if self.conditions.is_clear():
+            return None
+        return BodyShaper(self.conditions, body_length, self.rng, partial)
+    
+    def send_file(self, file_path, content_type):
+        """Отдать файл целиком, диапазон или несколько диапазонов (HTTP Range)"""
+        file_size = file_path.stat().st_size
+        ranges = self.parse_range(file_size)
+        
+        if ranges is False:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{file_size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        
+        if ranges and len(ranges) > 1:
+            # Несколько диапазонов: ответ multipart/byteranges
+            boundary = os.urandom(12).hex()
+            part_headers = [
+                (f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+                 f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n').encode('ascii')
+                for start, end in ranges
+            ]
+            closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+            length = (sum(len(h) for h in part_headers) + sum(end - start + 1 for start, end in ranges)
+                      + 2 * (len(ranges) - 1) + len(closing))
+            
+            self.send_response(206)
+            self.send_header('Content-Type', f'multipart/byteranges; boundary={boundary}')
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
             self.end_headers()
-            self.wfile.write(f'Not found: {self.path}'.encode('utf-8'))
-            print(f"❌ Не найден: {self.path}")
+            
+            if self.head_only:
+                return
+            
+            shaper = self.body_shaper(length, partial=True)
+            with open(file_path, 'rb') as f:
+                for i, ((start, end), header) in enumerate(zip(ranges, part_headers)):
+                    if i:
+                        self.wfile.write(b'\r\n')
+                    self.wfile.write(header)
+                    self.copy_range(f, start, end, shaper)
+            self.wfile.write(closing)
+            return
+        
+        start, end = ranges[0] if ranges else (0, file_size - 1)
+        
+        self.send_response(206 if ranges else 200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if ranges:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{file_size}')
+        self.end_headers()
+        
+        if self.head_only:
+            return
+        
+        with open(file_path, 'rb') as f:
+            self.copy_range(f, start, end, self.body_shaper(end - start + 1, partial=bool(ranges)))
     
     def create_test_zip(self):
         """Создать тестовый ZIP файл"""
@@ -126,11 +548,11 @@ class SimpleUpdateServer(BaseHTTPRequestHandler):
 '''
                 zip_file.writestr('update/registry_update.reg', reg_content.encode('utf-8'))
             
-            print(f"📁 Создан тестовый ZIP: {zip_path}")
+            self.log(f"📁 Создан тестовый ZIP: {zip_path}")
             return str(zip_path)
             
         except Exception as e:
-            print(f"❌ Ошибка создания ZIP файла: {e}")
+            self.log(f"❌ Ошибка создания ZIP файла: {e}")
             return None
     
     def log_message(self, format, *args):
@@ -140,20 +562,87 @@ class SimpleUpdateServer(BaseHTTPRequestHandler):
 
 def main():
     """Запуск простого тестового сервера"""
-    server_address = ('localhost', 8001)
-    httpd = HTTPServer(server_address, SimpleUpdateServer)
+    parser = argparse.ArgumentParser(description="Простой тестовый сервер обновлений")
+    parser.add_argument("--port", type=int, default=8001, help="порт сервера (по умолчанию: 8001)")
+    parser.add_argument("--root", default=None,
+                        help="папка релизов, созданная publish.py, вместо тестового архива")
+    parser.add_argument("--quiet", action="store_true", help="не выводить сообщения о запросах")
+    parser.add_argument("--single-thread", action="store_true",
+                        help="обрабатывать запросы по одному (по умолчанию - поток на соединение)")
+    parser.add_argument("--backlog", type=int, default=128,
+                        help="очередь входящих соединений (по умолчанию: 128; у socketserver - 5)")
+    network = parser.add_argument_group("эмуляция сети")
+    network.add_argument("--latency", type=float, default=0, help="задержка перед ответом, мс")
+    network.add_argument("--jitter", type=float, default=0, help="разброс задержки (±), мс")
+    network.add_argument("--bandwidth", default='0', help="ограничение скорости ответа, байт/с (например, 256K)")
+    network.add_argument("--reset-at", nargs='+', default=[],
+                         help="оборвать соединение при передаче этих смещений файла (например, 1M 5M)")
+    network.add_argument("--reset-probability", type=float, default=0,
+                         help="вероятность обрыва ответа в случайном месте (0..1)")
+    network.add_argument("--stall-at", nargs='+', default=[], help="пауза при передаче этих смещений файла")
+    network.add_argument("--stall-seconds", type=float, default=0, help="длительность паузы, с")
+    network.add_argument("--corrupt-at", nargs='+', default=[],
+                         help="испортить байт на этих смещениях файла в ответах без Range (например, 3M)")
+    network.add_argument("--trickle", default=None, metavar="БАЙТ:СЕК",
+                         help="slow loris: выдавать ответ порциями по N байт раз в S секунд (например, 16:1)")
+    network.add_argument("--network-config", default=None,
+                         help="JSON с условиями: {\"default\": {...}, \"rules\": [{\"path\": ..., \"client\": ..., ...}]}")
+    network.add_argument("--seed", type=int, default=None, help="seed для разброса задержки и случайных обрывов")
+    args = parser.parse_args()
+    
+    default = {
+        'latency_ms': args.latency,
+        'jitter_ms': args.jitter,
+        'bandwidth': args.bandwidth,
+        'reset_at': args.reset_at,
+        'reset_probability': args.reset_probability,
+        'stall_at': args.stall_at,
+        'stall_seconds': args.stall_seconds,
+        'corrupt_at': args.corrupt_at,
+    }
+    if args.trickle:
+        trickle_bytes, _, trickle_interval = args.trickle.partition(':')
+        default['trickle_bytes'] = trickle_bytes
+        default['trickle_interval'] = trickle_interval or 1
+    rules = []
+    if args.network_config:
+        config = json.loads(Path(args.network_config).read_text(encoding='utf-8'))
+        default.update(config.get('default', {}))
+        rules = config.get('rules', [])
+    
+    server_address = ('localhost', args.port)
+    server_class = HTTPServer if args.single_thread else ThreadingHTTPServer
+    httpd = server_class(server_address, SimpleUpdateServer, bind_and_activate=False)
+    # При одновременном приходе многих клиентов короткая очередь даёт сбросы соединений
+    httpd.request_queue_size = args.backlog
+    try:
+        httpd.server_bind()
+        httpd.server_activate()
+    except OSError:
+        httpd.server_close()
+        raise
+    httpd.daemon_threads = True
+    httpd.release_root = Path(args.root).resolve() if args.root else None
+    httpd.quiet = args.quiet
+    httpd.network = NetworkEmulator(default, rules, seed=args.seed)
     
     print("🚀 " + "=" * 48 + " 🚀")
     print("       ПРОСТОЙ ТЕСТОВЫЙ СЕРВЕР ОБНОВЛЕНИЙ")
     print("🚀 " + "=" * 48 + " 🚀")
     print("")
-    print(f"🌐 Сервер запущен на http://localhost:8001")
+    print(f"🌐 Сервер запущен на http://localhost:{args.port}")
+    if httpd.release_root is not None:
+        print(f"📁 Папка релизов: {httpd.release_root}")
+    network_config = httpd.network.config()
+    if not NetworkConditions(**network_config['default']).is_clear() or network_config['rules']:
+        print(f"🐢 Эмуляция сети: {json.dumps(network_config, ensure_ascii=False)}")
+    print(f"   Управление: GET/PUT/DELETE http://localhost:{args.port}{CONTROL_PATH}")
     print("")
     print("⚙️  Настройки для приложения:")
     print("   📝 Токен: test-token-123")
-    print("   📋 URL версии: http://localhost:8001/version.txt")
-    print("   📦 URL загрузки: http://localhost:8001/myfile.zip")
-    print("   🔐 URL хеша: http://localhost:8001/myfile.zip.sha256")
+    print(f"   📋 URL версии: http://localhost:{args.port}/version.txt")
+    print(f"   📦 URL загрузки: http://localhost:{args.port}/myfile.zip")
+    print(f"   🔐 URL хеша: http://localhost:{args.port}/myfile.zip.sha256")
     print("")
     print("📡 Доступные эндпоинты:")
     print("   📄 GET /version.txt → версия 1.0.3")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Трассировка запуска обновления в формате Chrome trace events
+
+В режиме трассировки (настройка trace_enabled) каждый запуск записывает
+интервалы с идентификаторами потоков: проверку версии, загрузку, проверку
+хеша, распаковку, выполнение .reg файлов и фазы из metrics.py. Файл
+traces/trace-<run_id>.json открывается в Perfetto (ui.perfetto.dev) или
+chrome://tracing, где видно, как потоки перекрываются во времени.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterator, List
+
+
+TRACES_DIR_NAME = "traces"
+TRACE_LIMIT = 20
+
+
+class Tracer:
+    """Сборщик интервалов одного запуска (потокобезопасно; выключенный ничего не записывает)"""
+
+    def __init__(self, run_id: Optional[str] = None, enabled: bool = False):
+        self.run_id = run_id
+        self.enabled = enabled
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    def _now(self) -> float:
+        """Время от начала запуска, мкс"""
+        return round((time.perf_counter() - self.origin) * 1e6, 3)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        """Записать интервал выполнения блока в текущем потоке"""
+        if not self.enabled:
+            yield
+            return
+
+        thread = threading.current_thread()
+        tid = threading.get_native_id()
+        start = self._now()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'ph': 'X', 'ts': start, 'dur': round(self._now() - start, 3),
+                     'pid': self.pid, 'tid': tid}
+            if args:
+                event['args'] = {key: str(value) for key, value in args.items()}
+            with self.lock:
+                self.events.append(event)
+                self.thread_names.setdefault(tid, thread.name)
+
+    def trace_events(self) -> Dict[str, Any]:
+        """Трассировка в формате JSON Object Format"""
+        with self.lock:
+            events = [{'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                       'args': {'name': f"PythonUpdater run {self.run_id}"}}]
+            events += [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid,
+                        'args': {'name': name}} for tid, name in self.thread_names.items()]
+            events += sorted(self.events, key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'run_id': self.run_id}}
+
+    def write(self, traces_dir: Path, limit: int = TRACE_LIMIT) -> Path:
+        """Сохранить трассировку и оставить не больше limit последних файлов"""
+        traces_dir = Path(traces_dir)
+        traces_dir.mkdir(parents=True, exist_ok=True)
+        path = traces_dir / f"trace-{self.run_id}.json"
+        path.write_text(json.dumps(self.trace_events(), ensure_ascii=False), encoding='utf-8')
+
+        traces = sorted(traces_dir.glob("trace-*.json"), key=lambda p: p.stat().st_mtime)
+        for old in traces[:-limit]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+        return path
+
+
+def traced(name: Optional[str] = None):
+    """Декоратор метода: интервал в трассировке self.tracer"""
+    def decorator(method):
+        span_name = name or method.__name__
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(span_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
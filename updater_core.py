@@ -0,0 +1,1551 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ядро Python Updater: настройки, данные приложения и загрузка обновлений
+Модуль не зависит от интерфейса и используется всеми тремя версиями UI.
+Сетевые модули, работа с архивами и хеширование импортируются при первом
+использовании, чтобы не замедлять запуск приложения.
+"""
+
+import json
+import logging
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Union, TYPE_CHECKING
+
+from connectivity import OfflineError, network_monitor
+from logging_setup import start_run, finish_run, bind_run
+from metrics import RunMetrics, METRICS_HISTORY_NAME, append_history, write_prometheus
+from tracing import Tracer, TRACES_DIR_NAME, traced
+from profiling import RunProfiler, profiling_requested, claim_profile
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor, Future
+    from hashing import HashSpec, ChunkVerifier
+    from local_source import OfflineBundle
+    from download_lock import DownloadCoordinator
+    import threading
+    import requests
+
+
+# Переменная окружения режима замера запуска (см. bench_startup.py)
+STARTUP_PROBE_ENV = "PYTHON_UPDATER_STARTUP_PROBE"
+
+
+def startup_probe_enabled() -> bool:
+    """Включён ли режим замера времени до первого окна"""
+    import os
+    return bool(os.environ.get(STARTUP_PROBE_ENV))
+
+
+def report_startup_ready(front_end: str):
+    """Сообщить бенчмарку, что первое окно отрисовано"""
+    print(f"STARTUP_READY {front_end}", flush=True)
+
+
+class Config:
+    """Конфигурация приложения"""
+    APP_NAME = "PythonUpdater"
+    APP_AUTHOR = "YourCompany"
+    VERSION = "1.0.0"
+    
+    # URLs по умолчанию
+    DEFAULT_VERSION_URL = "https://example.com/version.txt"
+    DEFAULT_DOWNLOAD_URL = "https://example.com/myfile.zip"
+    DEFAULT_HASH_URL = "https://example.com/myfile.zip.sha256"
+
+
+class Translations:
+    """Класс для мультиязычности"""
+    
+    LANGUAGES = {
+        'ru': {
+            'app_title': 'Менеджер обновлений',
+            'tab_update': 'Обновление',
+            'tab_settings': 'Настройки',
+            'tab_log': 'Журнал',
+            'check_update': 'Проверить обновление',
+            'current_version': 'Текущая версия:',
+            'latest_version': 'Последняя версия:',
+            'status': 'Статус:',
+            'download_path': 'Путь загрузки:',
+            'browse': 'Обзор...',
+            'progress': 'Прогресс:',
+            'settings_token': 'Токен авторизации:',
+            'settings_version_url': 'URL версии:',
+            'settings_download_url': 'URL загрузки:',
+            'settings_hash_url': 'URL хеша:',
+            'settings_auto_check': 'Автопроверка при запуске',
+            'settings_dark_theme': 'Тёмная тема',
+            'settings_language': 'Язык:',
+            'settings_execute_reg': 'Выполнять .reg файлы',
+            'save_settings': 'Сохранить настройки',
+            'status_up_to_date': 'Файл актуален',
+            'status_update_available': 'Доступно обновление',
+            'status_downloading': 'Загрузка...',
+            'status_downloaded': 'Загружено',
+            'status_connection_error': 'Ошибка соединения',
+            'status_offline': 'Нет подключения к сети',
+            'status_hash_error': 'Ошибка контрольной суммы',
+            'status_extraction_error': 'Ошибка распаковки',
+            'status_disk_space_error': 'Недостаточно места на диске',
+            'error': 'Ошибка',
+            'success': 'Успех',
+            'settings_saved': 'Настройки сохранены',
+            'download_complete': 'Загрузка завершена',
+            'select_download_path': 'Выберите путь для загрузки',
+        },
+        'en': {
+            'app_title': 'Update Manager',
+            'tab_update': 'Update',
+            'tab_settings': 'Settings',
+            'tab_log': 'Log',
+            'check_update': 'Check Update',
+            'current_version': 'Current Version:',
+            'latest_version': 'Latest Version:',
+            'status': 'Status:',
+            'download_path': 'Download Path:',
+            'browse': 'Browse...',
+            'progress': 'Progress:',
+            'settings_token': 'Authorization Token:',
+            'settings_version_url': 'Version URL:',
+            'settings_download_url': 'Download URL:',
+            'settings_hash_url': 'Hash URL:',
+            'settings_auto_check': 'Auto-check on startup',
+            'settings_dark_theme': 'Dark Theme',
+            'settings_language': 'Language:',
+            'settings_execute_reg': 'Execute .reg files',
+            'save_settings': 'Save Settings',
+            'status_up_to_date': 'File is up to date',
+            'status_update_available': 'Update available',
+            'status_downloading': 'Downloading...',
+            'status_downloaded': 'Downloaded',
+            'status_connection_error': 'Connection error',
+            'status_offline': 'No network connection',
+            'status_hash_error': 'Hash verification error',
+            'status_extraction_error': 'Extraction error',
+            'status_disk_space_error': 'Not enough disk space',
+            'error': 'Error',
+            'success': 'Success',
+            'settings_saved': 'Settings saved',
+            'download_complete': 'Download complete',
+            'select_download_path': 'Select download path',
+        }
+    }
+    
+    def __init__(self, language='ru'):
+        self.current_language = language
+    
+    def get(self, key: str) -> str:
+        """Получить перевод по ключу"""
+        return self.LANGUAGES.get(self.current_language, {}).get(key, key)
+    
+    def set_language(self, language: str):
+        """Установить язык"""
+        if language in self.LANGUAGES:
+            self.current_language = language
+
+
+class AppDataManager:
+    """Менеджер данных приложения"""
+    
+    def __init__(self):
+        import appdirs
+        
+        self.app_dir = Path(appdirs.user_data_dir(Config.APP_NAME, Config.APP_AUTHOR))
+        self.app_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.settings_file = self.app_dir / "settings.json"
+        self.version_file = self.app_dir / "version.txt"
+        self.log_file = self.app_dir / "log.txt"
+        
+        self._setup_logging()
+    
+    def _setup_logging(self):
+        """Настройка логирования (один раз на процесс)"""
+        from logging_setup import setup_logging, logging_configured
+        
+        if not logging_configured():
+            setup_logging(self.log_file, self.load_settings())
+    
+    def load_settings(self) -> Dict[str, Any]:
+        """Загрузить настройки"""
+        default_settings = {
+            'token': '',
+            'version_url': Config.DEFAULT_VERSION_URL,
+            'download_url': Config.DEFAULT_DOWNLOAD_URL,
+            'hash_url': Config.DEFAULT_HASH_URL,
+            'download_path': str(Path.home() / "Downloads"),
+            'auto_check': True,
+            'dark_theme': False,
+            'language': 'ru',
+            'execute_reg_files': True,  # Новая настройка для выполнения .reg файлов
+            'connectivity_probe': True,  # Быстрая проверка сети перед запросом версии
+            'preflight': True,  # Чтение оглавления архива перед загрузкой
+            'range_incremental': True,  # Загрузка только изменённых файлов через HTTP Range
+            'chunk_index_url': '',  # Индекс чанков для дедупликации между версиями
+            'manifest_url': '',  # Манифест релиза (размер и хеш архива)
+            'signature_url': '',  # Подпись архива
+            'log_rotation': 'size',  # Ротация журнала: 'size' или 'time' (раз в сутки)
+            'log_max_bytes': 5 * 1024 * 1024,
+            'log_backup_count': 5,
+            'log_json': False,  # Дополнительный журнал log.jsonl в формате JSON lines
+            'metrics_prometheus_file': '',  # Файл метрик для textfile-коллектора node_exporter
+            'trace_enabled': False,  # Трассировка запусков в traces/ (формат Chrome trace events)
+            'profile': False,  # Профилировать первый запуск обновления (cProfile и tracemalloc)
+            'hash_workers': 0,  # Потоков для дерева хешей и процессов разбиения на чанки (0 - по числу ядер)
+            'chunk_retries': 3,  # Повторных загрузок чанка, не прошедшего проверку по манифесту
+            'bundle_path': '',  # Офлайн-пакет обновления (вместо адресов версии, архива и хеша)
+            'peer_enabled': False,  # Раздавать проверенный архив соседям по сети и загружать у них
+            'peer_port': 8765,  # Порт раздачи соседям
+            'peer_cache_keep': 2,  # Сколько проверенных архивов хранить для раздачи соседям
+            'peers': [],  # Адреса соседей host:port (дополнительно к поиску через multicast)
+            'peer_multicast': True,  # Поиск соседей и объявления через UDP multicast
+            'peer_discovery_timeout': 0.5,  # Ожидание ответов соседей при поиске, с
+            'download_wait_timeout': 600,  # Ожидание загрузки другим процессом, переставшим обновлять её состояние, с
+            'prefetch': False,  # Загружать и распаковывать найденное обновление заранее, в фоне
+            'prefetch_max_bytes': 2 * 1024 ** 3,  # Бюджет места для подготовки (архив и распакованные файлы)
+            'prefetch_recheck_interval': 60  # Проверка новой версии во время подготовки, с
+        }
+        
+        if self.settings_file.exists():
+            try:
+                with open(self.settings_file, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
+                    # Обновляем настройки по умолчанию загруженными
+                    default_settings.update(settings)
+            except Exception as e:
+                logging.error(f"Ошибка загрузки настроек: {e}")
+        
+        return default_settings
+    
+    def save_settings(self, settings: Dict[str, Any]):
+        """Сохранить настройки"""
+        try:
+            with open(self.settings_file, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, indent=2, ensure_ascii=False)
+            logging.info("Настройки сохранены")
+        except Exception as e:
+            logging.error(f"Ошибка сохранения настроек: {e}")
+            raise
+    
+    def get_current_version(self) -> str:
+        """Получить текущую версию"""
+        if self.version_file.exists():
+            try:
+                return self.version_file.read_text(encoding='utf-8').strip()
+            except Exception as e:
+                logging.error(f"Ошибка чтения версии: {e}")
+        return Config.VERSION
+    
+    def save_version(self, version: str):
+        """Сохранить версию"""
+        try:
+            self.version_file.write_text(version, encoding='utf-8')
+            logging.info(f"Версия обновлена до {version}")
+        except Exception as e:
+            logging.error(f"Ошибка сохранения версии: {e}")
+            raise
+
+
+class InsufficientSpaceError(OSError):
+    """Недостаточно свободного места для загрузки обновления"""
+
+
+class UpdateChecker:
+    """Класс для проверки и загрузки обновлений"""
+    
+    def __init__(self, settings: Dict[str, Any], progress_callback: Optional[Callable] = None):
+        self.settings = settings
+        import requests
+        
+        self.progress_callback = progress_callback
+        self.session = requests.Session()
+        self.last_download_hash = None
+        # Идентификатор запуска: им помечаются записи журнала и метрики проверки и загрузки
+        self.run_id = None
+        self.tracer = Tracer()
+        self.metrics = RunMetrics()
+        self.profiler: Optional[RunProfiler] = None
+        # Отмена фоновой подготовки обновления (см. prefetch.py)
+        self.cancel_event: Optional['threading.Event'] = None
+        
+        # Настройка авторизации
+        if settings.get('token'):
+            self.session.headers.update({
+                'Authorization': f"Bearer {settings['token']}"
+            })
+    
+    def check_version(self) -> tuple[bool, str, str]:
+        """
+        Проверить версию
+        Возвращает: (есть_обновление, текущая_версия, последняя_версия)
+        """
+        self.begin_run()
+        try:
+            with self.profiling():
+                result = self._check_version()
+        except OfflineError as e:
+            logging.error(f"Ошибка проверки версии: {e}")
+            self.end_run('offline')
+            raise
+        except Exception as e:
+            logging.error(f"Ошибка проверки версии: {e}")
+            self.end_run('error')
+            raise
+        
+        # Без обновления запуск на этом заканчивается, иначе продолжается загрузкой
+        if not result[0]:
+            self.end_run('up_to_date')
+        return result
+    
+    def offline_bundle(self) -> Optional['OfflineBundle']:
+        """Офлайн-пакет из настроек или None"""
+        if not self.settings.get('bundle_path'):
+            return None
+        from local_source import OfflineBundle, local_path
+        return OfflineBundle(local_path(self.settings['bundle_path']))
+    
+    def read_source(self, url: str) -> bytes:
+        """Прочитать небольшой файл по HTTP или из локального источника (путь, file://)"""
+        from local_source import is_local, read_bytes
+        
+        if is_local(url):
+            return read_bytes(url)
+        response = self.session.get(url, timeout=10)
+        response.raise_for_status()
+        return response.content
+    
+    def read_text(self, url: str) -> str:
+        from local_source import is_local, read_bytes
+        
+        if is_local(url):
+            return read_bytes(url).decode('utf-8')
+        response = self.session.get(url, timeout=10)
+        response.raise_for_status()
+        return response.text
+    
+    @traced('check_version')
+    def _check_version(self) -> tuple[bool, str, str]:
+        from local_source import is_local
+        
+        bundle = self.offline_bundle()
+        remote = bundle is None and not is_local(self.settings['version_url'])
+        
+        # Без сети ошибка возвращается сразу, а не по таймауту запроса
+        if remote and self.settings.get('connectivity_probe', True):
+            with self.metrics.phase('connectivity'):
+                network_monitor.check(self.settings['version_url'])
+        
+        with self.metrics.phase('check') as timer:
+            if bundle is not None:
+                latest_version = bundle.version()
+            else:
+                latest_version = self.read_text(self.settings['version_url']).strip()
+        if remote:
+            network_monitor.report_online()
+        
+        current_version = AppDataManager().get_current_version()
+        
+        has_update = latest_version != current_version
+        self.metrics.set_info(current_version=current_version, version=latest_version)
+        logging.info(f"Проверка версии: текущая={current_version}, последняя={latest_version}",
+                     extra={'phase': 'check', 'duration': round(timer.elapsed(), 3)})
+        return has_update, current_version, latest_version
+    
+    def begin_run(self):
+        """Начать запуск обновления: идентификатор для журнала, новые метрики и трассировка"""
+        self.run_id = start_run()
+        self.tracer = Tracer(self.run_id, enabled=self.settings.get('trace_enabled', False))
+        self.metrics = RunMetrics(self.run_id, self.tracer)
+        self.profiler = None
+        if profiling_requested(self.settings) and claim_profile():
+            logging.info("Профилирование запуска включено (cProfile и tracemalloc)")
+            self.profiler = RunProfiler(self.run_id)
+    
+    def profiling(self):
+        """Профилировать блок, если профилируется текущий запуск"""
+        return self.profiler.profiling() if self.profiler is not None else nullcontext()
+    
+    def end_run(self, outcome: str):
+        """Завершить запуск и сохранить его метрики в историю"""
+        finish_run(self.run_id)
+        if self.metrics.finished:
+            return
+        record = self.metrics.finish(outcome)
+        app_dir = AppDataManager().app_dir
+        try:
+            append_history(app_dir / METRICS_HISTORY_NAME, record)
+            if self.settings.get('metrics_prometheus_file'):
+                write_prometheus(Path(self.settings['metrics_prometheus_file']), record)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить метрики запуска: {e}")
+        
+        if self.tracer.enabled:
+            try:
+                trace_path = self.tracer.write(app_dir / TRACES_DIR_NAME)
+                logging.info(f"Трассировка запуска сохранена: {trace_path}")
+            except OSError as e:
+                logging.warning(f"Не удалось сохранить трассировку запуска: {e}")
+        
+        if self.profiler is not None:
+            profiler, self.profiler = self.profiler, None
+            try:
+                summary_path = profiler.finish(app_dir, record)
+                logging.info(f"Профиль запуска сохранён: {summary_path}")
+            except OSError as e:
+                logging.warning(f"Не удалось сохранить профиль запуска: {e}")
+    
+    def save_version(self, version: str):
+        """Сохранить установленную версию (фаза save_version)"""
+        with self.metrics.phase('save_version'):
+            AppDataManager().save_version(version)
+    
+    @traced()
+    def preflight(self, download_path: str) -> Dict[str, Any]:
+        """
+        Предварительная проверка архива без его загрузки
+        Читает только центральный каталог удалённого ZIP через HTTP Range,
+        проверяет свободное место и выбирает режим: full, incremental или skip.
+        """
+        import shutil
+        from remote_zip import fetch_remote_index, changed_entries
+        
+        download_dir = Path(download_path)
+        extract_path = download_dir / "update"
+        
+        with self.metrics.phase('preflight'):
+            index = fetch_remote_index(self.session, self.settings['download_url'])
+            changed = changed_entries(index, extract_path)
+        changed_size = sum(entry.file_size for entry in changed)
+        changed_compressed = sum(entry.compress_size for entry in changed)
+        
+        if not changed:
+            mode = 'skip'
+            required = 0
+        elif len(changed) < len(index.files) and changed_compressed < index.archive_size // 2:
+            mode = 'incremental'
+            required = changed_size
+        else:
+            mode = 'full'
+            required = index.archive_size + changed_size
+        
+        # Проверяем место на диске, на котором лежит папка загрузки
+        existing_dir = download_dir
+        while not existing_dir.exists() and existing_dir.parent != existing_dir:
+            existing_dir = existing_dir.parent
+        free_space = shutil.disk_usage(existing_dir).free
+        
+        result = {
+            'mode': mode,
+            'archive_size': index.archive_size,
+            'total_uncompressed': index.total_uncompressed,
+            'entries': [entry.name for entry in index.files],
+            'reg_entries': [entry.name for entry in index.reg_entries],
+            'changed': [entry.name for entry in changed],
+            'required_space': required,
+            'free_space': free_space,
+            'index': index,
+        }
+        logging.info(f"Предпроверка архива: режим={mode}, файлов={len(index.files)}, "
+                     f"изменено={len(changed)}, размер={index.archive_size}, "
+                     f"распакованный={index.total_uncompressed}, REG={len(index.reg_entries)}")
+        
+        if required > free_space:
+            raise InsufficientSpaceError(
+                f"Недостаточно места в {download_dir}: нужно {required} байт, доступно {free_space}")
+        
+        return result
+    
+    def trusted_manifest(self, metadata: Dict[str, 'Future']) -> Optional[Dict[str, Any]]:
+        """
+        Манифест, объявляющий тот же архив, что и hash_url, или None
+        Только такому манифесту доверяются хеши отдельных файлов (пропуск
+        загрузки, выборочная загрузка, обновление по чанкам).
+        """
+        from hashing import manifest_hashes
+        
+        manifest_future = metadata.get('manifest')
+        if manifest_future is None:
+            return None
+        try:
+            manifest = manifest_future.result()
+            expected = metadata['hash'].result()
+        except Exception as e:
+            logging.warning(f"Манифест или хеш архива недоступны: {e}")
+            return None
+        if not isinstance(manifest.get('files'), dict) or \
+                not any(spec.matches(expected) for spec in manifest_hashes(manifest)):
+            logging.warning("Хеш архива в манифесте не совпадает с hash_url, манифест не используется")
+            return None
+        return manifest
+    
+    def installed_mismatches(self, extract_path: Path, manifest: Dict[str, Any]) -> list:
+        """
+        Установленные файлы, не совпадающие с манифестом по SHA256 (по индексу установки)
+        Файлы без SHA256 в манифесте (старый publish.py, правка вручную) считаются изменёнными.
+        """
+        import sqlite3
+        from install_index import InstallIndex, INSTALL_INDEX_NAME
+        
+        index = InstallIndex(AppDataManager().app_dir / INSTALL_INDEX_NAME)
+        expected = {name: info.get('sha256') for name, info in manifest['files'].items()}
+        unknown = [name for name, sha256 in expected.items() if not sha256]
+        for name in unknown:
+            del expected[name]
+        try:
+            with self.metrics.phase('verify'):
+                mismatched = index.verify_against(extract_path, expected,
+                                                  workers=self.settings.get('hash_workers') or None)
+        except sqlite3.Error as e:
+            logging.warning(f"Индекс установки недоступен, файлы считаются изменёнными: {e}")
+            mismatched = list(expected)
+        return sorted(mismatched + unknown)
+    
+    @traced()
+    def download_changed_members(self, plan: Dict[str, Any], extract_path: Path, version: str,
+                                 manifest: Dict[str, Any]) -> bool:
+        """
+        Загрузить только изменённые файлы архива через HTTP Range
+        Набор файлов определяется манифестом, подтверждённым hash_url: загружаются
+        установленные файлы, не совпадающие с ним по SHA256. Каждый файл
+        проверяется по CRC32 и по SHA256 из манифеста до замены установленного.
+        """
+        from remote_zip import download_members, RemoteZipError
+        
+        index = plan['index']
+        entries = {entry.name: entry for entry in index.files}
+        missing = sorted(set(manifest['files']) - set(entries))
+        if missing:
+            raise RemoteZipError(f"В архиве нет файлов из манифеста: {', '.join(missing[:5])}")
+        changed_names = self.installed_mismatches(extract_path, manifest)
+        changed = [entries[name] for name in changed_names]
+        expected = {name: manifest['files'][name].get('sha256') for name in changed_names}
+        unverifiable = [name for name, sha256 in expected.items() if not sha256]
+        if unverifiable:
+            raise RemoteZipError(f"В манифесте нет SHA256 файлов: {', '.join(unverifiable[:5])}")
+        with self.metrics.phase('download_ranges') as timer:
+            downloaded = download_members(self.session, index, changed, extract_path, self.progress_callback,
+                                          expected_sha256=expected)
+        self.metrics.add_bytes('download_ranges', downloaded)
+        self.record_installed(extract_path, version, names=[entry.name for entry in changed])
+        logging.info(f"Выборочная загрузка: {len(changed)} файлов, {downloaded} из {index.archive_size} байт архива",
+                     extra={'phase': 'download_ranges', 'bytes': downloaded,
+                            'duration': round(timer.elapsed(), 3)})
+        
+        # .reg файлы выполняются только если они изменились
+        changed_reg = [extract_path / entry.name for entry in changed if entry.name.lower().endswith('.reg')]
+        if changed_reg and not self.execute_reg_files(extract_path, changed_reg):
+            logging.warning("Некоторые REG файлы не были выполнены, но обновление продолжается")
+        
+        self.save_version(version)
+        
+        if self.progress_callback:
+            self.progress_callback(100)
+        
+        logging.info(f"Обновление успешно загружено и установлено: версия {version}")
+        return True
+    
+    @traced()
+    def download_chunked(self, extract_path: Path, version: str, metadata: Dict[str, 'Future']) -> bool:
+        """
+        Обновить установленные файлы по индексу чанков
+        Индекс принимается, только если его файлы, размеры и SHA256 совпадают
+        с манифестом, подтверждённым hash_url: собранный файл проверяется по
+        этому SHA256 перед заменой установленного.
+        """
+        import sqlite3
+        from chunk_store import ChunkStore, chunk_params
+        from install_index import InstallIndex, INSTALL_INDEX_NAME
+        
+        manifest = self.trusted_manifest(metadata)
+        if manifest is None:
+            raise ValueError("нет манифеста, подтверждённого hash_url")
+        
+        index_url = self.settings['chunk_index_url']
+        with self.metrics.phase('download_chunks') as timer:
+            response = self.session.get(index_url, timeout=10)
+            response.raise_for_status()
+            remote_index = response.json()
+            
+            if remote_index.get('params') != chunk_params():
+                raise ValueError("Параметры разбиения на чанки не совпадают с клиентом")
+            files = remote_index.get('files')
+            if not isinstance(files, dict) or files.keys() != manifest['files'].keys():
+                raise ValueError("Состав файлов в индексе чанков не совпадает с манифестом")
+            for name, info in files.items():
+                expected = manifest['files'][name]
+                if not expected.get('sha256') or info.get('sha256') != expected['sha256'] \
+                        or info.get('size') != expected.get('size'):
+                    raise ValueError(f"Индекс чанков не совпадает с манифестом: {name}")
+            
+            # Файлы, совпадающие по индексу установки, не разбиваются на чанки заново
+            try:
+                installed = InstallIndex(AppDataManager().app_dir / INSTALL_INDEX_NAME).entries(extract_path)
+            except sqlite3.Error as e:
+                logging.warning(f"Индекс установки недоступен, все файлы разбиваются на чанки: {e}")
+                installed = None
+            store = ChunkStore(AppDataManager().app_dir / "chunks")
+            stats = store.apply_index(self.session, index_url, remote_index, extract_path, self.progress_callback,
+                                      installed=installed, workers=self.settings.get('hash_workers') or None)
+        self.metrics.add_bytes('download_chunks', stats['bytes_downloaded'])
+        self.metrics.count('bytes_reused', stats['bytes_reused'])
+        self.record_installed(extract_path, version, names=stats['changed'])
+        logging.info(f"Обновление по чанкам: файлов={stats['files']}, чанков загружено={stats['chunks_downloaded']}, "
+                     f"байт загружено={stats['bytes_downloaded']}, байт из локальных файлов={stats['bytes_reused']}",
+                     extra={'phase': 'download_chunks', 'bytes': stats['bytes_downloaded'],
+                            'duration': round(timer.elapsed(), 3)})
+        
+        # .reg файлы выполняются только если они изменились
+        reg_files = [extract_path / name for name in stats['changed'] if name.lower().endswith('.reg')]
+        if reg_files and not self.execute_reg_files(extract_path, reg_files):
+            logging.warning("Некоторые REG файлы не были выполнены, но обновление продолжается")
+        
+        self.save_version(version)
+        
+        if self.progress_callback:
+            self.progress_callback(100)
+        
+        logging.info(f"Обновление успешно загружено и установлено: версия {version}")
+        return True
+    
+    def record_installed(self, extract_path: Path, version: Optional[str], records: Optional[list] = None,
+                         names: Optional[list] = None):
+        """
+        Обновить индекс установки: полная установка (records) или изменённые файлы (names)
+        Ошибка индекса не прерывает обновление: без индекса недоступно только восстановление.
+        """
+        import sqlite3
+        from install_index import InstallIndex, INSTALL_INDEX_NAME
+        
+        index = InstallIndex(AppDataManager().app_dir / INSTALL_INDEX_NAME)
+        try:
+            if records is not None:
+                index.record_install(extract_path, version, records)
+            else:
+                index.update_files(extract_path, names or [], version)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Не удалось обновить индекс установки: {e}")
+    
+    def install_root(self) -> Path:
+        """Папка установленных файлов"""
+        return Path(self.settings['download_path']) / "update"
+    
+    def verify_install(self, deep: bool = False) -> Dict[str, Any]:
+        """
+        Проверить установленные файлы по индексу установки
+        Хешируются параллельно только файлы с изменённым временем (deep - все).
+        """
+        from install_index import InstallIndex, INSTALL_INDEX_NAME
+        
+        root = self.install_root()
+        index = InstallIndex(AppDataManager().app_dir / INSTALL_INDEX_NAME)
+        if index.install_info(root) is None:
+            raise FileNotFoundError(f"Нет индекса установки для {root}: установите обновление заново")
+        
+        with self.metrics.phase('verify') as timer:
+            result = index.verify(root, workers=self.settings.get('hash_workers') or None, deep=deep)
+        logging.info(f"Проверка установки {root}: файлов={result['files']}, хешировано={result['hashed']}, "
+                     f"отсутствует={len(result['missing'])}, изменено={len(result['modified'])}",
+                     extra={'phase': 'verify', 'duration': round(timer.elapsed(), 3)})
+        for name in result['broken']:
+            logging.warning(f"Повреждён установленный файл: {name}")
+        return result
+    
+    def repair_install(self, deep: bool = False) -> Dict[str, Any]:
+        """Восстановить повреждённые установленные файлы (запуск завершается записью метрик)"""
+        from prefetch import cancel_prefetch
+        
+        if self.run_id is None or self.metrics.finished:
+            self.begin_run()
+        else:
+            # Запуск продолжает проверку версии, которая могла идти в другом потоке
+            start_run(self.run_id)
+        self.metrics.set_info(mode='repair')
+        
+        cancel_prefetch()
+        outcome = 'error'
+        coordinator = self.download_coordinator()
+        try:
+            # Восстановление пишет в ту же папку, что и загрузка, поэтому ждёт её
+            coordinator.acquire(self._follow_download)
+            with self.profiling():
+                result = self._repair_install(deep)
+            outcome = 'repaired' if not result['unrepaired'] else 'failed'
+            return result
+        finally:
+            coordinator.release()
+            self.end_run(outcome)
+    
+    @traced('repair_install')
+    def _repair_install(self, deep: bool) -> Dict[str, Any]:
+        """
+        Загрузить заново только повреждённые файлы через HTTP Range
+        Файл загружается, только если в архиве на сервере та же его версия
+        (CRC32 совпадает с индексом), и заменяется, только если его SHA256
+        совпал с индексом; иначе нужна обычная установка обновления.
+        """
+        from remote_zip import fetch_remote_index, download_members, RemoteZipError
+        from install_index import InstallIndex, INSTALL_INDEX_NAME
+        from local_source import is_local
+        
+        result = self.verify_install(deep)
+        result.update(repaired=[], unrepaired=[])
+        if not result['broken']:
+            logging.info("Повреждённых установленных файлов нет")
+            return result
+        
+        root = self.install_root()
+        installed = InstallIndex(AppDataManager().app_dir / INSTALL_INDEX_NAME).entries(root)
+        bundle = self.offline_bundle()
+        if bundle is not None or is_local(self.settings['download_url']):
+            return self._repair_from_local(root, installed, result, bundle)
+        
+        with self.metrics.phase('preflight'):
+            remote = fetch_remote_index(self.session, self.settings['download_url'])
+        remote_entries = {entry.name: entry for entry in remote.files}
+        
+        entries = []
+        for name in result['broken']:
+            entry = remote_entries.get(name)
+            if entry is None or entry.crc32 != installed[name]['crc32']:
+                logging.warning(f"Файл {name} нельзя восстановить: на сервере другая версия архива")
+                result['unrepaired'].append(name)
+            else:
+                entries.append(entry)
+        
+        if entries:
+            # CRC32 из центрального каталога не проверены: файл сверяется с SHA256 из индекса установки
+            expected_sha256 = {entry.name: installed[entry.name]['sha256'] for entry in entries}
+            try:
+                with self.metrics.phase('download_ranges') as timer:
+                    downloaded = download_members(self.session, remote, entries, root, self.progress_callback,
+                                                  expected_sha256=expected_sha256)
+            except RemoteZipError as e:
+                logging.warning(f"Восстановление не удалось, нужна обычная установка обновления: {e}")
+                result['unrepaired'] += [entry.name for entry in entries]
+                return result
+            self.metrics.add_bytes('download_ranges', downloaded)
+            self.record_installed(root, None, names=[entry.name for entry in entries])
+            result['repaired'] = [entry.name for entry in entries]
+            logging.info(f"Восстановлено файлов: {len(entries)}, загружено {downloaded} из {remote.archive_size} байт архива",
+                         extra={'phase': 'download_ranges', 'bytes': downloaded,
+                                'duration': round(timer.elapsed(), 3)})
+        return result
+    
+    def _repair_from_local(self, root: Path, installed: Dict[str, Dict[str, Any]], result: Dict[str, Any],
+                           bundle: Optional['OfflineBundle']) -> Dict[str, Any]:
+        """Распаковать повреждённые файлы из локального архива или офлайн-пакета"""
+        from install_index import extract_entries
+        from local_source import local_archive
+        
+        with local_archive(self.settings['download_url'], bundle) as archive:
+            infos = []
+            for name in result['broken']:
+                try:
+                    info = archive.getinfo(name)
+                except KeyError:
+                    info = None
+                if info is None or info.CRC != installed[name]['crc32']:
+                    logging.warning(f"Файл {name} нельзя восстановить: в локальном архиве другая версия")
+                    result['unrepaired'].append(name)
+                else:
+                    infos.append(info)
+            with self.metrics.phase('extract') as timer:
+                _, extracted = extract_entries(archive, infos, root)
+        self.metrics.add_bytes('extract', extracted)
+        self.record_installed(root, None, names=[info.filename for info in infos])
+        result['repaired'] = [info.filename for info in infos]
+        logging.info(f"Восстановлено файлов из локального архива: {len(infos)}",
+                     extra={'phase': 'extract', 'bytes': extracted, 'duration': round(timer.elapsed(), 3)})
+        return result
+    
+    def fetch_metadata_async(self, executor: 'ThreadPoolExecutor') -> Dict[str, 'Future']:
+        """
+        Запустить параллельную загрузку метаданных обновления
+        Хеш, манифест и подпись запрашиваются одновременно с загрузкой архива,
+        а не последовательно после неё. Из офлайн-пакета они читаются сразу.
+        """
+        import json
+        from hashing import parse_hash
+        
+        bundle = self.offline_bundle()
+        if bundle is not None:
+            from concurrent.futures import Future
+            
+            metadata = {'hash': Future()}
+            metadata['hash'].set_result(parse_hash(bundle.hash_text()))
+            manifest = bundle.manifest()
+            if manifest is not None:
+                metadata['manifest'] = Future()
+                metadata['manifest'].set_result(manifest)
+            return metadata
+        
+        def fetch(read, url):
+            with self.tracer.span('fetch_metadata', url=url):
+                return read(url)
+        
+        def fetch_hash(url):
+            return parse_hash(fetch(self.read_text, url))
+        
+        def fetch_json(url):
+            return json.loads(fetch(self.read_source, url))
+        
+        def fetch_bytes(url):
+            return fetch(self.read_source, url)
+        
+        # Записи о повторах запросов из пула помечаются идентификатором этого запуска
+        metadata = {'hash': executor.submit(bind_run(fetch_hash), self.settings['hash_url'])}
+        if self.settings.get('manifest_url'):
+            metadata['manifest'] = executor.submit(bind_run(fetch_json), self.settings['manifest_url'])
+        if self.settings.get('signature_url'):
+            metadata['signature'] = executor.submit(bind_run(fetch_bytes), self.settings['signature_url'])
+        return metadata
+    
+    def _check_metadata(self, metadata: Dict[str, 'Future'], total_size: int,
+                        downloaded: int, wait: bool = False) -> bool:
+        """
+        Сверить загружаемый архив с пришедшими метаданными
+        Возвращает True, когда проверять больше нечего.
+        """
+        manifest_future = metadata.get('manifest')
+        if manifest_future is None:
+            return True
+        if not wait and not manifest_future.done():
+            return False
+        
+        try:
+            manifest = manifest_future.result()
+        except Exception as e:
+            logging.warning(f"Манифест недоступен, проверка размера пропущена: {e}")
+            return True
+        
+        expected_size = manifest.get('size')
+        if expected_size is not None:
+            if total_size and total_size != expected_size:
+                raise IOError(f"Размер архива {total_size} не совпадает с манифестом ({expected_size})")
+            if downloaded > expected_size or (wait and downloaded != expected_size):
+                raise IOError(f"Загружено {downloaded} байт, по манифесту ожидается {expected_size}")
+        
+        # Хеш из манифеста и с hash_url должны совпадать (если посчитаны одним способом)
+        from hashing import manifest_hashes
+        
+        hash_future = metadata['hash']
+        declared = manifest_hashes(manifest)
+        if declared and (wait or hash_future.done()) and hash_future.exception() is None:
+            expected = hash_future.result()
+            for spec in declared:
+                if spec.scheme == expected.scheme and not spec.matches(expected):
+                    raise ValueError("Hash mismatch: хеш в манифесте не совпадает с hash_url")
+        return not declared or hash_future.done()
+    
+    @traced()
+    def download_file(self, url: str, filepath: Path, metadata: Optional[Dict[str, 'Future']] = None,
+                      session: Optional['requests.Session'] = None) -> bool:
+        """
+        Загрузить файл с прогрессом
+        Хеш считается по ходу загрузки: алгоритмом, объявленным на hash_url,
+        если он уже получен, иначе SHA256. Если переданы задачи загрузки метаданных,
+        размер сверяется с манифестом сразу после его получения, а обрыв
+        загрузки обнаруживается по Content-Length. Если в манифесте есть хеши
+        чанков, каждый чанк проверяется по мере загрузки, а повреждённый
+        загружается заново запросом Range. Соседи загружают через свою сессию
+        (session), без токена сервера обновлений.
+        """
+        from hashing import HashSpec, StreamHasher
+        from prefetch import PrefetchCancelled
+        
+        session = session or self.session
+        metadata = metadata or {}
+        self.last_download_hash = None
+        
+        hash_future = metadata.get('hash')
+        spec = HashSpec()
+        if hash_future is not None and hash_future.done() and hash_future.exception() is None:
+            spec = hash_future.result()
+        try:
+            # Время до первого байта: соединение, запрос и заголовки ответа
+            with self.metrics.phase('connect'):
+                response = session.get(url, stream=True, timeout=30)
+                response.raise_for_status()
+            
+            total_size = int(response.headers.get('content-length', 0))
+            downloaded = 0
+            stream_hash = StreamHasher(spec)
+            metadata_checked = not metadata
+            chunks_pending = 'manifest' in metadata
+            verifier = None
+            repaired = []
+            
+            with self.metrics.phase('transfer') as timer, open(filepath, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    self.check_cancelled()
+                    if chunk:
+                        f.write(chunk)
+                        stream_hash.update(chunk)
+                        downloaded += len(chunk)
+                        
+                        if not metadata_checked:
+                            metadata_checked = self._check_metadata(metadata, total_size, downloaded)
+                        
+                        # Хеши чанков доступны с приходом манифеста: уже записанное проверяется с диска
+                        if chunks_pending and metadata['manifest'].done():
+                            chunks_pending = False
+                            verifier, bad = self._start_chunk_verifier(metadata, f, filepath)
+                        elif verifier is not None:
+                            bad = verifier.update(chunk)
+                        else:
+                            bad = []
+                        for index in bad:
+                            self.refetch_chunk(url, f, verifier, index, session)
+                            repaired.append(index)
+                        
+                        if self.progress_callback and total_size > 0:
+                            progress = int((downloaded / total_size) * 100)
+                            self.progress_callback(progress)
+                
+                if total_size and downloaded != total_size:
+                    raise IOError(f"Загрузка прервана: получено {downloaded} из {total_size} байт")
+                if metadata:
+                    self._check_metadata(metadata, total_size, downloaded, wait=True)
+                
+                if chunks_pending:
+                    verifier, bad = self._start_chunk_verifier(metadata, f, filepath)
+                    bad += verifier.finish() if verifier is not None else []
+                elif verifier is not None:
+                    bad = verifier.finish()
+                else:
+                    bad = []
+                for index in bad:
+                    self.refetch_chunk(url, f, verifier, index, session)
+                    repaired.append(index)
+            
+            self.metrics.add_bytes('transfer', downloaded)
+            # После замены чанков хеш потока неверен: весь файл хешируется заново при проверке
+            self.last_download_hash = None if repaired else str(stream_hash.result())
+            if repaired:
+                logging.warning(f"Загружено заново повреждённых чанков: {len(repaired)}",
+                                extra={'phase': 'transfer'})
+            logging.info(f"Файл загружен: {filepath}",
+                         extra={'phase': 'transfer', 'bytes': downloaded,
+                                'duration': round(timer.elapsed(), 3)})
+            return True
+            
+        except PrefetchCancelled:
+            raise
+        except Exception as e:
+            logging.error(f"Ошибка загрузки файла {url}: {e}")
+            raise
+    
+    def check_cancelled(self):
+        """Прервать фоновую подготовку, если она отменена"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            from prefetch import PrefetchCancelled
+            raise PrefetchCancelled("Подготовка обновления отменена")
+    
+    def _start_chunk_verifier(self, metadata: Dict[str, 'Future'], f, filepath: Path) -> tuple:
+        """
+        Начать проверку по хешам чанков из манифеста
+        Хеши чанков должны давать хеш архива из hash_url, иначе архив проверяется
+        только целиком. Возвращает (проверка или None, номера уже записанных чанков с ошибкой).
+        """
+        from hashing import ChunkVerifier, READ_BLOCK_SIZE
+        
+        manifest_future = metadata['manifest']
+        if manifest_future.exception() is not None:
+            return None, []
+        manifest = manifest_future.result()
+        hash_future = metadata.get('hash')
+        expected = hash_future.result() if hash_future is not None and hash_future.exception() is None else None
+        verifier = ChunkVerifier.from_manifest(manifest, expected)
+        if verifier is None:
+            if manifest.get('chunks'):
+                logging.warning("Хеши чанков в манифесте не подтверждены хешем архива, архив проверяется целиком")
+            return None, []
+        
+        f.flush()
+        bad = []
+        with open(filepath, 'rb') as written:
+            for block in iter(lambda: written.read(READ_BLOCK_SIZE), b""):
+                bad += verifier.update(block)
+        return verifier, bad
+    
+    @traced()
+    def refetch_chunk(self, url: str, f, verifier: 'ChunkVerifier', index: int,
+                      session: Optional['requests.Session'] = None):
+        """Загрузить чанк, не прошедший проверку, заново запросом Range и записать на место"""
+        session = session or self.session
+        start, end = verifier.chunk_range(index)
+        retries = self.settings.get('chunk_retries', 3)
+        for attempt in range(1, retries + 1):
+            self.metrics.count('chunk_refetches')
+            response = session.get(url, headers={'Range': f'bytes={start}-{end}'}, timeout=30)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Чанк {index} повреждён, а сервер не поддерживает Range для повторной загрузки")
+            if verifier.verify_chunk(index, response.content):
+                position = f.tell()
+                f.seek(start)
+                f.write(response.content)
+                f.seek(position)
+                logging.warning(f"Чанк {index} (смещение {start}) повреждён при загрузке и загружен заново",
+                                extra={'phase': 'transfer'})
+                return
+            logging.warning(f"Чанк {index}: повторная загрузка не прошла проверку (попытка {attempt} из {retries})")
+        raise IOError(f"Чанк {index} не прошёл проверку после {retries} повторных загрузок, загрузка прервана")
+    
+    @traced()
+    def copy_local_archive(self, filepath: Path, metadata: Dict[str, 'Future'],
+                           bundle: Optional['OfflineBundle'] = None) -> bool:
+        """
+        Скопировать архив из локального источника (путь, file:// или офлайн-пакет)
+        Копирование выполняется в ядре (copy_file_range/sendfile) или через mmap,
+        хеш затем считается по копии (см. verify_hash).
+        """
+        from local_source import copy_file, local_path, BUNDLE_ARCHIVE
+        
+        self.last_download_hash = None
+        if bundle is not None:
+            source = f"{bundle.path}!{BUNDLE_ARCHIVE}"
+            total_size = bundle.member_span(BUNDLE_ARCHIVE)[1]
+        else:
+            source = local_path(self.settings['download_url'])
+            total_size = source.stat().st_size
+        
+        def progress(copied):
+            if self.progress_callback and total_size > 0:
+                self.progress_callback(int(copied / total_size * 100))
+        
+        try:
+            with self.metrics.phase('transfer') as timer:
+                if bundle is not None:
+                    method = bundle.copy_archive(filepath, progress)
+                else:
+                    method = copy_file(source, filepath, progress=progress)
+            self._check_metadata(metadata, total_size, total_size, wait=True)
+            
+            self.metrics.add_bytes('transfer', total_size)
+            logging.info(f"Архив скопирован из локального источника {source} ({method})",
+                         extra={'phase': 'transfer', 'bytes': total_size,
+                                'duration': round(timer.elapsed(), 3)})
+            return True
+            
+        except Exception as e:
+            logging.error(f"Ошибка копирования архива из {source}: {e}")
+            raise
+    
+    @traced()
+    def download_from_peers(self, filepath: Path, metadata: Dict[str, 'Future']) -> bool:
+        """
+        Загрузить архив у соседа по локальной сети (режим соседей, см. peer_cache.py)
+        Архив ищется по хешу, опубликованному сервером обновлений, и проверяется
+        им же; без этого хеша соседи не используются. Возвращает True, если
+        проверенный архив получен, иначе архив загружается с сервера.
+        """
+        import requests
+        from peer_cache import peer_key, discover_peers, artifact_url, KEY_HEADER
+        
+        try:
+            expected = metadata['hash'].result()
+        except Exception as e:
+            logging.warning(f"Хеш с сервера обновлений недоступен, соседи не используются: {e}")
+            return False
+        
+        key = peer_key(self.settings.get('token', ''))
+        peers = list(self.settings.get('peers') or [])
+        if self.settings.get('peer_multicast', True):
+            try:
+                with self.metrics.phase('discover'):
+                    peers += [peer for peer in discover_peers(key, expected.digest,
+                                                              self.settings.get('peer_discovery_timeout', 0.5))
+                              if peer not in peers]
+            except OSError as e:
+                logging.warning(f"Поиск соседей через multicast недоступен: {e}")
+        if not peers:
+            return False
+        
+        session = requests.Session()
+        session.headers.update({KEY_HEADER: key})
+        for peer in peers:
+            try:
+                self.download_file(artifact_url(peer, expected.digest), filepath, metadata, session=session)
+                if self.verify_hash(filepath, self.settings['hash_url'], expected_hash=expected,
+                                    actual_hash=self.last_download_hash):
+                    self.metrics.set_info(source=peer)
+                    self.metrics.count('peer_hits')
+                    logging.info(f"Архив загружен у соседа {peer}", extra={'phase': 'transfer'})
+                    return True
+                logging.warning(f"Архив соседа {peer} не совпадает с хешем сервера обновлений")
+            except (requests.RequestException, OSError, ValueError) as e:
+                logging.warning(f"Загрузка у соседа {peer} не удалась: {e}")
+            self.metrics.count('peer_misses')
+            filepath.unlink(missing_ok=True)
+        return False
+    
+    def release_archive(self, archive_path: Path, expected: 'HashSpec', version: str):
+        """Удалить установленный архив или оставить его в кэше для соседей"""
+        if not self.settings.get('peer_enabled', False):
+            archive_path.unlink()
+            return
+        from peer_cache import PeerCache, ensure_server, PEER_CACHE_DIR_NAME, CACHE_KEEP
+        
+        cache_dir = AppDataManager().app_dir / PEER_CACHE_DIR_NAME
+        try:
+            PeerCache(cache_dir, self.settings.get('peer_cache_keep', CACHE_KEEP)).store(
+                archive_path, str(expected), version)
+            ensure_server(self.settings, cache_dir)
+        except OSError as e:
+            logging.warning(f"Не удалось сохранить архив для соседей: {e}")
+            archive_path.unlink(missing_ok=True)
+    
+    def fetch_archive(self, archive_path: Path, metadata: Dict[str, 'Future'],
+                      bundle: Optional['OfflineBundle'] = None) -> bool:
+        """
+        Получить архив из локального источника, у соседа или с сервера и проверить хеш
+        Архив, не прошедший проверку, удаляется (возвращается False).
+        """
+        from local_source import is_local
+        
+        local = bundle is not None or is_local(self.settings['download_url'])
+        from_peer = False
+        if local:
+            self.copy_local_archive(archive_path, metadata, bundle)
+        elif self.settings.get('peer_enabled', False):
+            from_peer = self.download_from_peers(archive_path, metadata)
+        if from_peer:
+            self.metrics.set_info(mode='peer')
+        elif not local:
+            self.download_file(self.settings['download_url'], archive_path, metadata)
+        
+        # Проверяем хеш, посчитанный во время загрузки (архив соседа уже проверен)
+        if not from_peer and not self.verify_hash(archive_path, self.settings['hash_url'],
+                                                  expected_hash=metadata['hash'].result(),
+                                                  actual_hash=self.last_download_hash):
+            archive_path.unlink()
+            return False
+        return True
+    
+    @traced()
+    def verify_hash(self, filepath: Path, hash_url: str, expected_hash: Optional[Union[str, 'HashSpec']] = None,
+                    actual_hash: Optional[Union[str, 'HashSpec']] = None) -> bool:
+        """
+        Проверить хеш файла
+        Алгоритм берётся из объявления на hash_url (см. hashing.py). Уже полученный
+        хеш и хеш, посчитанный при загрузке, повторно не запрашиваются; если при
+        загрузке хеш считался другим способом, файл хешируется заново (дерево -
+        параллельно в hash_workers потоках).
+        """
+        from hashing import parse_hash, hash_file
+        
+        with self.metrics.phase('hash') as timer:
+            try:
+                # Загружаем хеш
+                if expected_hash is None:
+                    expected_hash = self.read_text(hash_url)
+                if isinstance(expected_hash, str):
+                    expected_hash = parse_hash(expected_hash)
+                if isinstance(actual_hash, str):
+                    actual_hash = parse_hash(actual_hash)
+                
+                # Вычисляем хеш файла
+                if actual_hash is None or actual_hash.scheme != expected_hash.scheme:
+                    actual_hash = hash_file(filepath, expected_hash,
+                                            workers=self.settings.get('hash_workers') or None)
+                
+                is_valid = expected_hash.matches(actual_hash)
+                logging.info(f"Проверка хеша: ожидаемый={expected_hash}, фактический={actual_hash}, валидный={is_valid}",
+                             extra={'phase': 'hash', 'duration': round(timer.elapsed(), 3)})
+                
+                return is_valid
+                
+            except Exception as e:
+                logging.error(f"Ошибка проверки хеша: {e}")
+                raise
+    
+    @traced()
+    def extract_archive(self, archive_path: Path, extract_path: Path, version: Optional[str] = None) -> bool:
+        """Распаковать архив и записать установленные файлы в индекс установки"""
+        from install_index import extract_with_index
+        
+        with self.metrics.phase('extract') as timer:
+            try:
+                records, extracted = extract_with_index(archive_path, extract_path)
+                self.metrics.add_bytes('extract', extracted)
+                self.record_installed(extract_path, version, records=records)
+                
+                logging.info(f"Архив распакован в: {extract_path}",
+                             extra={'phase': 'extract', 'bytes': extracted,
+                                    'duration': round(timer.elapsed(), 3)})
+                return True
+                
+            except Exception as e:
+                logging.error(f"Ошибка распаковки архива: {e}")
+                raise
+    
+    @traced()
+    def execute_reg_files(self, extract_path: Path, reg_files: Optional[list] = None) -> bool:
+        """Выполнить .reg файлы из распакованного архива (или только указанные)"""
+        import subprocess
+        import sys
+        
+        # Проверяем настройку выполнения .reg файлов
+        if not self.settings.get('execute_reg_files', True):
+            logging.info("Выполнение REG файлов отключено в настройках")
+            return True
+        
+        with self.metrics.phase('hooks'):
+            try:
+                # Ищем все .reg файлы в распакованной папке
+                if reg_files is None:
+                    reg_files = list(extract_path.rglob("*.reg"))
+                
+                if not reg_files:
+                    logging.info("REG файлы не найдены")
+                    return True
+                
+                logging.info(f"Найдено REG файлов: {len(reg_files)}")
+                
+                # Выполняем каждый .reg файл
+                for reg_file in reg_files:
+                    try:
+                        logging.info(f"Выполнение REG файла: {reg_file}")
+                        
+                        if sys.platform == "win32":
+                            # Windows: используем regedit
+                            result = subprocess.run([
+                                "regedit", "/s", str(reg_file)
+                            ], capture_output=True, text=True, timeout=30)
+                            
+                            if result.returncode == 0:
+                                logging.info(f"REG файл успешно выполнен: {reg_file.name}")
+                            else:
+                                logging.error(f"Ошибка выполнения REG файла {reg_file.name}: {result.stderr}")
+                                return False
+                        else:
+                            # На macOS/Linux .reg файлы не поддерживаются
+                            logging.warning(f"REG файлы не поддерживаются на {sys.platform}: {reg_file.name}")
+                            
+                    except subprocess.TimeoutExpired:
+                        logging.error(f"Таймаут выполнения REG файла: {reg_file.name}")
+                        return False
+                    except Exception as e:
+                        logging.error(f"Ошибка выполнения REG файла {reg_file.name}: {e}")
+                        return False
+                
+                return True
+                
+            except Exception as e:
+                logging.error(f"Ошибка обработки REG файлов: {e}")
+                return False
+    
+    def download_update(self, download_path: str, version: str) -> bool:
+        """Загрузить и установить обновление (запуск завершается записью метрик)"""
+        from prefetch import cancel_prefetch
+        
+        if self.run_id is None or self.metrics.finished:
+            self.begin_run()
+        else:
+            # Запуск продолжает проверку версии, которая могла идти в другом потоке
+            start_run(self.run_id)
+        self.metrics.set_info(version=version)
+        
+        # Фоновая подготовка этого процесса (пониженный приоритет) не задерживает установку:
+        # она отменяется, а готовая подготовка этой версии переносится на место
+        cancel_prefetch()
+        outcome = 'error'
+        coordinator = self.download_coordinator()
+        progress_callback = self.progress_callback
+        try:
+            # Другой процесс мог уже загрузить и установить эту версию, пока мы ждали
+            if coordinator.acquire(self._follow_download) and coordinator.finished(version, download_path) \
+                    and AppDataManager().get_current_version() == version:
+                self.metrics.set_info(mode='shared')
+                logging.info(f"Версия {version} уже загружена и установлена другим процессом")
+                if self.progress_callback:
+                    self.progress_callback(100)
+                outcome = 'updated'
+                return True
+            
+            coordinator.start(version, download_path)
+            
+            def report_progress(value):
+                coordinator.progress(value)
+                if progress_callback:
+                    progress_callback(value)
+            
+            self.progress_callback = report_progress
+            with self.profiling():
+                success = self._download_update(download_path, version)
+            outcome = 'updated' if success else 'failed'
+            return success
+        finally:
+            self.progress_callback = progress_callback
+            coordinator.release('done' if outcome == 'updated' else 'failed')
+            self.end_run(outcome)
+    
+    def prefetch_update(self, download_path: str, version: str,
+                        cancel_event: Optional['threading.Event'] = None) -> bool:
+        """
+        Загрузить, проверить и распаковать обновление в папку подготовки (см. prefetch.py)
+        Подготовка не ждёт чужую загрузку: если блокировка занята, она пропускается.
+        Ход подготовки виден процессам, ожидающим блокировку.
+        """
+        import shutil
+        from prefetch import PrefetchCancelled, read_staged, staging_path, staging_root
+        
+        coordinator = self.download_coordinator()
+        if not coordinator.try_acquire():
+            logging.info(f"Обновление уже загружается, подготовка версии {version} пропущена")
+            return False
+        if read_staged(download_path, version) is not None or AppDataManager().get_current_version() == version:
+            coordinator.release()
+            return True
+        
+        self.begin_run()
+        self.metrics.set_info(version=version, mode='prefetch')
+        self.cancel_event = cancel_event
+        progress_callback = self.progress_callback
+        self.progress_callback = coordinator.progress
+        outcome = 'error'
+        try:
+            coordinator.start(version, download_path)
+            with self.profiling():
+                staged = self._prefetch_update(download_path, version)
+            outcome = 'staged' if staged else 'failed'
+            return staged
+        except PrefetchCancelled:
+            outcome = 'cancelled'
+            logging.info(f"Подготовка версии {version} отменена")
+            return False
+        finally:
+            self.cancel_event = None
+            self.progress_callback = progress_callback
+            if outcome != 'staged':
+                shutil.rmtree(staging_path(download_path, version), ignore_errors=True)
+                try:
+                    staging_root(download_path).rmdir()
+                except OSError:
+                    pass  # остались другие подготовленные версии
+            coordinator.release('staged' if outcome == 'staged' else 'failed')
+            self.end_run(outcome)
+    
+    @traced('prefetch_update')
+    def _prefetch_update(self, download_path: str, version: str) -> bool:
+        import zipfile
+        from concurrent.futures import ThreadPoolExecutor
+        from install_index import extract_with_index
+        from prefetch import staging_path, clear_staging, write_staged, check_budget
+        
+        budget = self.settings.get('prefetch_max_bytes', 2 * 1024 ** 3)
+        metadata_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="metadata")
+        try:
+            metadata = self.fetch_metadata_async(metadata_executor)
+            stage_dir = staging_path(download_path, version)
+            clear_staging(download_path)
+            
+            # Бюджет проверяется по размеру из манифеста до загрузки и по оглавлению архива до распаковки
+            if 'manifest' in metadata and metadata['manifest'].exception() is None:
+                expected_size = metadata['manifest'].result().get('size')
+                if expected_size:
+                    check_budget(download_path, expected_size, budget)
+            
+            stage_dir.mkdir(parents=True)
+            archive_path = stage_dir / "myfile.zip"
+            if not self.fetch_archive(archive_path, metadata, self.offline_bundle()):
+                return False
+            with zipfile.ZipFile(archive_path) as zip_ref:
+                unpacked = sum(info.file_size for info in zip_ref.infolist())
+            check_budget(download_path, archive_path.stat().st_size + unpacked, budget)
+            self.check_cancelled()
+            
+            with self.metrics.phase('extract') as timer:
+                records, extracted = extract_with_index(archive_path, stage_dir / "update")
+                self.metrics.add_bytes('extract', extracted)
+            self.check_cancelled()
+            
+            expected = metadata['hash'].result()
+            self.release_archive(archive_path, expected, version)
+            write_staged(stage_dir, version, str(expected), records)
+            logging.info(f"Версия {version} подготовлена к установке: {stage_dir}",
+                         extra={'phase': 'extract', 'bytes': extracted,
+                                'duration': round(timer.elapsed(), 3)})
+            return True
+        finally:
+            metadata_executor.shutdown(wait=False, cancel_futures=True)
+    
+    def activate_staged(self, download_path: str, version: str, metadata: Dict[str, 'Future']) -> bool:
+        """
+        Установить версию, подготовленную заранее: перенести файлы, записать индекс,
+        выполнить .reg файлы и сохранить версию. Подготовка, не совпадающая с
+        текущим хешем на сервере, удаляется (возвращается False).
+        """
+        from prefetch import read_staged, activate, clear_staging
+        
+        staged = read_staged(download_path, version)
+        if staged is None:
+            return False
+        # Без связи с сервером подготовленная версия остаётся проверенной при подготовке
+        hash_future = metadata['hash']
+        if hash_future.exception() is None and str(hash_future.result()) != staged['hash']:
+            logging.warning(f"Архив версии {version} на сервере изменился после подготовки, подготовка удалена")
+            clear_staging(download_path)
+            return False
+        
+        self.metrics.set_info(mode='staged')
+        extract_path = Path(download_path) / "update"
+        with self.metrics.phase('activate') as timer:
+            records = activate(download_path, version, extract_path)
+        self.record_installed(extract_path, version, records=records)
+        logging.info(f"Подготовленная версия {version} перенесена в: {extract_path}",
+                     extra={'phase': 'activate', 'duration': round(timer.elapsed(), 3)})
+        
+        if not self.execute_reg_files(extract_path):
+            logging.warning("Некоторые REG файлы не были выполнены, но обновление продолжается")
+        self.save_version(version)
+        if self.progress_callback:
+            self.progress_callback(100)
+        logging.info(f"Обновление успешно установлено: версия {version}")
+        return True
+    
+    def download_coordinator(self) -> 'DownloadCoordinator':
+        """Блокировка загрузки, общая для процессов обновления этого пользователя"""
+        from download_lock import DownloadCoordinator
+        return DownloadCoordinator(AppDataManager().app_dir, self.settings.get('download_wait_timeout', 600))
+    
+    def _follow_download(self, status: Dict[str, Any]):
+        """Показывать прогресс загрузки, которую выполняет другой процесс"""
+        if self.progress_callback and status.get('state') == 'download':
+            self.progress_callback(status.get('progress', 0))
+    
+    @traced('download_update')
+    def _download_update(self, download_path: str, version: str) -> bool:
+        import requests
+        from concurrent.futures import ThreadPoolExecutor
+        from local_source import is_local
+        
+        metadata_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="metadata")
+        try:
+            download_dir = Path(download_path)
+            archive_path = download_dir / "myfile.zip"
+            
+            # Метаданные загружаются параллельно с предпроверкой и архивом
+            metadata = self.fetch_metadata_async(metadata_executor)
+            
+            # Версия, подготовленная заранее в фоне, только переносится на место
+            if self.activate_staged(download_path, version, metadata):
+                return True
+            
+            bundle = self.offline_bundle()
+            local = bundle is not None or is_local(self.settings['download_url'])
+            
+            # Загружаем архив
+            if self.progress_callback:
+                self.progress_callback(0)
+            
+            # Обновление по чанкам: загружаются только отсутствующие локально части файлов
+            if not local and self.settings.get('chunk_index_url'):
+                try:
+                    self.metrics.set_info(mode='chunks')
+                    return self.download_chunked(download_dir / "update", version, metadata)
+                except (requests.RequestException, ValueError, OSError) as e:
+                    self.metrics.count('retries')
+                    logging.warning(f"Обновление по чанкам не удалось, выполняется загрузка архива: {e}")
+            
+            # Предпроверка по оглавлению архива (несколько КБ вместо всего архива)
+            if not local and self.settings.get('preflight', True):
+                from remote_zip import RemoteZipError
+                try:
+                    plan = self.preflight(download_path)
+                except (RemoteZipError, requests.RequestException) as e:
+                    logging.warning(f"Предпроверка недоступна, выполняется полная загрузка: {e}")
+                else:
+                    # CRC32 из центрального каталога не проверены: пропуск подтверждается манифестом
+                    manifest = self.trusted_manifest(metadata) if plan['mode'] == 'skip' else None
+                    if manifest is not None and not self.installed_mismatches(download_dir / "update", manifest):
+                        self.metrics.set_info(mode='skip')
+                        logging.info("Установленные файлы совпадают с манифестом, загрузка пропущена")
+                        self.save_version(version)
+                        if self.progress_callback:
+                            self.progress_callback(100)
+                        return True
+                    if plan['mode'] == 'skip':
+                        logging.info("Совпадение с архивом не подтверждено манифестом, выполняется полная загрузка")
+                    if plan['mode'] == 'incremental' and self.settings.get('range_incremental', True):
+                        manifest = self.trusted_manifest(metadata)
+                        try:
+                            if manifest is None:
+                                raise RemoteZipError("нет манифеста, подтверждённого hash_url")
+                            self.metrics.set_info(mode='incremental')
+                            return self.download_changed_members(plan, download_dir / "update", version, manifest)
+                        except (RemoteZipError, requests.RequestException) as e:
+                            self.metrics.count('retries')
+                            logging.warning(f"Выборочная загрузка не удалась, выполняется полная: {e}")
+            
+            self.metrics.set_info(mode='local' if local else 'full')
+            download_dir.mkdir(parents=True, exist_ok=True)
+            
+            if not self.fetch_archive(archive_path, metadata, bundle):
+                return False
+            
+            # Подпись сохраняется рядом с архивом для внешней проверки
+            if 'signature' in metadata:
+                (download_dir / "myfile.zip.sig").write_bytes(metadata['signature'].result())
+            
+            # Распаковываем
+            extract_path = download_dir / "update"
+            if not self.extract_archive(archive_path, extract_path, version):
+                return False
+            
+            # Выполняем .reg файлы, если они есть
+            if not self.execute_reg_files(extract_path):
+                logging.warning("Некоторые REG файлы не были выполнены, но обновление продолжается")
+            
+            # Обновляем версию
+            self.save_version(version)
+            
+            # Удаляем архив (в режиме соседей он остаётся в кэше для раздачи)
+            self.release_archive(archive_path, metadata['hash'].result(), version)
+            
+            if self.progress_callback:
+                self.progress_callback(100)
+            
+            logging.info(f"Обновление успешно загружено и установлено: версия {version}")
+            return True
+            
+        except Exception as e:
+            logging.error(f"Ошибка загрузки обновления: {e}")
+            raise
+        finally:
+            metadata_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def start_update_check(settings: Dict[str, Any], progress_callback: Optional[Callable] = None) -> 'Future':
+    """
+    Запустить проверку версии в фоновом потоке
+    Вызывается сразу после загрузки настроек, параллельно с построением окна.
+    Результат - (проверяющий объект, (есть_обновление, текущая, последняя));
+    проверяющий объект с уже открытым соединением используется для загрузки.
+    """
+    import threading
+    from concurrent.futures import Future
+    
+    future = Future()
+    
+    def check_update_thread():
+        try:
+            if settings.get('peer_enabled', False):
+                from peer_cache import ensure_server, PEER_CACHE_DIR_NAME
+                ensure_server(settings, AppDataManager().app_dir / PEER_CACHE_DIR_NAME)
+            checker = UpdateChecker(settings, progress_callback)
+            result = checker.check_version()
+            # Найденное обновление готовится в фоне; установка, начатая сразу, отменит подготовку
+            if result[0] and settings.get('prefetch', False):
+                from prefetch import start_prefetch
+                start_prefetch(settings, result[2])
+            future.set_result((checker, result))
+        except Exception as e:
+            future.set_exception(e)
+    
+    thread = threading.Thread(target=check_update_thread, name="update-check", daemon=True)
+    thread.start()
+    return future